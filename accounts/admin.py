@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import CustomUser, OTP
+from .models import CustomUser, OTP, BroadcastNotification
 
 @admin.register(CustomUser)
 class CustomUserAdmin(admin.ModelAdmin):
@@ -11,5 +11,12 @@ class CustomUserAdmin(admin.ModelAdmin):
 @admin.register(OTP)
 class OTPAdmin(admin.ModelAdmin):
     list_display = ('user', 'code', 'created_at', 'is_used')
+    list_select_related = ('user',)
     search_fields = ('user__email', 'code')
     list_filter = ('is_used', 'created_at')
+
+@admin.register(BroadcastNotification)
+class BroadcastNotificationAdmin(admin.ModelAdmin):
+    list_display = ('message', 'link', 'created_at')
+    search_fields = ('message',)
+    ordering = ('-created_at',)
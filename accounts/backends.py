@@ -0,0 +1,85 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from allauth.account.auth_backends import AuthenticationBackend
+from django.db import transaction
+from core.cache import aget_or_set, get_or_set, shared_cache
+from .models import CustomUser
+
+# What a typical request needs from the logged-in user; date_joined and the
+# notification counters because every notification poll reads them. The
+# password hash stays out of the cache: rows carry the session auth hashes
+# derived from it instead (see CustomUser.get_session_auth_hash).
+CACHED_USER_FIELDS = (
+    'id', 'email', 'first_name', 'last_name', 'is_active', 'is_staff', 'is_superuser',
+    'is_verified', 'date_joined', 'unread_notifications', 'notifications_version',
+)
+
+def _cached_user_key(user_id):
+    return f'auth:user:{user_id}'
+
+def _cached_user_row(user):
+    if user is None:
+        return None
+    row = {name: getattr(user, name) for name in CACHED_USER_FIELDS}
+    row['session_auth_hashes'] = [user.get_session_auth_hash(), *user.get_session_auth_fallback_hash()]
+    return row
+
+def _build_user(row):
+    if row is None:
+        return None
+    # Other fields stay deferred; touching any of them loads the rest of the row
+    names = [field.attname for field in CustomUser._meta.concrete_fields if field.attname in row]
+    user = CustomUser.from_db('default', names, [row[name] for name in names])
+    user._session_auth_hashes = row.get('session_auth_hashes')
+    return user
+
+def _cached_user_query(user_id):
+    return CustomUser.objects.filter(pk=user_id).only(*CACHED_USER_FIELDS, 'password')
+
+def get_cached_user(user_id):
+    row = get_or_set(
+        _cached_user_key(user_id),
+        lambda: _cached_user_row(_cached_user_query(user_id).first()),
+        settings.USER_CACHE_TIMEOUT, namespace='users',
+    )
+    return _build_user(row)
+
+async def aget_cached_user(user_id):
+    async def compute():
+        return _cached_user_row(await _cached_user_query(user_id).afirst())
+    row = await aget_or_set(_cached_user_key(user_id), compute, settings.USER_CACHE_TIMEOUT, namespace='users')
+    return _build_user(row)
+
+def invalidate_cached_users(user_ids):
+    keys = [_cached_user_key(user_id) for user_id in user_ids]
+    shared_cache.delete_many(keys)
+    # A request that read the old row before the commit may have cached it again
+    transaction.on_commit(lambda: shared_cache.delete_many(keys))
+
+class CachedUserMixin:
+    """Loads the logged-in user from the shared cache when USER_CACHE_ENABLED is on."""
+
+    def get_user(self, user_id):
+        if not settings.USER_CACHE_ENABLED:
+            return super().get_user(user_id)
+        user = get_cached_user(user_id)
+        return user if user is not None and self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        if not settings.USER_CACHE_ENABLED:
+            return await super().aget_user(user_id)
+        user = await aget_cached_user(user_id)
+        return user if user is not None and self.user_can_authenticate(user) else None
+
+class CachedModelBackend(CachedUserMixin, ModelBackend):
+    pass
+
+class CachedAuthenticationBackend(CachedUserMixin, AuthenticationBackend):
+    """allauth's backend, which social and allauth-form logins record in the session."""
+
+# Sessions store the backend path they logged in with; these map sessions from
+# before the cached backends to them instead of logging everyone out
+UPGRADED_BACKENDS = {
+    'django.contrib.auth.backends.ModelBackend': 'accounts.backends.CachedModelBackend',
+    'allauth.account.auth_backends.AuthenticationBackend': 'accounts.backends.CachedAuthenticationBackend',
+}
@@ -0,0 +1,28 @@
+from functools import partial
+from django.contrib import auth
+from django.contrib.auth.middleware import AuthenticationMiddleware as BaseAuthenticationMiddleware
+from django.utils.functional import SimpleLazyObject
+from .backends import UPGRADED_BACKENDS
+
+def get_user(request):
+    if not hasattr(request, '_cached_user'):
+        backend = request.session.get(auth.BACKEND_SESSION_KEY)
+        if backend in UPGRADED_BACKENDS:
+            request.session[auth.BACKEND_SESSION_KEY] = UPGRADED_BACKENDS[backend]
+        request._cached_user = auth.get_user(request)
+    return request._cached_user
+
+async def auser(request):
+    # Same memo as request.user, so a request loads its user once whichever API it uses
+    if not hasattr(request, '_cached_user'):
+        backend = await request.session.aget(auth.BACKEND_SESSION_KEY)
+        if backend in UPGRADED_BACKENDS:
+            await request.session.aset(auth.BACKEND_SESSION_KEY, UPGRADED_BACKENDS[backend])
+        request._cached_user = await auth.aget_user(request)
+    return request._cached_user
+
+class AuthenticationMiddleware(BaseAuthenticationMiddleware):
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(partial(get_user, request))
+        request.auser = partial(auser, request)
@@ -28,21 +28,61 @@ class CustomUser(AbstractUser):
     username = None
     email = models.EmailField('email address', unique=True)
     is_verified = models.BooleanField(default=False)
+    # Denormalised notification state: kept in step by accounts.utils so polling needs no COUNT
+    unread_notifications = models.PositiveIntegerField(default=0)
+    notifications_version = models.PositiveIntegerField(default=0)
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = []
 
     objects = CustomUserManager()
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Lets prefix searches (email LIKE 'abc%') use an index on PostgreSQL
+            models.Index(fields=['email'], name='user_email_prefix_idx', opclasses=['varchar_pattern_ops']),
+        ]
+
     def __str__(self):
         return self.email
 
+    def _cached_session_auth_hashes(self):
+        # Users built from the auth cache carry these instead of the password;
+        # once the password is loaded or changed it is the source again
+        if 'password' in self.__dict__:
+            return None
+        return getattr(self, '_session_auth_hashes', None)
+
+    def get_session_auth_hash(self):
+        hashes = self._cached_session_auth_hashes()
+        return hashes[0] if hashes else super().get_session_auth_hash()
+
+    def get_session_auth_fallback_hash(self):
+        hashes = self._cached_session_auth_hashes()
+        if hashes:
+            yield from hashes[1:]
+        else:
+            yield from super().get_session_auth_fallback_hash()
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        # A user loaded from the auth cache has most fields deferred; reading
+        # one of them fetches all the rest in one query rather than one each
+        deferred = self.get_deferred_fields()
+        if fields is not None and deferred.issuperset(fields):
+            fields = deferred
+        super().refresh_from_db(using, fields, from_queryset)
+
 class OTP(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
     code = models.CharField(max_length=6)
     created_at = models.DateTimeField(auto_now_add=True)
     is_used = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'code', 'is_used'], name='otp_user_code_used_idx'),
+        ]
+
     def is_valid(self):
         from django.conf import settings
         expiry_time = self.created_at + datetime.timedelta(minutes=settings.OTP_EXPIRY_MINUTES)
@@ -57,6 +97,31 @@ class Notification(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'is_read', '-created_at'], name='notif_user_read_created_idx'),
+        ]
 
     def __str__(self):
         return f"Notification for {self.user.email}: {self.message[:20]}"
+
+class BroadcastNotification(models.Model):
+    message = models.TextField()
+    link = models.CharField(max_length=255, blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Broadcast: {self.message[:20]}"
+
+class BroadcastReceipt(models.Model):
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='broadcast_receipts')
+    broadcast = models.ForeignKey(BroadcastNotification, on_delete=models.CASCADE, related_name='receipts')
+    read_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('user', 'broadcast')
+
+    def __str__(self):
+        return f"{self.user.email} read broadcast {self.broadcast_id}"
@@ -0,0 +1,190 @@
+"""
+Fan-out of live notification events to connected browsers.
+
+Events are small dicts: {'type': ..., 'user_ids': [...] or None, 'data': {...}}.
+``user_ids=None`` addresses every student (broadcasts). Publishing is sync and
+safe to call from any thread; subscribers are asyncio consumers (the SSE view).
+"""
+import asyncio
+import json
+import logging
+import select
+import threading
+from functools import lru_cache
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.module_loading import import_string
+
+try:
+    import psycopg
+except ImportError:
+    psycopg = None
+
+logger = logging.getLogger(__name__)
+
+# NOTIFY payloads are capped at 8000 bytes; keep user id lists well below that
+MAX_USER_IDS_PER_EVENT = 500
+
+class Subscription:
+    def __init__(self, hub):
+        self.hub = hub
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=settings.PUBSUB_SUBSCRIBER_QUEUE_SIZE)
+
+    def deliver(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # A stuck client should not hold memory; it refetches on reconnect anyway
+            pass
+
+    async def get(self, timeout=None):
+        """Returns the next event, or None if nothing arrived within `timeout` seconds."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class LocalPubSub:
+    """In-process hub. Only reaches subscribers in the same process, which is all tests need."""
+
+    def __init__(self):
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self):
+        subscription = Subscription(self)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, event):
+        self.dispatch(event)
+
+    def dispatch(self, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            if not subscription.loop.is_closed():
+                subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+
+class PostgresPubSub(LocalPubSub):
+    """
+    Publishes with pg_notify and keeps one LISTEN connection per process,
+    whose events are fanned out to that process's local subscribers.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.channel = settings.PUBSUB_CHANNEL
+        self._listener = None
+
+    def publish(self, event):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [self.channel, json.dumps(event)])
+
+    def subscribe(self):
+        self._ensure_listener()
+        return super().subscribe()
+
+    def _ensure_listener(self):
+        with self._lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(target=self._listen, name='pubsub-listener', daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        conn = connect_listener(connection.settings_dict)
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(f'LISTEN "{self.channel}"')
+            for payload in _iter_notifications(conn):
+                try:
+                    self.dispatch(json.loads(payload))
+                except ValueError:
+                    logger.warning("Ignoring malformed pubsub payload: %r", payload)
+        except Exception:
+            logger.exception("Pubsub listener stopped; it restarts with the next subscriber")
+        finally:
+            conn.close()
+
+# Django-level OPTIONS (and psycopg 3 connection arguments) that libpq doesn't know
+_NON_LIBPQ_OPTIONS = {
+    'pool', 'server_side_binding', 'isolation_level', 'assume_role', 'cursor_factory', 'context', 'prepare_threshold',
+}
+
+def listener_params(settings_dict):
+    """Plain libpq keywords for the database in `settings_dict`, valid for psycopg 2 and 3."""
+    params = {'dbname': settings_dict['NAME'] or 'postgres'}
+    for key in ('USER', 'PASSWORD', 'HOST', 'PORT'):
+        if settings_dict.get(key):
+            params[key.lower()] = settings_dict[key]
+    params.update({
+        key: value for key, value in settings_dict.get('OPTIONS', {}).items() if key not in _NON_LIBPQ_OPTIONS
+    })
+    return params
+
+def connect_listener(settings_dict):
+    """
+    Opens a dedicated autocommit connection for LISTEN, outside Django's
+    connection handling, with whichever psycopg Django itself would use.
+    """
+    params = listener_params(settings_dict)
+    if psycopg is not None:
+        return psycopg.connect(autocommit=True, **params)
+    import psycopg2
+    conn = psycopg2.connect(**params)
+    conn.autocommit = True
+    return conn
+
+def _iter_notifications(conn):
+    """Yields NOTIFY payloads forever, waking up every 30 seconds."""
+    if psycopg is not None:
+        while True:
+            for notify in conn.notifies(timeout=30):
+                yield notify.payload
+    while True:
+        if select.select([conn], [], [], 30) == ([], [], []):
+            continue
+        conn.poll()
+        while conn.notifies:
+            yield conn.notifies.pop(0).payload
+
+@lru_cache(maxsize=None)
+def _load_backend(path):
+    return import_string(path)()
+
+def get_pubsub():
+    return _load_backend(settings.PUBSUB_BACKEND)
+
+def publish(event_type, user_ids=None, data=None):
+    """Publishes an event once the surrounding transaction commits."""
+    def send():
+        chunks = [None] if user_ids is None else [
+            list(user_ids[start:start + MAX_USER_IDS_PER_EVENT])
+            for start in range(0, len(user_ids), MAX_USER_IDS_PER_EVENT)
+        ]
+        for chunk in chunks:
+            try:
+                get_pubsub().publish({'type': event_type, 'user_ids': chunk, 'data': data or {}})
+            except Exception:
+                logger.exception("Could not publish %s event", event_type)
+    transaction.on_commit(send)
+
+def is_addressed_to(event, user):
+    if event['user_ids'] is None:
+        return not user.is_staff
+    return user.pk in event['user_ids']
@@ -1,7 +1,17 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from allauth.socialaccount.models import SocialAccount
-from .models import CustomUser, Notification
+from core.cache import shared_cache
+from exams.models import Exam
+from .backends import invalidate_cached_users
+from .models import CustomUser, Notification, BroadcastNotification
+from .pubsub import publish
+from .utils import LATEST_BROADCAST_CACHE_KEY, LATEST_BROADCAST_CACHE_TIMEOUT, bump_notification_state
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def drop_cached_user(sender, instance, **kwargs):
+    invalidate_cached_users([instance.pk])
 
 @receiver(post_save, sender=SocialAccount)
 def verify_social_user(sender, instance, created, **kwargs):
@@ -14,19 +24,31 @@ def verify_social_user(sender, instance, created, **kwargs):
 @receiver(post_save, sender='exams.Exam')
 def notify_new_exam(sender, instance, created, **kwargs):
     if created:
-        students = CustomUser.objects.filter(is_staff=False)
-        for student in students:
-            Notification.objects.create(
-                user=student,
-                message=f"A new exam has been added: {instance.name}",
-                link="/exams/"
-            )
+        # One row for everyone; students pick it up when they read their notifications
+        broadcast = BroadcastNotification.objects.create(
+            message=f"A new exam has been added: {instance.name}",
+            link="/exams/"
+        )
+        shared_cache.set(LATEST_BROADCAST_CACHE_KEY, broadcast.id, LATEST_BROADCAST_CACHE_TIMEOUT)
+        publish('broadcast', data={'id': broadcast.id, 'message': broadcast.message})
+
+@receiver(post_save, sender=Notification)
+def count_new_notification(sender, instance, created, **kwargs):
+    if created and not instance.is_read:
+        bump_notification_state([instance.user_id], unread_delta=1)
+        publish('notification', [instance.user_id], data={'id': instance.id, 'message': instance.message})
 
 @receiver(post_save, sender='registrations.Registration')
 def notify_registration_status_change(sender, instance, created, **kwargs):
     if not created:
+        # Callers usually select_related the exam; otherwise fetch just its name
+        if sender.exam.is_cached(instance):
+            exam_name = instance.exam.name
+        else:
+            exam_name = Exam.objects.filter(pk=instance.exam_id).values_list('name', flat=True).first()
         Notification.objects.create(
-            user=instance.student,
-            message=f"Update on your {instance.exam.name} registration: Status is now {instance.status}.",
+            user_id=instance.student_id,
+            message=f"Update on your {exam_name} registration: Status is now {instance.status}.",
             link="/accounts/profile/"
         )
+        publish('registration_status', [instance.student_id], data={'registration_id': instance.id, 'status': instance.status})
@@ -0,0 +1,8 @@
+from jobs.registry import task
+from .models import OTP
+from .utils import send_otp_email
+
+@task('accounts.send_otp_email')
+def send_otp_email_task(otp_id):
+    otp = OTP.objects.select_related('user').get(id=otp_id)
+    send_otp_email(otp.user, otp.code)
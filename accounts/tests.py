@@ -1,9 +1,20 @@
-from django.test import TestCase
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.contrib.auth import BACKEND_SESSION_KEY
+from django.test import RequestFactory, TestCase, override_settings
 from django.utils import timezone
 from django.core.exceptions import ValidationError
-from accounts.models import CustomUser
+from accounts.backends import UPGRADED_BACKENDS, get_cached_user
+from accounts.middleware import AuthenticationMiddleware
+from accounts.models import CustomUser, Notification, OTP
+from accounts.utils import bump_notification_state
+from core.cache import shared_cache
+from core.testing import QueryPlanAssertionsMixin, QueryBudgetTestMixin, seed_query_budget_data
 from exams.models import Exam
+import asyncio
 import datetime
+from unittest import mock
 
 class ExamSchedulingTest(TestCase):
     def setUp(self):
@@ -46,3 +57,290 @@ class OTPTest(TestCase):
         otp.is_used = True
         otp.save()
         self.assertFalse(otp.is_valid())
+
+class BroadcastNotificationTest(TestCase):
+    def setUp(self):
+        self.student = CustomUser.objects.create_user(email="student@example.com", password="password")
+        self.other = CustomUser.objects.create_user(email="other@example.com", password="password")
+
+    def create_exam(self):
+        return Exam.objects.create(
+            name="Broadcast Exam",
+            banner="test_banner.jpg",
+            description="Description",
+            eligibility="All students",
+            exam_date=timezone.now() + datetime.timedelta(days=15),
+        )
+
+    def test_new_exam_creates_single_broadcast(self):
+        from accounts.models import BroadcastNotification, Notification
+        self.create_exam()
+        self.assertEqual(BroadcastNotification.objects.count(), 1)
+        self.assertEqual(Notification.objects.count(), 0)
+
+    def test_broadcast_merged_and_read_per_user(self):
+        from accounts.models import BroadcastNotification
+        self.create_exam()
+        broadcast = BroadcastNotification.objects.get()
+        self.client.force_login(self.student)
+
+        data = self.client.get('/accounts/notifications/').json()
+        self.assertEqual(data['unread_count'], 1)
+        self.assertEqual(data['notifications'][0]['kind'], 'broadcast')
+
+        self.client.post(f'/accounts/notifications/broadcasts/mark-read/{broadcast.id}/')
+        self.assertEqual(self.client.get('/accounts/notifications/').json()['unread_count'], 0)
+
+        self.client.force_login(self.other)
+        self.assertEqual(self.client.get('/accounts/notifications/').json()['unread_count'], 1)
+
+class NotificationPollingTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(email="poll@example.com", password="password")
+        self.client.force_login(self.user)
+
+    def test_unchanged_poll_returns_304(self):
+        first = self.client.get('/accounts/notifications/')
+        self.assertEqual(first.status_code, 200)
+        second = self.client.get('/accounts/notifications/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 304)
+
+    def test_new_notification_changes_etag_and_counter(self):
+        from accounts.models import Notification
+        etag = self.client.get('/accounts/notifications/')['ETag']
+        notification = Notification.objects.create(user=self.user, message="Hello")
+
+        response = self.client.get('/accounts/notifications/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['unread_count'], 1)
+
+        self.client.post(f'/accounts/notifications/mark-read/{notification.id}/')
+        self.client.post(f'/accounts/notifications/mark-read/{notification.id}/')
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.unread_notifications, 0)
+
+    def test_new_broadcast_changes_etag(self):
+        etag = self.client.get('/accounts/notifications/')['ETag']
+        Exam.objects.create(
+            name="Polling Exam",
+            banner="test_banner.jpg",
+            description="Description",
+            eligibility="All students",
+            exam_date=timezone.now() + datetime.timedelta(days=15),
+        )
+        response = self.client.get('/accounts/notifications/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['unread_count'], 1)
+
+    async def test_async_client_polls(self):
+        await Notification.objects.acreate(user=self.user, message="Hello")
+        await self.async_client.aforce_login(self.user)
+        first = await self.async_client.get('/accounts/notifications/')
+        self.assertEqual(first.json()['unread_count'], 1)
+        self.assertEqual(first.json()['notifications'][0]['message'], "Hello")
+        second = await self.async_client.get('/accounts/notifications/', headers={'If-None-Match': first['ETag']})
+        self.assertEqual(second.status_code, 304)
+
+class ResendOTPTest(TestCase):
+    async def test_resend_creates_new_otp_and_queues_email(self):
+        from jobs.models import Job
+        user = await CustomUser.objects.acreate(email="resend@example.com")
+        session = await self.async_client.asession()
+        await session.aset('otp_user_id', user.id)
+        await session.asave()
+        self.async_client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
+
+        response = await self.async_client.get('/accounts/resend-otp/')
+        self.assertRedirects(response, '/accounts/verify-otp/', fetch_redirect_response=False)
+        self.assertEqual(await OTP.objects.filter(user=user).acount(), 1)
+        self.assertTrue(await Job.objects.filter(name='accounts.send_otp_email').aexists())
+
+class NotificationStreamTest(TestCase):
+    def test_local_pubsub_delivers_to_subscribers(self):
+        from accounts.pubsub import LocalPubSub
+
+        async def roundtrip():
+            hub = LocalPubSub()
+            with hub.subscribe() as subscription:
+                hub.publish({'type': 'notification', 'user_ids': [1], 'data': {}})
+                received = await subscription.get(timeout=1)
+            self.assertEqual(received['type'], 'notification')
+            self.assertIsNone(await hub.subscribe().get(timeout=0.01))
+
+        async_to_sync(roundtrip)()
+
+    def test_event_addressing(self):
+        from accounts.pubsub import is_addressed_to
+        student = CustomUser(pk=1)
+        staff = CustomUser(pk=2, is_staff=True)
+        self.assertTrue(is_addressed_to({'user_ids': None}, student))
+        self.assertFalse(is_addressed_to({'user_ids': None}, staff))
+        self.assertFalse(is_addressed_to({'user_ids': [1]}, staff))
+
+    def test_listener_connects_with_plain_libpq_params(self):
+        from accounts import pubsub
+        settings_dict = {
+            'NAME': 'evalcore', 'USER': 'app', 'PASSWORD': 'secret', 'HOST': 'db', 'PORT': 5432,
+            'OPTIONS': {'sslmode': 'require', 'pool': {'max_size': 4}, 'prepare_threshold': None, 'server_side_binding': True},
+        }
+        expected = {'dbname': 'evalcore', 'user': 'app', 'password': 'secret', 'host': 'db', 'port': 5432, 'sslmode': 'require'}
+
+        with mock.patch.object(pubsub, 'psycopg') as psycopg:
+            pubsub.connect_listener(settings_dict)
+        psycopg.connect.assert_called_once_with(autocommit=True, **expected)
+
+        with mock.patch.object(pubsub, 'psycopg', None), mock.patch('psycopg2.connect') as connect:
+            conn = pubsub.connect_listener(settings_dict)
+        connect.assert_called_once_with(**expected)
+        self.assertTrue(conn.autocommit)
+
+    def test_stream_is_disabled_under_wsgi(self):
+        user = CustomUser.objects.create_user(email="wsgi@example.com", password="password")
+        self.client.force_login(user)
+        self.assertEqual(self.client.get('/accounts/notifications/stream/').status_code, 204)
+
+    async def test_stream_pushes_published_events(self):
+        from accounts.pubsub import get_pubsub
+        user = await sync_to_async(CustomUser.objects.create_user)(email="sse@example.com", password="password")
+        await self.async_client.aforce_login(user)
+        response = await self.async_client.get('/accounts/notifications/stream/')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+
+        events = aiter(response.streaming_content)
+        self.assertIn(b"retry:", await anext(events))
+        next_chunk = asyncio.ensure_future(anext(events))
+        await asyncio.sleep(0.05)  # let the stream subscribe
+        get_pubsub().publish({'type': 'notification', 'user_ids': [user.pk], 'data': {'message': 'Hi'}})
+        chunk = await asyncio.wait_for(next_chunk, 2)
+        self.assertIn(b"event: notification", chunk)
+        self.assertIn(b'"Hi"', chunk)
+        await events.aclose()
+
+class AccountQueryPlanTest(QueryPlanAssertionsMixin, TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email="plan@example.com", password="password")
+
+    def test_otp_lookup_uses_index(self):
+        self.assertUsesIndex(OTP.objects.filter(user=self.user, code='123456', is_used=False), 'otp_user_code_used_idx')
+
+    def test_unread_notifications_use_index(self):
+        # SQLite renders is_read=False as NOT "is_read", which it can't match
+        # against an index, so any index leading with user_id is accepted
+        self.assertUsesIndex(
+            Notification.objects.filter(user=self.user, is_read=False).order_by('-created_at'),
+            columns=['user_id'],
+        )
+
+class AccountViewBudgetTest(QueryBudgetTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.data = seed_query_budget_data()
+
+    def test_student_views(self):
+        student = self.data['student']
+        self.client.force_login(student)
+        self.assertEqual(self.client.get('/accounts/profile/').status_code, 200)
+        response = self.client.get('/accounts/notifications/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get('/accounts/notifications/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        notification = Notification.objects.filter(user=student).first()
+        self.client.post(f'/accounts/notifications/mark-read/{notification.id}/')
+        broadcast = response.json()['notifications'][0]
+        if broadcast['kind'] == 'broadcast':
+            self.client.post(f"/accounts/notifications/broadcasts/mark-read/{broadcast['id']}/")
+        self.client.post('/accounts/notifications/mark-all-read/')
+        self.assertEqual(self.client.get('/accounts/notifications/stream/').status_code, 204)
+        self.client.get('/accounts/logout/')
+
+    def test_signup_and_login_views(self):
+        self.client.get('/accounts/register/')
+        self.client.post('/accounts/register/', {
+            'email': 'budget-new@example.com', 'first_name': 'New', 'last_name': 'User',
+            'password': 'Sup3r-secret!', 'confirm_password': 'Sup3r-secret!',
+        })
+        self.client.get('/accounts/verify-otp/')
+        otp = OTP.objects.get(user__email='budget-new@example.com')
+        self.client.get('/accounts/resend-otp/')
+        self.client.post('/accounts/verify-otp/', {'otp_code': otp.code})
+        self.client.logout()
+        self.client.get('/accounts/login/')
+        response = self.client.post('/accounts/login/', {'email': 'budget-student@example.com', 'password': 'password'})
+        self.assertEqual(response.status_code, 302)
+
+@override_settings(USER_CACHE_ENABLED=True)
+class CachedUserTest(QueryBudgetTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = CustomUser.objects.create_user(email="cached@example.com", password="password", first_name="Ada")
+
+    def test_user_is_cached_until_saved(self):
+        get_cached_user(self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_cached_user(self.user.pk).email, "cached@example.com")
+        self.user.is_verified = True
+        self.user.save()
+        self.assertTrue(get_cached_user(self.user.pk).is_verified)
+
+    def test_password_hash_is_not_cached(self):
+        get_cached_user(self.user.pk)
+        row = shared_cache.get(f'auth:user:{self.user.pk}')[0]
+        self.assertNotIn('password', row)
+        self.assertEqual(row['session_auth_hashes'][0], self.user.get_session_auth_hash())
+
+    def test_password_change_ends_other_sessions(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get('/accounts/profile/').status_code, 200)
+        user = CustomUser.objects.get(pk=self.user.pk)
+        user.set_password('changed')
+        user.save()
+        self.assertEqual(self.client.get('/accounts/profile/').status_code, 302)
+
+    def test_counter_updates_drop_cached_user(self):
+        get_cached_user(self.user.pk)
+        bump_notification_state([self.user.pk], unread_delta=1)
+        self.assertEqual(get_cached_user(self.user.pk).unread_notifications, 1)
+
+    def test_other_fields_load_in_one_query(self):
+        user = get_cached_user(self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual((user.first_name, user.last_name), ("Ada", ""))
+        with self.assertNumQueries(1):
+            self.assertIsNone(user.last_login)
+
+    def test_deactivated_user_is_logged_out(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get('/accounts/profile/').status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/accounts/profile/').status_code, 302)
+
+    def test_allauth_logins_use_the_cache(self):
+        self.client.force_login(self.user, backend='accounts.backends.CachedAuthenticationBackend')
+        self.client.get('/accounts/profile/')
+        with mock.patch('accounts.backends.get_cached_user', wraps=get_cached_user) as loader:
+            self.assertEqual(self.client.get('/accounts/profile/').status_code, 200)
+        loader.assert_called_once_with(self.user.pk)
+
+    def test_sessions_from_old_backends_stay_logged_in(self):
+        for old, new in UPGRADED_BACKENDS.items():
+            self.client.force_login(self.user, backend=old)
+            self.assertEqual(self.client.get('/accounts/profile/').status_code, 200, old)
+            self.assertEqual(self.client.session[BACKEND_SESSION_KEY], new)
+
+    @override_settings(USER_CACHE_ENABLED=False)
+    def test_disabled_cache_reads_the_database(self):
+        self.client.force_login(self.user)
+        self.client.get('/accounts/profile/')
+        with mock.patch('accounts.backends.get_cached_user') as loader:
+            self.assertEqual(self.client.get('/accounts/profile/').status_code, 200)
+        loader.assert_not_called()
+
+    def test_sync_and_async_access_share_one_load(self):
+        self.client.force_login(self.user)
+        request = RequestFactory().get('/')
+        request.session = self.client.session
+        AuthenticationMiddleware(lambda request: None).process_request(request)
+        self.assertEqual(request.user.pk, self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertIs(async_to_sync(request.auser)(), request._cached_user)
@@ -1,10 +1,17 @@
+import logging
 import random
 import string
 from django.core.mail import EmailMultiAlternatives
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 from django.conf import settings
-from .models import OTP
+from core.cache import shared_cache
+from django.db.models import Exists, OuterRef, F
+from django.db.models.functions import Greatest
+from .backends import invalidate_cached_users
+from .models import CustomUser, OTP, BroadcastNotification, BroadcastReceipt
+
+logger = logging.getLogger(__name__)
 
 def generate_otp():
     return ''.join(random.choices(string.digits, k=6))
@@ -29,11 +36,80 @@ def send_otp_email(user, otp_code):
     msg.send()
 
 def create_and_send_otp(user):
+    from jobs.queue import enqueue
     otp_code = generate_otp()
-    OTP.objects.create(user=user, code=otp_code)
+    otp = OTP.objects.create(user=user, code=otp_code)
     try:
-        send_otp_email(user, otp_code)
+        enqueue('accounts.send_otp_email', {'otp_id': otp.id}, idempotency_key=f"otp:{otp.id}")
         return True
-    except Exception as e:
-        print(f"Error sending email: {e}")
+    except Exception:
+        logger.exception("Could not queue the OTP email for user %s", user.pk)
         return False
+
+async def acreate_and_send_otp(user):
+    from jobs.queue import aenqueue
+    otp = await OTP.objects.acreate(user=user, code=generate_otp())
+    try:
+        await aenqueue('accounts.send_otp_email', {'otp_id': otp.id}, idempotency_key=f"otp:{otp.id}")
+        return True
+    except Exception:
+        logger.exception("Could not queue the OTP email for user %s", user.pk)
+        return False
+
+def get_visible_broadcasts(user):
+    """Broadcasts a student should see, annotated with their read state."""
+    if user.is_staff:
+        return BroadcastNotification.objects.none()
+    return BroadcastNotification.objects.filter(created_at__gte=user.date_joined).annotate(
+        is_read=Exists(BroadcastReceipt.objects.filter(user=user, broadcast=OuterRef('pk')))
+    )
+
+async def aget_user_notifications(user, limit=10):
+    """Merges personal and broadcast notifications at read time, newest first."""
+    personal = [
+        {'kind': 'personal', 'obj': n, 'is_read': n.is_read}
+        async for n in user.notifications.all()[:limit]
+    ]
+    broadcasts = [
+        {'kind': 'broadcast', 'obj': b, 'is_read': b.is_read}
+        async for b in get_visible_broadcasts(user)[:limit]
+    ]
+    merged = sorted(personal + broadcasts, key=lambda item: item['obj'].created_at, reverse=True)
+    return merged[:limit]
+
+async def aget_unread_notification_count(user):
+    broadcasts = await get_visible_broadcasts(user).filter(is_read=False).acount()
+    return user.unread_notifications + broadcasts
+
+def bump_notification_state(user_ids, unread_delta=0):
+    """Adjusts the unread counter and bumps the version for the given users in one UPDATE."""
+    CustomUser.objects.filter(pk__in=user_ids).update(
+        unread_notifications=Greatest(F('unread_notifications') + unread_delta, 0),
+        notifications_version=F('notifications_version') + 1,
+    )
+    invalidate_cached_users(user_ids)
+
+LATEST_BROADCAST_CACHE_KEY = 'notifications:latest_broadcast'
+# Bounds how long a missed update can hide a new broadcast from polls
+LATEST_BROADCAST_CACHE_TIMEOUT = 60 * 5
+
+async def aget_latest_broadcast_id():
+    latest = await shared_cache.aget(LATEST_BROADCAST_CACHE_KEY)
+    if latest is None:
+        latest = await BroadcastNotification.objects.order_by('-id').values_list('id', flat=True).afirst() or 0
+        await shared_cache.aset(LATEST_BROADCAST_CACHE_KEY, latest, LATEST_BROADCAST_CACHE_TIMEOUT)
+    return latest
+
+async def anotifications_etag(user):
+    """Changes whenever the user's notification drawer could look different."""
+    return f'"n{user.notifications_version}-b{await aget_latest_broadcast_id()}"'
+
+def mark_broadcasts_read(user, broadcasts):
+    broadcasts = list(broadcasts)
+    if not broadcasts:
+        return
+    BroadcastReceipt.objects.bulk_create(
+        [BroadcastReceipt(user=user, broadcast=b) for b in broadcasts],
+        ignore_conflicts=True
+    )
+    bump_notification_state([user.pk])
@@ -1,13 +1,26 @@
+import asyncio
+import json
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, authenticate, logout
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from .forms import RegistrationForm, LoginForm, OTPForm
 from .models import CustomUser, OTP, Notification
-from .utils import create_and_send_otp
+from .pubsub import get_pubsub, is_addressed_to
+from .utils import (
+    create_and_send_otp, acreate_and_send_otp, aget_user_notifications, aget_unread_notification_count,
+    get_visible_broadcasts, mark_broadcasts_read, bump_notification_state, anotifications_etag
+)
+from django.utils.cache import get_conditional_response
 from registrations.models import Registration
+from core.query_budget import query_budget
 
+# One more than the page needs: the first request of a session from before the
+# cached auth backends rewrites its backend path (see accounts.middleware)
+@query_budget(6)
 @login_required
 def profile_view(request):
     registrations = Registration.objects.filter(student=request.user).select_related('exam')
@@ -16,6 +29,7 @@ def profile_view(request):
         'registrations': registrations
     })
 
+@query_budget(12)
 def register_view(request):
     if request.method == 'POST':
         form = RegistrationForm(request.POST)
@@ -37,6 +51,7 @@ def register_view(request):
         form = RegistrationForm()
     return render(request, 'accounts/register.html', {'form': form})
 
+@query_budget(17)
 def verify_otp_view(request):
     user_id = request.session.get('otp_user_id')
     if not user_id:
@@ -53,7 +68,7 @@ def verify_otp_view(request):
                 user.save()
                 otp.is_used = True
                 otp.save()
-                login(request, user)
+                login(request, user, backend='accounts.backends.CachedModelBackend')
                 del request.session['otp_user_id']
                 messages.success(request, "Email verified successfully! Welcome to the portal.")
                 return redirect('profile')
@@ -63,6 +78,7 @@ def verify_otp_view(request):
         form = OTPForm()
     return render(request, 'accounts/verify_otp.html', {'form': form, 'user': user})
 
+@query_budget(11)
 def login_view(request):
     if request.method == 'POST':
         form = LoginForm(request.POST)
@@ -87,24 +103,26 @@ def login_view(request):
         form = LoginForm()
     return render(request, 'accounts/login.html', {'form': form})
 
+@query_budget(6)
 def logout_view(request):
     logout(request)
     messages.info(request, "You have been logged out.")
     return redirect('login')
 
-def resend_otp_view(request):
-    user_id = request.session.get('otp_user_id')
+@query_budget(8)
+async def resend_otp_view(request):
+    user_id = await request.session.aget('otp_user_id')
     if not user_id:
         messages.error(request, "Session expired. Please register or login again.")
         return redirect('register' if request.path.endswith('register') else 'login')
     
     try:
-        user = CustomUser.objects.get(id=user_id)
+        user = await CustomUser.objects.aget(id=user_id)
         if user.is_verified:
             messages.info(request, "Account already verified.")
             return redirect('login')
             
-        if create_and_send_otp(user):
+        if await acreate_and_send_otp(user):
             messages.success(request, "A new verification code has been sent to your email.")
         else:
             messages.error(request, "Failed to send new OTP. Please try again later.")
@@ -115,36 +133,89 @@ def resend_otp_view(request):
         
     return redirect('verify_otp')
 
+@query_budget(7)
 @login_required
-def get_notifications(request):
-    notifications = request.user.notifications.all()[:10]
-    unread_count = request.user.notifications.filter(is_read=False).count()
+async def get_notifications(request):
+    # Most polls find nothing new: answer those from the user row alone
+    user = await request.auser()
+    etag = await anotifications_etag(user)
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return not_modified
+
+    notifications = await aget_user_notifications(user, limit=10)
+    unread_count = await aget_unread_notification_count(user)
     data = {
         'notifications': [
             {
-                'id': n.id,
-                'message': n.message,
-                'link': n.link or '#',
-                'is_read': n.is_read,
-                'created_at': n.created_at.strftime("%b %d, %H:%M")
-            } for n in notifications
+                'id': item['obj'].id,
+                'kind': item['kind'],
+                'message': item['obj'].message,
+                'link': item['obj'].link or '#',
+                'is_read': item['is_read'],
+                'created_at': item['obj'].created_at.strftime("%b %d, %H:%M")
+            } for item in notifications
         ],
         'unread_count': unread_count
     }
-    return JsonResponse(data)
+    response = JsonResponse(data)
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
 
+@query_budget(7)
 @login_required
 def mark_notification_read(request, notification_id):
     if request.method == 'POST':
         notification = get_object_or_404(Notification, id=notification_id, user=request.user)
-        notification.is_read = True
-        notification.save()
+        if not notification.is_read:
+            notification.is_read = True
+            notification.save(update_fields=['is_read'])
+            bump_notification_state([request.user.pk], unread_delta=-1)
         return JsonResponse({'status': 'success'})
     return JsonResponse({'status': 'error', 'message': 'Invalid request method.'}, status=405)
 
+@query_budget(7)
+@login_required
+def mark_broadcast_read(request, broadcast_id):
+    if request.method == 'POST':
+        broadcast = get_object_or_404(get_visible_broadcasts(request.user), id=broadcast_id)
+        mark_broadcasts_read(request.user, [broadcast])
+        return JsonResponse({'status': 'success'})
+    return JsonResponse({'status': 'error', 'message': 'Invalid request method.'}, status=405)
+
+@query_budget(9)
 @login_required
 def mark_all_notifications_read(request):
     if request.method == 'POST':
-        request.user.notifications.filter(is_read=False).update(is_read=True)
+        marked = request.user.notifications.filter(is_read=False).update(is_read=True)
+        if marked:
+            bump_notification_state([request.user.pk], unread_delta=-marked)
+        mark_broadcasts_read(request.user, get_visible_broadcasts(request.user).filter(is_read=False))
         return JsonResponse({'status': 'success'})
     return JsonResponse({'status': 'error', 'message': 'Invalid request method.'}, status=405)
+
+async def _notification_events(user):
+    yield "retry: 5000\n\n"
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.NOTIFICATION_STREAM_MAX_SECONDS
+    with get_pubsub().subscribe() as subscription:
+        while loop.time() < deadline:
+            event = await subscription.get(timeout=settings.NOTIFICATION_STREAM_HEARTBEAT_SECONDS)
+            if event is None:
+                yield ": keepalive\n\n"
+            elif is_addressed_to(event, user):
+                yield f"event: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+
+@query_budget(4)
+@login_required
+async def notification_stream(request):
+    # Long-lived streams only make sense on an event loop; 204 tells EventSource
+    # not to reconnect, so WSGI deployments fall back to polling.
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+    user = await request.auser()
+    response = StreamingHttpResponse(_notification_events(user), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,37 @@
+import base64
+import datetime
+from django.db.models import Q
+
+def encode_cursor(registered_at, pk):
+    raw = f"{registered_at.isoformat()}|{pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor):
+    """Returns (registered_at, pk) for a cursor, or None if it is missing or malformed."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        registered_at, pk = raw.rsplit('|', 1)
+        return datetime.datetime.fromisoformat(registered_at), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+def keyset_page(queryset, cursor=None, page_size=50):
+    """
+    Returns one page of `queryset` ordered newest first on (registered_at, id),
+    plus the cursor for the next page. Seeks past the cursor instead of using
+    OFFSET, so deep pages cost the same as the first one.
+    """
+    queryset = queryset.order_by('-registered_at', '-id')
+    position = decode_cursor(cursor)
+    if position:
+        registered_at, pk = position
+        queryset = queryset.filter(Q(registered_at__lt=registered_at) | Q(registered_at=registered_at, id__lt=pk))
+
+    items = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        next_cursor = encode_cursor(items[-1].registered_at, items[-1].id)
+    return items, next_cursor
@@ -0,0 +1,55 @@
+from core.cache import shared_cache
+from django.urls import reverse
+from registrations.models import Registration
+
+REVIEW_QUEUE_SIZE = 20
+REVIEW_LEASE_SECONDS = 60 * 5
+
+def _lease_key(registration_id):
+    return f'admin_panel:review-lease:{registration_id}'
+
+def next_pending(exam, reviewer, after_id=0, limit=REVIEW_QUEUE_SIZE):
+    """
+    Returns (registrations, last_scanned_id) for the next pending entries of
+    `exam`, oldest first. Each entry is leased to `reviewer` for a few minutes
+    so reviewers working the same exam don't get the same items.
+    """
+    candidates = list(
+        Registration.objects.filter(exam=exam, status='Pending', id__gt=after_id)
+        .select_related('student')
+        .order_by('id')[:limit * 3]
+    )
+    leases = shared_cache.get_many([_lease_key(reg.id) for reg in candidates])
+
+    items = []
+    last_scanned_id = after_id
+    for registration in candidates:
+        last_scanned_id = registration.id
+        holder = leases.get(_lease_key(registration.id))
+        if holder is None:
+            if not shared_cache.add(_lease_key(registration.id), reviewer.pk, REVIEW_LEASE_SECONDS):
+                continue
+        elif holder != reviewer.pk:
+            continue
+        items.append(registration)
+        if len(items) == limit:
+            break
+    return items, last_scanned_id
+
+def release_lease(registration_id, reviewer=None):
+    """Frees a registration for other reviewers; with `reviewer`, only if they hold it."""
+    key = _lease_key(registration_id)
+    if reviewer is None or shared_cache.get(key) == reviewer.pk:
+        shared_cache.delete(key)
+
+def serialize_review_item(registration):
+    return {
+        'id': registration.id,
+        'name': registration.student.get_full_name(),
+        'email': registration.student.email,
+        'registered_at': registration.registered_at.isoformat(),
+        'payment_status': registration.payment_status,
+        'document_url': registration.document.url if registration.document else '',
+        'thumbnail_url': reverse('admin_panel:document_thumbnail', args=[registration.id]) if registration.document else '',
+        'detail_url': reverse('admin_panel:registration_detail', args=[registration.id]),
+    }
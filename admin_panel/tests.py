@@ -1,3 +1,301 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from unittest import mock
+from PIL import Image
+from django.utils import timezone
+from accounts.models import CustomUser
+from exams.models import Exam
+from jobs.models import Job
+from registrations.models import Registration, BulkTransition, RegistrationSequence
+from registrations.thumbnails import render_document_thumbnail
+from admin_panel.pagination import keyset_page, decode_cursor
+from core.testing import QueryBudgetTestMixin, seed_query_budget_data
+import csv
+import datetime
+import io
+import tempfile
 
-# Create your tests here.
+class AdminDashboardTest(TestCase):
+    def setUp(self):
+        self.staff = CustomUser.objects.create_user(email="staff@example.com", password="password", is_staff=True)
+        self.exam = Exam.objects.create(
+            name="Dashboard Exam",
+            banner="test_banner.jpg",
+            description="Description",
+            eligibility="All students",
+            exam_date=timezone.now() + datetime.timedelta(days=15),
+        )
+        statuses = ['Pending', 'Pending', 'Approved', 'Rejected', 'Hold']
+        for i, status in enumerate(statuses):
+            student = CustomUser.objects.create_user(email=f"dash{i}@example.com", password="password")
+            Registration.objects.create(student=student, exam=self.exam, document="doc.pdf", status=status)
+
+    def test_status_counts_in_one_query(self):
+        self.client.force_login(self.staff)
+        response = self.client.get('/superuser/dashboard/')
+        self.assertEqual(response.context['counts'], {
+            'total': 5, 'pending': 2, 'approved': 1, 'rejected': 1, 'hold': 1,
+        })
+
+    def test_filters(self):
+        self.client.force_login(self.staff)
+        response = self.client.get('/superuser/dashboard/', {'status': 'Pending'})
+        self.assertEqual(len(response.context['registrations']), 2)
+        response = self.client.get('/superuser/dashboard/', {'q': 'dash3'})
+        self.assertEqual([r.student.email for r in response.context['registrations']], ['dash3@example.com'])
+
+    def test_keyset_pages_cover_every_row_once(self):
+        # Identical timestamps force the id tie-breaker to do the work
+        Registration.objects.update(registered_at=timezone.now())
+        seen = []
+        cursor = None
+        while True:
+            page, cursor = keyset_page(Registration.objects.all(), cursor, page_size=2)
+            seen.extend(reg.id for reg in page)
+            if not cursor:
+                break
+        self.assertEqual(sorted(seen), sorted(Registration.objects.values_list('id', flat=True)))
+        self.assertEqual(len(seen), len(set(seen)))
+
+    def test_malformed_cursor_is_ignored(self):
+        self.assertIsNone(decode_cursor('not-a-cursor'))
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class DocumentThumbnailTest(TestCase):
+    def setUp(self):
+        self.staff = CustomUser.objects.create_user(email="reviewer@example.com", password="password", is_staff=True)
+        self.student = CustomUser.objects.create_user(email="doc@example.com", password="password")
+        self.exam = Exam.objects.create(
+            name="Thumbnail Exam",
+            banner="test_banner.jpg",
+            description="Description",
+            eligibility="All students",
+            exam_date=timezone.now() + datetime.timedelta(days=15),
+        )
+        photo = io.BytesIO()
+        Image.new('RGB', (2400, 1600), 'navy').save(photo, format='JPEG')
+        self.registration = Registration.objects.create(
+            student=self.student, exam=self.exam, document=SimpleUploadedFile('scan.jpg', photo.getvalue())
+        )
+        self.client.force_login(self.staff)
+
+    def test_thumbnail_is_built_once_and_small(self):
+        url = f'/superuser/registration/{self.registration.id}/thumbnail.jpg'
+        response = self.client.get(url)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+        thumbnail = Image.open(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertLessEqual(max(thumbnail.size), 320)
+
+        self.registration.refresh_from_db()
+        name = self.registration.document_thumbnail.name
+        with mock.patch('registrations.thumbnails.render_document_thumbnail') as render:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        render.assert_not_called()
+        self.registration.refresh_from_db()
+        self.assertEqual(self.registration.document_thumbnail.name, name)
+
+    def test_pdf_and_unreadable_documents_get_placeholders(self):
+        self.registration.document = SimpleUploadedFile('form.pdf', b'%PDF-1.4 not really')
+        self.registration.save()
+        response = self.client.get(f'/superuser/registration/{self.registration.id}/thumbnail.jpg')
+        self.assertEqual(response.status_code, 200)
+
+    def test_unreadable_storage_is_not_cached_as_a_placeholder(self):
+        url = f'/superuser/registration/{self.registration.id}/thumbnail.jpg'
+        with mock.patch('django.core.files.storage.FileSystemStorage.open', side_effect=FileNotFoundError):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Cache-Control'], 'no-store')
+        self.registration.refresh_from_db()
+        self.assertFalse(self.registration.document_thumbnail)
+
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.registration.refresh_from_db()
+        self.assertTrue(self.registration.document_thumbnail)
+
+    def test_decompression_bombs_get_placeholders(self):
+        with mock.patch('registrations.thumbnails.Image.open', side_effect=Image.DecompressionBombError("too big")):
+            content = render_document_thumbnail(self.registration.document)
+        self.assertEqual(Image.open(io.BytesIO(content)).format, 'JPEG')
+
+    def test_command_prewarms_exam(self):
+        call_command('generate_thumbnails', self.exam.id, stdout=io.StringIO())
+        self.registration.refresh_from_db()
+        self.assertTrue(self.registration.document_thumbnail.name.startswith('registrations/thumbnails/'))
+
+class ReviewQueueTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.reviewer = CustomUser.objects.create_user(email="rev1@example.com", password="password", is_staff=True)
+        self.other_reviewer = CustomUser.objects.create_user(email="rev2@example.com", password="password", is_staff=True)
+        self.exam = Exam.objects.create(
+            name="Queue Exam",
+            banner="test_banner.jpg",
+            description="Description",
+            eligibility="All students",
+            exam_date=timezone.now() + datetime.timedelta(days=15),
+        )
+        for i in range(4):
+            student = CustomUser.objects.create_user(email=f"queue{i}@example.com", password="password")
+            Registration.objects.create(student=student, exam=self.exam, document="doc.pdf")
+
+    def test_reviewers_get_disjoint_items(self):
+        self.client.force_login(self.reviewer)
+        with mock.patch('admin_panel.views.REVIEW_QUEUE_SIZE', 2):
+            first = self.client.get(f'/superuser/exams/{self.exam.id}/review/items/').json()
+        self.client.force_login(self.other_reviewer)
+        second = self.client.get(f'/superuser/exams/{self.exam.id}/review/items/').json()
+
+        first_ids = {item['id'] for item in first['items']}
+        second_ids = {item['id'] for item in second['items']}
+        self.assertEqual(len(first_ids), 2)
+        self.assertEqual(len(first_ids | second_ids), 4)
+        self.assertFalse(first_ids & second_ids)
+
+    def test_skip_hands_the_item_to_other_reviewers(self):
+        self.client.force_login(self.reviewer)
+        items = self.client.get(f'/superuser/exams/{self.exam.id}/review/items/').json()['items']
+        skipped = items[0]['id']
+
+        self.client.force_login(self.other_reviewer)
+        self.client.post(f'/superuser/registration/{skipped}/skip/')
+        self.assertEqual(self.client.get(f'/superuser/exams/{self.exam.id}/review/items/').json()['items'], [])
+
+        self.client.force_login(self.reviewer)
+        self.assertEqual(self.client.post(f'/superuser/registration/{skipped}/skip/').status_code, 200)
+        self.client.force_login(self.other_reviewer)
+        other_items = self.client.get(f'/superuser/exams/{self.exam.id}/review/items/').json()['items']
+        self.assertEqual([item['id'] for item in other_items], [skipped])
+
+    def test_decision_is_json_and_queues_email(self):
+        registration = Registration.objects.first()
+        self.client.force_login(self.reviewer)
+        response = self.client.post(f'/superuser/registration/{registration.id}/decision/', {'status': 'Approved'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'Approved')
+        self.assertTrue(response.json()['registration_number'])
+        self.assertTrue(Job.objects.filter(name='registrations.send_status_email').exists())
+
+    def test_stale_decision_conflicts(self):
+        registration = Registration.objects.first()
+        self.client.force_login(self.reviewer)
+        self.client.post(f'/superuser/registration/{registration.id}/decision/', {'status': 'Approved'})
+        response = self.client.post(f'/superuser/registration/{registration.id}/decision/', {'status': 'Rejected', 'reason': 'Blurry'})
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['status'], 'Approved')
+
+class ExportRegistrationsTest(TestCase):
+    def setUp(self):
+        self.staff = CustomUser.objects.create_user(email="exporter@example.com", password="password", is_staff=True)
+        self.exam = Exam.objects.create(
+            name="Export Exam",
+            banner="test_banner.jpg",
+            description="Description",
+            eligibility="All students",
+            exam_date=timezone.now() + datetime.timedelta(days=15),
+        )
+        for i, status in enumerate(['Approved', 'Pending', 'Approved']):
+            student = CustomUser.objects.create_user(email=f"export{i}@example.com", password="password", first_name="=HYPERLINK(1)")
+            Registration.objects.create(student=student, exam=self.exam, document="doc.pdf", status=status,
+                                        registration_number=f"REG-{i}" if status == 'Approved' else None)
+
+    def test_streams_csv_with_filter(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(f'/superuser/exams/{self.exam.id}/registrations/export.csv', {'status': 'Approved'})
+
+        self.assertTrue(response.streaming)
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode('utf-8'))))
+        self.assertEqual(rows[0][:2], ['Registration Number', 'Email'])
+        self.assertEqual([row[0] for row in rows[1:]], ['REG-0', 'REG-2'])
+        self.assertEqual(rows[1][2], "'=HYPERLINK(1)")
+        self.assertIn('export-exam-approved-registrations.csv', response['Content-Disposition'])
+
+    def test_command_writes_all_rows(self):
+        out = io.StringIO()
+        call_command('export_registrations', self.exam.id, stdout=out)
+        self.assertEqual(len(out.getvalue().strip().splitlines()), 4)
+
+class ImportRegistrationsViewTest(TestCase):
+    def test_upload_imports_csv(self):
+        staff = CustomUser.objects.create_user(email="importer@example.com", password="password", is_staff=True)
+        exam = Exam.objects.create(
+            name="Import Exam",
+            banner="test_banner.jpg",
+            description="Description",
+            eligibility="All students",
+            exam_date=timezone.now() + datetime.timedelta(days=15),
+        )
+        upload = SimpleUploadedFile('cohort.csv', b'\xef\xbb\xbfEmail,First_Name\ncohort1@example.com,Ada\nbroken,\n', content_type='text/csv')
+        self.client.force_login(staff)
+        response = self.client.post(f'/superuser/exams/{exam.id}/registrations/import/', {'file': upload}, follow=True)
+
+        self.assertTrue(Registration.objects.filter(exam=exam, student__email='cohort1@example.com').exists())
+        self.assertEqual(response.context['latest_import'].error_count, 1)
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class AdminViewBudgetTest(QueryBudgetTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.data = seed_query_budget_data()
+        # The seeded registrations point at this file; thumbnails of missing documents are 503s
+        if not default_storage.exists('doc.pdf'):
+            default_storage.save('doc.pdf', ContentFile(b'%PDF-1.4'))
+        self.exam = self.data['exams'][0]
+        self.client.force_login(self.data['staff'])
+
+    def test_read_views(self):
+        registration = self.data['registrations'][0]
+        for url in [
+            '/superuser/dashboard/',
+            '/superuser/dashboard/?status=Pending',
+            '/superuser/dashboard/?q=budget1',
+            '/superuser/profile/',
+            '/superuser/exams/',
+            f'/superuser/exams/{self.exam.id}/update/',
+            f'/superuser/exams/{self.exam.id}/delete/',
+            f'/superuser/exams/{self.exam.id}/registrations/',
+            f'/superuser/exams/{self.exam.id}/review/',
+            f'/superuser/exams/{self.exam.id}/review/items/',
+            f'/superuser/registration/{registration.id}/view/',
+            f'/superuser/registration/{registration.id}/thumbnail.jpg',
+            '/superuser/exams/create/',
+        ]:
+            self.assertEqual(self.client.get(url).status_code, 200, url)
+        response = self.client.get(f'/superuser/exams/{self.exam.id}/registrations/export.csv')
+        b''.join(response.streaming_content)
+
+    def test_write_views(self):
+        pending = [reg for reg in self.data['registrations'] if reg.status == 'Pending']
+        self.client.post(f'/superuser/registration/{pending[0].id}/status/Approved/')
+        self.client.post(f'/superuser/registration/{pending[1].id}/decision/', {'status': 'Rejected', 'reason': 'Blurry'})
+        self.client.post(f'/superuser/registration/{pending[1].id}/skip/')
+        self.client.post(f'/superuser/registration/{self.data["registrations"][1].id}/delete/')
+        self.client.post(f'/superuser/exams/{self.exam.id}/bulk-update/Approved/', {'bulk_reason': ''})
+        transition = BulkTransition.objects.get()
+        self.assertEqual(self.client.get(f'/superuser/bulk-updates/{transition.id}/progress/').status_code, 200)
+        upload = SimpleUploadedFile('cohort.csv', b'email\nbudget-import@example.com\n', content_type='text/csv')
+        self.client.post(f'/superuser/exams/{self.exam.id}/registrations/import/', {'file': upload})
+        self.client.post(f'/superuser/exams/{self.data["exams"][1].id}/delete/')
+
+    def test_approve_decision(self):
+        # Worst case: a fresh number and the first one issued for the year
+        registration = next(reg for reg in self.data['registrations'] if reg.status == 'Pending')
+        Registration.objects.filter(pk=registration.pk).update(registration_number=None)
+        RegistrationSequence.objects.all().delete()
+        response = self.client.post(f'/superuser/registration/{registration.id}/decision/', {'status': 'Approved'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['registration_number'])
+
+    def test_login_view(self):
+        self.client.logout()
+        self.client.get('/superuser/')
+        response = self.client.post('/superuser/', {'email': 'budget-staff@example.com', 'password': 'password'})
+        self.assertEqual(response.status_code, 302)
@@ -9,6 +9,7 @@ urlpatterns = [
     path('registration/<int:reg_id>/status/<str:status>/', views.update_registration_status, name='update_registration_status'),
     path('registration/<int:reg_id>/delete/', views.delete_registration, name='delete_registration'),
     path('registration/<int:reg_id>/view/', views.registration_detail, name='registration_detail'),
+    path('registration/<int:reg_id>/thumbnail.jpg', views.document_thumbnail, name='document_thumbnail'),
     path('profile/', views.admin_profile, name='profile'),
     
     path('exams/', views.admin_exam_list, name='exam_list'),
@@ -17,4 +18,11 @@ urlpatterns = [
     path('exams/<int:pk>/delete/', views.exam_delete, name='exam_delete'),
     path('exams/<int:exam_id>/registrations/', views.exam_registrations, name='exam_registrations'),
     path('exams/<int:exam_id>/bulk-update/<str:status>/', views.bulk_update_registrations, name='bulk_update_registrations'),
+    path('exams/<int:exam_id>/registrations/export.csv', views.export_exam_registrations, name='export_exam_registrations'),
+    path('exams/<int:exam_id>/registrations/import/', views.import_exam_registrations, name='import_exam_registrations'),
+    path('exams/<int:exam_id>/review/', views.review_queue, name='review_queue'),
+    path('exams/<int:exam_id>/review/items/', views.review_queue_items, name='review_queue_items'),
+    path('registration/<int:reg_id>/decision/', views.review_decision, name='review_decision'),
+    path('registration/<int:reg_id>/skip/', views.review_skip, name='review_skip'),
+    path('bulk-updates/<int:transition_id>/progress/', views.bulk_transition_progress, name='bulk_transition_progress'),
 ]
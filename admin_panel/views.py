@@ -2,11 +2,33 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import login, authenticate, logout
 from django.contrib import messages
+from django.http import HttpResponse, JsonResponse, FileResponse, Http404, StreamingHttpResponse
+from django.utils.text import slugify
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from django.db import transaction
+from django.db.models import Count, Q
+from django.views.decorators.http import require_POST
+from urllib.parse import urlencode
+import csv
+import io
 from exams.models import Exam
 from exams.forms import ExamForm
-from registrations.models import Registration
-from registrations.utils import send_status_email
+from registrations.models import Registration, BulkTransition
+from registrations.admission import sync_seats
+from registrations.bulk import transition_registrations
+from registrations.utils import generate_registration_number
+from registrations.thumbnails import build_document_thumbnail, unavailable_thumbnail
+from registrations.exports import iter_csv
+from registrations.imports import import_registrations
+from jobs.queue import enqueue
 from accounts.forms import LoginForm
+from .pagination import keyset_page
+from .review import REVIEW_QUEUE_SIZE, next_pending, release_lease, serialize_review_item
+from core.query_budget import query_budget
+
+DASHBOARD_PAGE_SIZE = 50
+STATUS_FILTERS = ['Pending', 'Approved', 'Rejected', 'Hold']
 
 def staff_required(view_func):
     def _wrapped_view(request, *args, **kwargs):
@@ -18,6 +40,7 @@ def staff_required(view_func):
         return view_func(request, *args, **kwargs)
     return _wrapped_view
 
+@query_budget(11)
 def admin_login_view(request):
     if request.user.is_authenticated and request.user.is_staff:
         return redirect('admin_panel:dashboard')
@@ -40,22 +63,48 @@ def admin_login_view(request):
         form = LoginForm()
     return render(request, 'admin_panel/login.html', {'form': form})
 
+@query_budget(7)
 @login_required
 @staff_required
 def admin_dashboard(request):
-    counts = {
-        'total': Registration.objects.count(),
-        'pending': Registration.objects.filter(status='Pending').count(),
-        'approved': Registration.objects.filter(status='Approved').count(),
-        'rejected': Registration.objects.filter(status='Rejected').count(),
-        'hold': Registration.objects.filter(status='Hold').count(),
+    counts = Registration.objects.aggregate(
+        total=Count('id'),
+        pending=Count('id', filter=Q(status='Pending')),
+        approved=Count('id', filter=Q(status='Approved')),
+        rejected=Count('id', filter=Q(status='Rejected')),
+        hold=Count('id', filter=Q(status='Hold')),
+    )
+
+    filters = {
+        'status': request.GET.get('status', ''),
+        'exam': request.GET.get('exam', ''),
+        'q': request.GET.get('q', '').strip(),
     }
-    registrations = Registration.objects.all().select_related('student', 'exam').order_by('-registered_at')
+    registrations = Registration.objects.select_related('student', 'exam')
+    if filters['status'] in STATUS_FILTERS:
+        registrations = registrations.filter(status=filters['status'])
+    if filters['exam'].isdigit():
+        registrations = registrations.filter(exam_id=filters['exam'])
+    if filters['q']:
+        if filters['q'].upper().startswith('REG-'):
+            registrations = registrations.filter(registration_number=filters['q'].upper())
+        else:
+            registrations = registrations.filter(student__email__startswith=filters['q'])
+
+    registrations, next_cursor = keyset_page(registrations, request.GET.get('cursor'), page_size=DASHBOARD_PAGE_SIZE)
+    active_filters = {key: value for key, value in filters.items() if value}
     return render(request, 'admin_panel/dashboard.html', {
         'registrations': registrations,
-        'counts': counts
+        'counts': counts,
+        'filters': filters,
+        'status_filters': STATUS_FILTERS,
+        'exams': Exam.objects.only('id', 'name').order_by('name'),
+        'next_query': urlencode({**active_filters, 'cursor': next_cursor}) if next_cursor else None,
+        'first_query': urlencode(active_filters),
+        'is_first_page': not request.GET.get('cursor'),
     })
 
+@query_budget(4)
 @login_required
 @staff_required
 def admin_profile(request):
@@ -63,43 +112,62 @@ def admin_profile(request):
         'user': request.user
     })
 
-@login_required
-@staff_required
-def update_registration_status(request, reg_id, status):
-    registration = get_object_or_404(Registration, id=reg_id)
-    reason = request.POST.get('rejection_reason', '')
-    
-    if status not in ['Approved', 'Rejected', 'Hold']:
-        messages.error(request, "Invalid status.")
-        return redirect('admin_panel:dashboard')
-    
+DECISION_STATUSES = ['Approved', 'Rejected', 'Hold']
+
+def _save_status(registration, status, reason):
     registration.status = status
     if status == 'Rejected' and reason:
         registration.rejection_reason = reason
     elif status == 'Hold' and reason:
         registration.hold_reason = reason
+    if status == 'Approved' and not registration.registration_number:
+        registration.registration_number = generate_registration_number(registration)
     
     registration.save()
+    sync_seats(Registration.objects.filter(pk=registration.pk))
+
+def _queue_status_jobs(registration, status, reason):
+    # Queue automated email notification
+    enqueue('registrations.send_status_email', {
+        'registration_id': registration.id,
+        'status': status,
+        'reason': reason,
+    })
+    if status == 'Approved':
+        enqueue('registrations.build_hall_tickets', {'registration_ids': [registration.id]})
+
+@query_budget(10)
+@login_required
+@staff_required
+def update_registration_status(request, reg_id, status):
+    registration = get_object_or_404(Registration.objects.select_related('student', 'exam'), id=reg_id)
+    reason = request.POST.get('rejection_reason', '')
+    
+    if status not in DECISION_STATUSES:
+        messages.error(request, "Invalid status.")
+        return redirect('admin_panel:dashboard')
     
-    # Trigger automated email notification
+    _save_status(registration, status, reason)
     try:
-        send_status_email(registration, status, reason=reason)
-        messages.success(request, f"Registration for {registration.student.email} has been {status} and notification sent.")
+        _queue_status_jobs(registration, status, reason)
+        messages.success(request, f"Registration for {registration.student.email} has been {status} and notification queued.")
     except Exception as e:
-        messages.warning(request, f"Status updated to {status}, but email failed: {e}")
+        messages.warning(request, f"Status updated to {status}, but email could not be queued: {e}")
     
     return redirect('admin_panel:dashboard')
 
+@query_budget(7)
 @login_required
 @staff_required
 def delete_registration(request, reg_id):
     if request.method == 'POST':
-        registration = get_object_or_404(Registration, id=reg_id)
+        registration = get_object_or_404(Registration.objects.select_related('student'), id=reg_id)
         email = registration.student.email
         registration.delete()
         messages.success(request, f"Registration for {email} has been deleted.")
     return redirect('admin_panel:dashboard')
 
+@query_budget(6)
 @login_required
 @staff_required
 def exam_create(request):
@@ -113,6 +181,7 @@ def exam_create(request):
         form = ExamForm()
     return render(request, 'admin_panel/exam_form.html', {'form': form, 'title': 'Create Exam'})
 
+@query_budget(6)
 @login_required
 @staff_required
 def exam_update(request, pk):
@@ -127,6 +196,7 @@ def exam_update(request, pk):
         form = ExamForm(instance=exam)
     return render(request, 'admin_panel/exam_form.html', {'form': form, 'title': 'Update Exam'})
 
+@query_budget(13)
 @login_required
 @staff_required
 def exam_delete(request, pk):
@@ -137,16 +207,18 @@ def exam_delete(request, pk):
         return redirect('admin_panel:exam_list')
     return render(request, 'admin_panel/exam_confirm_delete.html', {'exam': exam})
 
+@query_budget(5)
 @login_required
 @staff_required
 def admin_exam_list(request):
     exams = Exam.objects.all().order_by('-exam_date')
     return render(request, 'admin_panel/exam_list.html', {'exams': exams})
 
+@query_budget(5)
 @login_required
 @staff_required
 def registration_detail(request, reg_id):
-    registration = get_object_or_404(Registration, id=reg_id)
+    registration = get_object_or_404(Registration.objects.select_related('student', 'exam'), id=reg_id)
     import os
     filename = os.path.basename(registration.document.name) if registration.document else "No Document"
     return render(request, 'admin_panel/registration_detail.html', {
@@ -154,6 +226,31 @@ def registration_detail(request, reg_id):
         'filename': filename
     })
 
+@query_budget(6)
+@login_required
+@staff_required
+def document_thumbnail(request, reg_id):
+    registration = get_object_or_404(Registration.objects.only('id', 'document', 'document_thumbnail'), id=reg_id)
+    if not registration.document:
+        raise Http404("No document uploaded.")
+
+    name = build_document_thumbnail(registration)
+    if name is None:
+        response = HttpResponse(unavailable_thumbnail(), content_type='image/jpeg', status=503)
+        response['Cache-Control'] = 'no-store'
+        return response
+
+    # Thumbnail names change whenever the document does, so they double as ETags
+    etag = quote_etag(name)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = FileResponse(registration.document_thumbnail.open('rb'), content_type='image/jpeg')
+    response['ETag'] = etag
+    # Same URL after a re-upload, so revalidate every time; unchanged previews cost a 304
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+@query_budget(8)
 @login_required
 @staff_required
 def exam_registrations(request, exam_id):
@@ -161,14 +258,64 @@ def exam_registrations(request, exam_id):
     registrations = Registration.objects.filter(exam=exam).select_related('student')
     return render(request, 'admin_panel/exam_registrations.html', {
         'exam': exam,
-        'registrations': registrations
+        'registrations': registrations,
+        'latest_transition': exam.bulk_transitions.first(),
+        'latest_import': exam.imports.first(),
     })
 
+@query_budget(5)
+@login_required
+@staff_required
+def export_exam_registrations(request, exam_id):
+    exam = get_object_or_404(Exam, id=exam_id)
+    status = request.GET.get('status')
+    if status not in STATUS_FILTERS:
+        status = None
+    response = StreamingHttpResponse(iter_csv(exam, status), content_type='text/csv')
+    filename = f"{slugify(exam.name) or 'exam'}-{status.lower() if status else 'all'}-registrations.csv"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+@query_budget(22)
+@login_required
+@staff_required
+@require_POST
+def import_exam_registrations(request, exam_id):
+    exam = get_object_or_404(Exam, id=exam_id)
+    upload = request.FILES.get('file')
+    if not upload:
+        messages.error(request, "Please choose a CSV file to import.")
+        return redirect('admin_panel:exam_registrations', exam_id=exam.id)
+
+    # Read straight from the uploaded temp file, row by row
+    reader = csv.DictReader(io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline=''))
+    try:
+        if 'email' not in [name.strip().lower() for name in reader.fieldnames or []]:
+            messages.error(request, "The CSV needs an 'email' column.")
+            return redirect('admin_panel:exam_registrations', exam_id=exam.id)
+        run = import_registrations(
+            exam, reader, initiated_by=request.user, filename=upload.name, mark_paid=bool(request.POST.get('mark_paid')),
+        )
+    except UnicodeDecodeError:
+        messages.error(request, "The file must be a UTF-8 encoded CSV.")
+        return redirect('admin_panel:exam_registrations', exam_id=exam.id)
+
+    messages.success(
+        request,
+        f"Imported {run.registrations_created} registrations ({run.users_created} new accounts); {run.error_count} rows skipped.",
+    )
+    return redirect('admin_panel:exam_registrations', exam_id=exam.id)
+
+@query_budget(28)
 @login_required
 @staff_required
 def bulk_update_registrations(request, exam_id, status):
     if request.method == 'POST':
         exam = get_object_or_404(Exam, id=exam_id)
+        if status not in ['Approved', 'Rejected', 'Hold']:
+            messages.error(request, "Invalid status.")
+            return redirect('admin_panel:exam_registrations', exam_id=exam_id)
+
         registrations = Registration.objects.filter(exam=exam)
         
         if status == 'Approved':
@@ -176,20 +323,85 @@ def bulk_update_registrations(request, exam_id, status):
         elif status == 'Rejected':
             registrations = registrations.filter(status='Pending')
         
-        count = 0
         reason = request.POST.get('bulk_reason', 'Bulk update by administrator')
-        
-        for reg in registrations:
-            reg.status = status
-            if status == 'Rejected':
-                reg.rejection_reason = reason
-            reg.save()
-            try:
-                send_status_email(reg, status, reason=reason)
-            except:
-                pass
-            count += 1
+        transition = transition_registrations(exam, registrations, status, reason=reason, initiated_by=request.user)
             
-        messages.success(request, f"Successfully processed {count} registrations for {exam.name}.")
+        messages.success(request, f"Successfully processed {transition.total} registrations for {exam.name}. Emails are being sent in the background.")
     
     return redirect('admin_panel:exam_registrations', exam_id=exam_id)
+
+@query_budget(5)
+@login_required
+@staff_required
+def bulk_transition_progress(request, transition_id):
+    transition = get_object_or_404(BulkTransition, id=transition_id)
+    return JsonResponse({
+        'status': transition.status,
+        'total': transition.total,
+        'emails_sent': transition.emails_sent,
+        'emails_failed': transition.emails_failed,
+        'progress_percent': transition.progress_percent,
+        'is_complete': transition.is_complete,
+    })
+
+@query_budget(6)
+@login_required
+@staff_required
+def review_queue(request, exam_id):
+    exam = get_object_or_404(Exam, id=exam_id)
+    registrations, last_scanned_id = next_pending(exam, request.user, limit=REVIEW_QUEUE_SIZE)
+    return render(request, 'admin_panel/review_queue.html', {
+        'exam': exam,
+        'items': [serialize_review_item(reg) for reg in registrations],
+        'after': last_scanned_id,
+    })
+
+@query_budget(6)
+@login_required
+@staff_required
+def review_queue_items(request, exam_id):
+    exam = get_object_or_404(Exam, id=exam_id)
+    try:
+        after = int(request.GET.get('after', 0))
+    except ValueError:
+        after = 0
+    registrations, last_scanned_id = next_pending(exam, request.user, after_id=after, limit=REVIEW_QUEUE_SIZE)
+    return JsonResponse({
+        'items': [serialize_review_item(reg) for reg in registrations],
+        'after': last_scanned_id,
+    })
+
+@query_budget(2)
+@login_required
+@staff_required
+@require_POST
+def review_skip(request, reg_id):
+    # The skipping reviewer's cursor is already past it; this hands it to the others now
+    release_lease(reg_id, reviewer=request.user)
+    return JsonResponse({'released': True})
+
+@query_budget(16)
+@login_required
+@staff_required
+@require_POST
+def review_decision(request, reg_id):
+    status = request.POST.get('status', '')
+    reason = request.POST.get('reason', '')
+    expected = request.POST.get('expected_status', 'Pending')
+    if status not in DECISION_STATUSES:
+        return JsonResponse({'error': "Invalid status."}, status=400)
+    if status in ('Rejected', 'Hold') and not reason:
+        return JsonResponse({'error': "A reason is required."}, status=400)
+
+    with transaction.atomic():
+        registration = get_object_or_404(
+            Registration.objects.select_related('student', 'exam').select_for_update(of=('self',)), id=reg_id
+        )
+        # Optimistic check: another reviewer may have decided this one already
+        if registration.status != expected:
+            return JsonResponse({'error': "Already reviewed.", 'status': registration.status}, status=409)
+        _save_status(registration, status, reason)
+        _queue_status_jobs(registration, status, reason)
+
+    release_lease(registration.id)
+    return JsonResponse({'status': registration.status, 'registration_number': registration.registration_number})
@@ -0,0 +1,90 @@
+import json
+import subprocess
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from django.utils import timezone
+from benchmarks.runner import ClientTransport, HttpTransport, run_scenario
+from benchmarks.scenarios import SCENARIOS, BenchmarkContext
+from benchmarks.seed import BENCHMARK_PASSWORD
+from core.cache import metrics
+from registrations.payments import _load_client
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs the benchmark scenarios against data from seed_benchmark and prints a JSON report. "
+        "Requests go through Django's test client in-process unless --url points at a running server; "
+        "that server needs PAYMENT_CLIENT=registrations.payments.FakeRazorpayClient, and DEBUG on "
+        "for per-request query counts."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS), dest='scenarios',
+                            help="Scenario to run; repeat for several. Defaults to all.")
+        parser.add_argument('--iterations', type=int, default=50, help="Iterations per worker.")
+        parser.add_argument('--concurrency', type=int, default=1, help="Parallel workers, each with its own session.")
+        parser.add_argument('--url', help="Base URL of a running server, e.g. http://127.0.0.1:8000/.")
+        parser.add_argument('--password', default=BENCHMARK_PASSWORD)
+        parser.add_argument('--output', help="File to write the JSON report to; defaults to stdout.")
+
+    def handle(self, *args, **options):
+        try:
+            context = BenchmarkContext(password=options['password'])
+        except LookupError as e:
+            raise CommandError(str(e))
+
+        if options['url']:
+            def make_transport(samples, worker):
+                return HttpTransport(samples, worker, base_url=options['url'])
+            report = self.run(context, make_transport, options)
+        else:
+            # Stub gateway and in-memory mail, so nothing leaves the process
+            with override_settings(
+                PAYMENT_CLIENT='registrations.payments.FakeRazorpayClient',
+                EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+                WAITING_ROOM_ENABLED=False,
+            ):
+                _load_client.cache_clear()
+                try:
+                    report = self.run(context, ClientTransport, options)
+                finally:
+                    _load_client.cache_clear()
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as fh:
+                fh.write(output + '\n')
+            self.stderr.write(self.style.SUCCESS(f"Wrote benchmark report to {options['output']}."))
+        else:
+            self.stdout.write(output)
+
+    def run(self, context, make_transport, options):
+        report = {
+            'commit': current_commit(),
+            'started_at': timezone.now().isoformat(),
+            'target': options['url'] or 'in-process',
+            'iterations': options['iterations'],
+            'concurrency': options['concurrency'],
+            'scenarios': {},
+        }
+        for name in options['scenarios'] or SCENARIOS:
+            self.stderr.write(f"Running {name}...")
+            metrics.reset()
+            report['scenarios'][name] = run_scenario(
+                SCENARIOS[name], context, make_transport, options['iterations'], options['concurrency'],
+            )
+            if not options['url']:
+                # A remote server keeps its cache counters in its own processes
+                report['scenarios'][name]['cache'] = metrics.snapshot()
+        return report
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from benchmarks.seed import BENCHMARK_PASSWORD, BENCHMARK_STAFF_EMAIL, clear_benchmark_data, seed_benchmark_data
+
+
+class Command(BaseCommand):
+    help = "Replaces the benchmark students, exams and registrations with a fresh data set."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=1000)
+        parser.add_argument('--exams', type=int, default=10)
+        parser.add_argument('--registrations', type=int, default=5000)
+        parser.add_argument('--notifications', type=int, default=3, help="Notifications per student.")
+        parser.add_argument('--password', default=BENCHMARK_PASSWORD, help="Password for every benchmark account.")
+        parser.add_argument('--clear', action='store_true', help="Only remove existing benchmark data.")
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            clear_benchmark_data()
+            self.stdout.write(self.style.SUCCESS("Removed benchmark data."))
+            return
+
+        try:
+            counts = seed_benchmark_data(
+                options['students'], options['exams'], options['registrations'],
+                notifications=options['notifications'], password=options['password'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {counts['students']} students, {counts['exams']} exams, {counts['registrations']} registrations "
+            f"and {counts['notifications']} notifications. Staff login: {BENCHMARK_STAFF_EMAIL}."
+        ))
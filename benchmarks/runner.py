@@ -0,0 +1,172 @@
+import math
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from urllib.parse import urljoin
+import requests
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+from core.query_budget import QueryRecorder
+
+@dataclass
+class Sample:
+    endpoint: str
+    status: int
+    seconds: float
+    queries: int | None
+
+class ScenarioExhausted(Exception):
+    """Raised by a scenario when its seeded data has run out."""
+
+class BaseTransport:
+    def __init__(self, samples, worker=0):
+        self.samples = samples
+        self.worker = worker
+        self.user = None
+        # Per-session scratch space for scenarios, e.g. the last ETag seen
+        self.state = {}
+
+    def get(self, endpoint, path, **kwargs):
+        return self.request('GET', endpoint, path, **kwargs)
+
+    def post(self, endpoint, path, **kwargs):
+        return self.request('POST', endpoint, path, **kwargs)
+
+    def request(self, method, endpoint, path, data=None, files=None, headers=None):
+        start = time.perf_counter()
+        status, body, response_headers, queries = self.send(method, path, data, files, headers or {})
+        self.samples.append(Sample(endpoint, status, time.perf_counter() - start, queries))
+        return status, body, response_headers
+
+    def login(self, email, password):
+        if self.user == email:
+            return
+        self.get('login_form', reverse('login'))
+        status, _, _ = self.post('login', reverse('login'), data={'email': email, 'password': password})
+        if status != 302:
+            raise RuntimeError(f"Could not log in as {email} (HTTP {status}).")
+        self.user = email
+
+class ClientTransport(BaseTransport):
+    """Drives the full middleware stack in-process with Django's test client."""
+
+    def __init__(self, samples, worker=0):
+        super().__init__(samples, worker)
+        self.client = Client()
+
+    def send(self, method, path, data, files, headers):
+        recorder = QueryRecorder()
+        if files:
+            data = {**(data or {}), **{
+                field: SimpleUploadedFile(name, content, content_type=content_type)
+                for field, (name, content, content_type) in files.items()
+            }}
+        with connection.execute_wrapper(recorder):
+            if method == 'GET':
+                response = self.client.get(path, data, headers=headers)
+            else:
+                response = self.client.post(path, data or {}, headers=headers)
+            body = b''.join(response.streaming_content) if response.streaming else response.content
+        response.close()
+        return response.status_code, body, response.headers, recorder.count
+
+class HttpTransport(BaseTransport):
+    """
+    Talks to a running server over HTTP. Query counts come from the
+    X-Query-Count header, which the server only sends with DEBUG on.
+    """
+
+    def __init__(self, samples, worker=0, base_url='http://127.0.0.1:8000/'):
+        super().__init__(samples, worker)
+        self.base_url = base_url
+        self.session = requests.Session()
+
+    def send(self, method, path, data, files, headers):
+        if method != 'GET':
+            headers = {**headers, 'X-CSRFToken': self.session.cookies.get('csrftoken', ''), 'Referer': self.base_url}
+        response = self.session.request(
+            method, urljoin(self.base_url, path), data=data, files=files, headers=headers, allow_redirects=False,
+        )
+        queries = response.headers.get('X-Query-Count')
+        return response.status_code, response.content, response.headers, int(queries) if queries else None
+
+def percentile(values, p):
+    """Nearest-rank percentile of already sorted `values`."""
+    if not values:
+        return None
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+def summarize(samples, seconds):
+    latencies = sorted(sample.seconds * 1000 for sample in samples)
+    queries = [sample.queries for sample in samples if sample.queries is not None]
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for sample in samples if sample.status >= 400),
+        'requests_per_s': round(len(samples) / seconds, 2) if seconds else None,
+        'latency_ms': {
+            'p50': _round(percentile(latencies, 50)),
+            'p95': _round(percentile(latencies, 95)),
+            'p99': _round(percentile(latencies, 99)),
+            'mean': _round(statistics.fmean(latencies)) if latencies else None,
+            'max': _round(latencies[-1]) if latencies else None,
+        },
+        'queries_per_request': {
+            'mean': _round(statistics.fmean(queries)) if queries else None,
+            'max': max(queries) if queries else None,
+        },
+    }
+
+def _round(value):
+    return None if value is None else round(value, 2)
+
+def run_scenario(scenario, context, make_transport, iterations, concurrency=1):
+    """
+    Runs `scenario` `iterations` times in each of `concurrency` workers, every
+    worker with its own transport (and so its own session), and returns the
+    summary overall and per endpoint. `make_transport(samples, worker)`
+    builds a worker's transport.
+    """
+    samples = []
+    lock = threading.Lock()
+
+    def worker(index):
+        local = []
+        transport = make_transport(local, index)
+        try:
+            for iteration in range(iterations):
+                scenario(transport, context, index * iterations + iteration)
+        except ScenarioExhausted:
+            pass
+        finally:
+            with lock:
+                samples.extend(local)
+
+    def threaded_worker(index):
+        try:
+            worker(index)
+        finally:
+            connection.close()
+
+    start = time.perf_counter()
+    if concurrency == 1:
+        # Same thread, so the scenario shares the caller's connection (and test transaction)
+        worker(0)
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for future in [pool.submit(threaded_worker, index) for index in range(concurrency)]:
+                future.result()
+    seconds = time.perf_counter() - start
+
+    endpoints = sorted({sample.endpoint for sample in samples})
+    return {
+        **summarize(samples, seconds),
+        'duration_s': round(seconds, 3),
+        'endpoints': {
+            endpoint: summarize([sample for sample in samples if sample.endpoint == endpoint], seconds)
+            for endpoint in endpoints
+        },
+    }
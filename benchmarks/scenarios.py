@@ -0,0 +1,126 @@
+import itertools
+import re
+import threading
+from django.urls import reverse
+from accounts.models import CustomUser
+from exams.models import Exam
+from registrations.models import Registration
+from registrations.payments import FakeRazorpayClient
+from .runner import ScenarioExhausted
+from .seed import BENCHMARK_DOMAIN, BENCHMARK_EXAM_PREFIX, BENCHMARK_PASSWORD, BENCHMARK_STAFF_EMAIL
+
+SCENARIOS = {}
+
+ORDER_ID_RE = re.compile(r'"order_id":\s*"([^"]+)"')
+DOCUMENT = ('id-proof.pdf', b'%PDF-1.4\n% benchmark document\n%%EOF\n', 'application/pdf')
+
+def scenario(name):
+    """
+    Registers a benchmark scenario: a function(transport, context, iteration)
+    making one round of requests as a single user. `transport.worker` picks
+    the user, so each worker keeps its session between iterations.
+    """
+    def decorator(func):
+        SCENARIOS[name] = func
+        return func
+    return decorator
+
+class BenchmarkContext:
+    """The seeded accounts, exams and registrations the scenarios draw from."""
+
+    def __init__(self, password=BENCHMARK_PASSWORD):
+        self.password = password
+        self.staff_email = BENCHMARK_STAFF_EMAIL
+        self.students = list(
+            CustomUser.objects.filter(email__endswith=f'@{BENCHMARK_DOMAIN}', is_staff=False)
+            .order_by('id').values_list('email', flat=True)
+        )
+        self.exam_ids = list(
+            Exam.objects.filter(name__startswith=BENCHMARK_EXAM_PREFIX).order_by('id').values_list('id', flat=True)
+        )
+        if not self.students or not self.exam_ids:
+            raise LookupError("No benchmark data found; run seed_benchmark first.")
+        registrations = Registration.objects.filter(exam_id__in=self.exam_ids)
+        self.approved = list(
+            registrations.filter(status='Approved').order_by('id').values_list('student__email', 'id')
+        )
+        self._registered = set(registrations.values_list('student__email', 'exam_id'))
+        self._free_pairs = self._iter_free_pairs()
+        self._lock = threading.Lock()
+
+    def _iter_free_pairs(self):
+        # Seeding fills exams in order, so the free slots are in the last ones
+        for exam_id, email in itertools.product(reversed(self.exam_ids), self.students):
+            if (email, exam_id) not in self._registered:
+                yield email, exam_id
+
+    def next_free_pair(self):
+        """A (student email, exam id) pair that has no registration yet."""
+        with self._lock:
+            pair = next(self._free_pairs, None)
+        if pair is None:
+            raise ScenarioExhausted()
+        return pair
+
+    def student(self, worker):
+        return self.students[worker % len(self.students)]
+
+@scenario('catalogue')
+def browse_catalogue(transport, context, iteration):
+    transport.login(context.student(transport.worker), context.password)
+    transport.get('exam_list', reverse('exam_list'))
+    transport.get('exam_list_upcoming', reverse('exam_list') + '?upcoming=1')
+
+@scenario('register')
+def submit_registration(transport, context, iteration):
+    """Registration-open traffic: log in, fill the form, pay through the stub gateway."""
+    email, exam_id = context.next_free_pair()
+    transport.login(email, context.password)
+    url = reverse('registrations:register_exam', args=[exam_id])
+    transport.get('register_form', url)
+    status, body, _ = transport.post('register_submit', url, files={'document': DOCUMENT})
+    match = ORDER_ID_RE.search(body.decode('utf-8', 'replace'))
+    if status != 200 or match is None:
+        return
+
+    order_id = match.group(1)
+    payment_id = f'pay_bench_{order_id}'
+    transport.post('payment_callback', reverse('registrations:payment_callback'), data={
+        'razorpay_order_id': order_id,
+        'razorpay_payment_id': payment_id,
+        'razorpay_signature': FakeRazorpayClient().sign_payment(order_id, payment_id),
+    })
+
+@scenario('notifications')
+def poll_notifications(transport, context, iteration):
+    """Exam-day polling: mostly conditional requests answered with 304."""
+    transport.login(context.student(transport.worker), context.password)
+    etag = transport.state.get('etag')
+    headers = {'If-None-Match': etag} if etag else {}
+    status, _, response_headers = transport.get('notifications', reverse('get_notifications'), headers=headers)
+    if status == 200:
+        transport.state['etag'] = response_headers.get('ETag')
+
+@scenario('hall_tickets')
+def fetch_hall_ticket(transport, context, iteration):
+    if not context.approved:
+        raise ScenarioExhausted()
+    email, registration_id = context.approved[transport.worker % len(context.approved)]
+    transport.login(email, context.password)
+    transport.get('hall_ticket', reverse('registrations:view_hall_ticket', args=[registration_id]))
+    transport.get('hall_ticket_qr', reverse('registrations:hall_ticket_qr', args=[registration_id]))
+
+@scenario('admin_bulk_approve')
+def bulk_approve(transport, context, iteration):
+    """
+    Staff approving an exam's pending registrations in one go. Only the first
+    pass over each exam has anything to approve; later ones measure the
+    no-op path.
+    """
+    transport.login(context.staff_email, context.password)
+    exam_id = context.exam_ids[iteration % len(context.exam_ids)]
+    transport.get('exam_registrations', reverse('admin_panel:exam_registrations', args=[exam_id]))
+    transport.post(
+        'bulk_approve', reverse('admin_panel:bulk_update_registrations', args=[exam_id, 'Approved']),
+        data={'bulk_reason': ''},
+    )
@@ -0,0 +1,99 @@
+import datetime
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+from accounts.models import CustomUser, Notification
+from exams.catalogue import invalidate_catalogue
+from exams.models import Exam
+from registrations.models import Registration, RegistrationSeats
+
+BENCHMARK_DOMAIN = 'bench.example.com'
+BENCHMARK_STAFF_EMAIL = f'admin@{BENCHMARK_DOMAIN}'
+BENCHMARK_PASSWORD = 'benchmark'
+BENCHMARK_EXAM_PREFIX = 'Benchmark Exam'
+
+# Share of seeded registrations in each status; approved ones get hall tickets
+STATUS_MIX = [('Approved', 4), ('Pending', 4), ('Hold', 1), ('Rejected', 1)]
+
+def student_email(i):
+    return f'student{i}@{BENCHMARK_DOMAIN}'
+
+def clear_benchmark_data():
+    CustomUser.objects.filter(email__endswith=f'@{BENCHMARK_DOMAIN}').delete()
+    Exam.objects.filter(name__startswith=BENCHMARK_EXAM_PREFIX).delete()
+    invalidate_catalogue()
+
+def _status_for(j):
+    statuses = [status for status, weight in STATUS_MIX for _ in range(weight)]
+    return statuses[j % len(statuses)]
+
+def seed_benchmark_data(students, exams, registrations, notifications=3, password=BENCHMARK_PASSWORD, batch_size=1000):
+    """
+    Replaces any earlier benchmark data with `students` verified students,
+    `exams` open exams and `registrations` paid registrations spread over
+    them, plus a staff account. Registrations fill exam by exam, so the
+    last exams keep free slots for the registration scenario.
+    """
+    if registrations > students * exams:
+        raise ValueError(f"Cannot seed {registrations} registrations for {students} students and {exams} exams.")
+
+    clear_benchmark_data()
+    password_hash = make_password(password)
+    now = timezone.now()
+
+    with transaction.atomic():
+        CustomUser.objects.create_user(
+            email=BENCHMARK_STAFF_EMAIL, password=password, first_name='Benchmark', last_name='Admin',
+            is_staff=True, is_verified=True,
+        )
+        users = CustomUser.objects.bulk_create([
+            CustomUser(
+                email=student_email(i), password=password_hash, first_name='Bench', last_name=f'Student {i}',
+                is_verified=True, unread_notifications=notifications,
+            )
+            for i in range(students)
+        ], batch_size=batch_size)
+        users = list(CustomUser.objects.filter(email__in=[user.email for user in users]).order_by('id'))
+
+        exam_rows = Exam.objects.bulk_create([
+            Exam(
+                name=f'{BENCHMARK_EXAM_PREFIX} {i}', banner='exams/banners/benchmark.jpg',
+                description='Benchmark exam.', eligibility='Everyone',
+                exam_date=now + datetime.timedelta(days=30 + i), fees=500,
+            )
+            for i in range(exams)
+        ], batch_size=batch_size)
+        exam_rows = list(Exam.objects.filter(name__startswith=BENCHMARK_EXAM_PREFIX).order_by('id'))
+
+        seats = {exam.id: 0 for exam in exam_rows}
+        batch = []
+        for j in range(registrations):
+            exam = exam_rows[j // students]
+            status = _status_for(j)
+            seats[exam.id] += 1
+            batch.append(Registration(
+                student=users[j % students], exam=exam, document='registrations/documents/benchmark.pdf',
+                status=status, payment_status='Success',
+                registration_number=f'BENCH-{j:07d}' if status == 'Approved' else None,
+                razorpay_order_id=f'order_bench{j}', razorpay_payment_id=f'pay_bench{j}',
+            ))
+            if len(batch) == batch_size:
+                Registration.objects.bulk_create(batch)
+                batch = []
+        Registration.objects.bulk_create(batch)
+        RegistrationSeats.objects.bulk_create(
+            [RegistrationSeats(exam_id=exam_id, taken=taken) for exam_id, taken in seats.items()]
+        )
+
+        Notification.objects.bulk_create([
+            Notification(user=user, message=f"Benchmark notification {n}", link='/accounts/profile/')
+            for user in users for n in range(notifications)
+        ], batch_size=batch_size)
+
+    invalidate_catalogue()
+    return {
+        'students': len(users),
+        'exams': len(exam_rows),
+        'registrations': registrations,
+        'notifications': len(users) * notifications,
+    }
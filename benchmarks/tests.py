@@ -0,0 +1,56 @@
+import io
+import json
+import tempfile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from core.cache import local_cache, shared_cache
+from registrations.models import Registration
+from .runner import percentile
+from .scenarios import SCENARIOS
+from .seed import seed_benchmark_data
+
+
+class SeedBenchmarkTest(TestCase):
+    def test_seeds_requested_volumes(self):
+        counts = seed_benchmark_data(students=6, exams=3, registrations=10, notifications=2)
+        self.assertEqual(counts, {'students': 6, 'exams': 3, 'registrations': 10, 'notifications': 12})
+        self.assertEqual(Registration.objects.count(), 10)
+        self.assertTrue(Registration.objects.filter(status='Approved').exclude(registration_number=None).exists())
+
+    def test_reseeding_replaces_earlier_data(self):
+        seed_benchmark_data(students=4, exams=2, registrations=5)
+        seed_benchmark_data(students=3, exams=2, registrations=4)
+        self.assertEqual(Registration.objects.count(), 4)
+
+    def test_rejects_more_registrations_than_pairs(self):
+        with self.assertRaises(ValueError):
+            seed_benchmark_data(students=2, exams=2, registrations=5)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class RunBenchmarkTest(TestCase):
+    def setUp(self):
+        shared_cache.clear()
+        local_cache.clear()
+        seed_benchmark_data(students=6, exams=3, registrations=10)
+
+    def test_report_covers_every_scenario(self):
+        out = io.StringIO()
+        call_command('run_benchmark', iterations=2, stdout=out, stderr=io.StringIO())
+        report = json.loads(out.getvalue())
+
+        self.assertEqual(set(report['scenarios']), set(SCENARIOS))
+        for name, result in report['scenarios'].items():
+            self.assertGreater(result['requests'], 0, name)
+            self.assertEqual(result['errors'], 0, name)
+            self.assertIsNotNone(result['latency_ms']['p99'], name)
+            self.assertIsNotNone(result['queries_per_request']['mean'], name)
+        self.assertIn('payment_callback', report['scenarios']['register']['endpoints'])
+        self.assertGreater(report['scenarios']['catalogue']['cache']['catalogue']['hit_ratio'], 0)
+        self.assertEqual(Registration.objects.filter(payment_status='Success').count(), 12)
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertIsNone(percentile([], 95))
@@ -0,0 +1,181 @@
+"""
+Project cache layer on top of Django's cache aliases:
+
+- LOCAL ('local'): per-process LRU for small, hot values that are safe to
+  serve slightly stale or are keyed by version/content.
+- SHARED ('default'): data shared by every worker, plus coordination keys
+  (counters, leases, flags). Redis in production via CACHE_URL.
+
+get_or_set() adds stampede protection and hit/miss metrics; the version
+helpers give a namespace a key prefix that one incr() invalidates.
+"""
+import asyncio
+import math
+import random
+import threading
+import time
+import weakref
+from collections import Counter
+from contextlib import contextmanager
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.connection import ConnectionProxy
+
+LOCAL = 'local'
+SHARED = 'default'
+
+local_cache = ConnectionProxy(caches, LOCAL)
+shared_cache = ConnectionProxy(caches, SHARED)
+
+class CacheMetrics:
+    """Per-process hit/miss counters by namespace."""
+
+    EVENTS = ('local_hits', 'hits', 'misses', 'early_refreshes')
+
+    def __init__(self):
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, namespace, event):
+        with self._lock:
+            self._counts[namespace, event] += 1
+
+    def snapshot(self):
+        with self._lock:
+            counts = dict(self._counts)
+        stats = {}
+        for namespace in sorted({namespace for namespace, _ in counts}):
+            row = {event: counts.get((namespace, event), 0) for event in self.EVENTS}
+            lookups = sum(row.values())
+            row['hit_ratio'] = round((row['local_hits'] + row['hits']) / lookups, 3) if lookups else None
+            stats[namespace] = row
+        return stats
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+metrics = CacheMetrics()
+
+# Versioned namespaces
+
+def _version_key(namespace):
+    return f'version:{namespace}'
+
+def get_version(namespace):
+    version = shared_cache.get(_version_key(namespace))
+    if version is None:
+        # Seed from the clock so a lost version key never points back at old entries
+        shared_cache.add(_version_key(namespace), int(time.time() * 1000), None)
+        version = shared_cache.get(_version_key(namespace))
+    return version
+
+def bump_version(namespace):
+    """Invalidates every key built with versioned_key(namespace, ...)."""
+    try:
+        shared_cache.incr(_version_key(namespace))
+    except ValueError:
+        get_version(namespace)
+
+def versioned_key(namespace, *parts):
+    return ':'.join([namespace, f'v{get_version(namespace)}', *map(str, parts)])
+
+# Stampede protection: entries are stored as (value, compute_seconds, expires_at).
+# Readers refresh early with a probability that grows towards expiry and with
+# the cost of recomputing (XFetch), so workers rarely miss at the same moment;
+# within a process, concurrent misses share one computation.
+
+_flights = {}
+_flights_lock = threading.Lock()
+_async_flights = weakref.WeakKeyDictionary()
+
+def _should_refresh(entry):
+    _, delta, expires_at = entry
+    if expires_at is None:
+        return False
+    beta = settings.CACHE_EARLY_EXPIRY_BETA
+    return time.time() - delta * beta * math.log(1 - random.random()) >= expires_at
+
+def _envelope(value, delta, timeout):
+    return (value, delta, time.time() + timeout if timeout else None)
+
+@contextmanager
+def _single_flight(name):
+    with _flights_lock:
+        lock, waiters = _flights.get(name, (threading.Lock(), 0))
+        _flights[name] = (lock, waiters + 1)
+    try:
+        with lock:
+            yield
+    finally:
+        with _flights_lock:
+            lock, waiters = _flights[name]
+            if waiters == 1:
+                del _flights[name]
+            else:
+                _flights[name] = (lock, waiters - 1)
+
+def get_or_set(key, compute, timeout, namespace, alias=SHARED, local_timeout=None):
+    """
+    Returns the cached value for `key`, calling `compute()` to fill it on a
+    miss. With `local_timeout`, hits are also kept in this process's LOCAL
+    tier for that many seconds; only use it for values that may be served
+    that stale, or whose key changes with their content.
+    """
+    if local_timeout:
+        value = local_cache.get(key)
+        if value is not None:
+            metrics.record(namespace, 'local_hits')
+            return value
+
+    store = caches[alias]
+    entry = store.get(key)
+    if entry is None or _should_refresh(entry):
+        with _single_flight(f'{alias}:{key}'):
+            latest = store.get(key)
+            if latest is not None and (entry is None or latest[2] != entry[2]):
+                # Filled by another thread while this one waited
+                entry = latest
+                metrics.record(namespace, 'hits')
+            else:
+                start = time.monotonic()
+                value = compute()
+                entry = _envelope(value, time.monotonic() - start, timeout)
+                store.set(key, entry, timeout)
+                metrics.record(namespace, 'misses' if latest is None else 'early_refreshes')
+    else:
+        metrics.record(namespace, 'hits')
+
+    if local_timeout:
+        local_cache.set(key, entry[0], local_timeout)
+    return entry[0]
+
+async def aget_or_set(key, compute, timeout, namespace, alias=SHARED):
+    """Async get_or_set() for a coroutine function `compute`; single-flight per event loop."""
+    store = caches[alias]
+    entry = await store.aget(key)
+    if entry is not None and not _should_refresh(entry):
+        metrics.record(namespace, 'hits')
+        return entry[0]
+
+    flights = _async_flights.setdefault(asyncio.get_running_loop(), {})
+    name = f'{alias}:{key}'
+    if name in flights:
+        metrics.record(namespace, 'hits')
+        return await asyncio.shield(flights[name])
+
+    flights[name] = future = asyncio.get_running_loop().create_future()
+    try:
+        start = time.monotonic()
+        value = await compute()
+        await store.aset(key, _envelope(value, time.monotonic() - start, timeout), timeout)
+        metrics.record(namespace, 'misses' if entry is None else 'early_refreshes')
+        future.set_result(value)
+        return value
+    except BaseException as e:
+        future.set_exception(e)
+        # Mark it retrieved so a flight nobody joined doesn't log a warning
+        future.exception()
+        raise
+    finally:
+        del flights[name]
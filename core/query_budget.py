@@ -0,0 +1,110 @@
+import logging
+import time
+from dataclasses import dataclass
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+@dataclass(frozen=True)
+class QueryBudget:
+    queries: int
+    db_ms: float | None = None
+
+def query_budget(queries, db_ms=None):
+    """
+    Declares how many SQL queries (and optionally milliseconds of DB time) a
+    view may use per request, session and auth lookups included. Put it
+    outermost so other decorators can't hide the attribute.
+    """
+    def decorator(view_func):
+        view_func.query_budget = QueryBudget(queries, db_ms)
+        return view_func
+    return decorator
+
+class QueryRecorder:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - start
+
+    @property
+    def db_ms(self):
+        return self.duration * 1000
+
+def _attach(recorder):
+    connection.execute_wrappers.append(recorder)
+
+def _detach(recorder):
+    connection.execute_wrappers.remove(recorder)
+
+class QueryBudgetMiddleware:
+    """
+    Counts queries and DB time per request and compares them with the view's
+    @query_budget. Over-budget requests are logged, or raise when
+    QUERY_BUDGET_STRICT is on (tests). Query-count failures are the only
+    ones that raise; timings are too noisy to fail a test on.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+        return self.finish(request, response, recorder)
+
+    async def __acall__(self, request):
+        # The ORM runs on the request's thread-sensitive sync thread under ASGI,
+        # so the recorder has to be attached to that thread's connection
+        recorder = QueryRecorder()
+        await sync_to_async(_attach)(recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(_detach)(recorder)
+        return self.finish(request, response, recorder)
+
+    def finish(self, request, response, recorder):
+        if settings.DEBUG:
+            response['X-Query-Count'] = str(recorder.count)
+            response['X-DB-Time-Ms'] = f"{recorder.db_ms:.1f}"
+
+        budget = getattr(request, '_query_budget', None)
+        if budget is not None:
+            self.check(request, budget, recorder)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._query_budget = getattr(view_func, 'query_budget', None)
+
+    def check(self, request, budget, recorder):
+        if recorder.count > budget.queries:
+            message = f"{request.method} {request.path} ran {recorder.count} queries; budget is {budget.queries}"
+            if settings.QUERY_BUDGET_STRICT:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        if budget.db_ms is not None and recorder.db_ms > budget.db_ms:
+            logger.warning(
+                "%s %s spent %.1f ms in the database; budget is %.1f ms",
+                request.method, request.path, recorder.db_ms, budget.db_ms,
+            )
@@ -0,0 +1,34 @@
+import os
+
+WSGI_WORKER_CLASS = 'gthread'
+ASGI_WORKER_CLASS = 'uvicorn_worker.UvicornWorker'
+
+def worker_count(server_mode, cpu_count=None):
+    """
+    Default gunicorn worker count. Threaded WSGI workers block on the database
+    and the payment gateway, so use the usual 2 x CPUs + 1; event-loop (ASGI)
+    workers don't, and one per CPU keeps them busy.
+    """
+    cpu_count = cpu_count or os.cpu_count() or 1
+    if server_mode == 'asgi':
+        return cpu_count
+    return cpu_count * 2 + 1
+
+def gunicorn_settings(environ=os.environ):
+    """gunicorn settings for SERVER_MODE ('wsgi' or 'asgi'), overridable from the environment."""
+    server_mode = environ.get('SERVER_MODE', 'wsgi')
+    if server_mode not in ('wsgi', 'asgi'):
+        raise ValueError(f"SERVER_MODE must be 'wsgi' or 'asgi', not {server_mode!r}.")
+    return {
+        'wsgi_app': f'core.{server_mode}:application',
+        'worker_class': ASGI_WORKER_CLASS if server_mode == 'asgi' else WSGI_WORKER_CLASS,
+        'workers': int(environ.get('WEB_CONCURRENCY') or worker_count(server_mode)),
+        'threads': int(environ.get('GUNICORN_THREADS', 4)) if server_mode == 'wsgi' else 1,
+        'bind': f"0.0.0.0:{environ.get('PORT', 8000)}",
+        'timeout': int(environ.get('GUNICORN_TIMEOUT', 30)),
+        'graceful_timeout': int(environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30)),
+        'keepalive': int(environ.get('GUNICORN_KEEPALIVE', 5)),
+        # Recycle workers now and then so slow leaks can't build up; jitter avoids all restarting at once
+        'max_requests': int(environ.get('GUNICORN_MAX_REQUESTS', 2000)),
+        'max_requests_jitter': int(environ.get('GUNICORN_MAX_REQUESTS_JITTER', 200)),
+    }
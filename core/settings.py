@@ -2,6 +2,7 @@ import os
 import environ
 from pathlib import Path
 import dj_database_url
+from django.core.exceptions import ImproperlyConfigured
 
 
 # Initialize environ
@@ -24,6 +25,13 @@ DEBUG = env('DEBUG')
 
 ALLOWED_HOSTS = env('ALLOWED_HOSTS')
 
+# 'dev' for runserver; 'prod' behind gunicorn (see gunicorn.conf.py), with
+# WhiteNoise serving compressed, hashed static files
+SERVING_PROFILE = env('SERVING_PROFILE', default='dev')
+PRODUCTION = SERVING_PROFILE == 'prod'
+# Public base URL, used for links in emails sent outside a request
+SITE_URL = env('SITE_URL', default='http://localhost:8000')
+
 
 # Application definition
 
@@ -40,6 +48,8 @@ INSTALLED_APPS = [
     'exams',
     'registrations',
     'admin_panel',
+    'jobs',
+    'benchmarks',
     
     # Social Auth
     'django.contrib.sites',
@@ -54,16 +64,20 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.query_budget.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'accounts.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'allauth.account.middleware.AccountMiddleware',
 ]
 
+if PRODUCTION:
+    MIDDLEWARE.insert(MIDDLEWARE.index('django.middleware.security.SecurityMiddleware') + 1, 'whitenoise.middleware.WhiteNoiseMiddleware')
+
 ROOT_URLCONF = 'core.urls'
 
 TEMPLATES = [
@@ -88,13 +102,28 @@ WSGI_APPLICATION = 'core.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# Persistent connections are checked before reuse, so a restarted database
+# costs one failed ping rather than a 500. DB_POOL switches to psycopg 3's
+# connection pool instead, which needs CONN_MAX_AGE = 0. Under ASGI every
+# sync_to_async thread would keep its own persistent connection, so
+# SERVER_MODE=asgi (see core.serving) never persists them and pools by default.
+SERVER_MODE = env('SERVER_MODE', default='wsgi')
+ASGI_MODE = SERVER_MODE == 'asgi'
+DB_POOL = env.bool('DB_POOL', default=ASGI_MODE)
 DATABASES = {
     'default': dj_database_url.parse(
         os.environ.get("DATABASE_URL"),
-        conn_max_age=60,      
+        conn_max_age=0 if DB_POOL or ASGI_MODE else env.int('DB_CONN_MAX_AGE', default=600 if PRODUCTION else 60),
+        conn_health_checks=True,
         ssl_require=False,
     )
 }
+if DB_POOL:
+    DATABASES['default'].setdefault('OPTIONS', {})['pool'] = {
+        'min_size': env.int('DB_POOL_MIN_SIZE', default=2),
+        'max_size': env.int('DB_POOL_MAX_SIZE', default=10),
+        'timeout': env.int('DB_POOL_TIMEOUT', default=10),
+    }
 
 
 
@@ -117,8 +146,8 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 AUTHENTICATION_BACKENDS = [
-    'django.contrib.auth.backends.ModelBackend',
-    'allauth.account.auth_backends.AuthenticationBackend',
+    'accounts.backends.CachedModelBackend',
+    'accounts.backends.CachedAuthenticationBackend',
 ]
 
 SITE_ID = 1
@@ -174,14 +203,79 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': (
+            'whitenoise.storage.CompressedManifestStaticFilesStorage' if PRODUCTION
+            else 'django.contrib.staticfiles.storage.StaticFilesStorage'
+        ),
+    },
+}
+
 # Cloudinary Storage Configuration
-DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
 CLOUDINARY_STORAGE = {
     'CLOUD_NAME': env('CLOUDINARY_CLOUD_NAME'),
     'API_KEY': env('CLOUDINARY_API_KEY'),
     'API_SECRET': env('CLOUDINARY_API_SECRET'),
 }
 
+# Caches (see core.cache): 'default' is the tier shared by every worker, set
+# with CACHE_URL (e.g. redis://host:6379/1); 'local' is a per-process LRU.
+# locmem is only shared within one process, which is fine for runserver and tests.
+CACHES = {
+    'default': env.cache_url('CACHE_URL', default='locmemcache://shared'),
+    'local': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'local',
+        'OPTIONS': {'MAX_ENTRIES': env.int('LOCAL_CACHE_MAX_ENTRIES', default=2000)},
+    },
+    'qr_codes': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': env('QR_CODE_CACHE_DIR', default=str(BASE_DIR / '.cache' / 'qr_codes')),
+        'OPTIONS': {'MAX_ENTRIES': 50000},
+    },
+}
+SHARED_CACHE = CACHES['default']['BACKEND'] not in (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+if PRODUCTION and not SHARED_CACHE:
+    # Waiting-room counters, review leases, admission flags and cache versions
+    # would silently diverge between gunicorn workers
+    raise ImproperlyConfigured("SERVING_PROFILE=prod needs CACHE_URL set to a shared cache, e.g. redis://host:6379/1.")
+
+# With a shared cache, sessions are read from it and written through to the
+# database, and the logged-in user's row is cached too (accounts.backends).
+# Both need every worker to see the same cache, or a logout or deactivation
+# would only take effect in the worker that handled it. signed_cookies avoids
+# the server side entirely, but logouts can't revoke a cookie.
+SESSION_ENGINE = env(
+    'SESSION_ENGINE',
+    default='django.contrib.sessions.backends.cached_db' if SHARED_CACHE else 'django.contrib.sessions.backends.db',
+)
+USER_CACHE_ENABLED = env.bool('USER_CACHE_ENABLED', default=SHARED_CACHE)
+USER_CACHE_TIMEOUT = env.int('USER_CACHE_TIMEOUT', default=60 * 15)
+if not SHARED_CACHE and (USER_CACHE_ENABLED or SESSION_ENGINE.rsplit('.', 1)[-1] in ('cache', 'cached_db')):
+    raise ImproperlyConfigured("Cached sessions and USER_CACHE_ENABLED need CACHE_URL set to a shared cache.")
+
+# Higher values refresh entries earlier before they expire (1.0 is the usual choice)
+CACHE_EARLY_EXPIRY_BETA = env.float('CACHE_EARLY_EXPIRY_BETA', default=1.0)
+
+# Hall ticket QR images: kept in the local tier in front of the shared 'qr_codes' cache
+QR_CODE_CACHE_ALIAS = 'qr_codes'
+QR_CODE_CACHE_TIMEOUT = env.int('QR_CODE_CACHE_TIMEOUT', default=60 * 60 * 24 * 7)
+QR_CODE_LOCAL_TIMEOUT = env.int('QR_CODE_LOCAL_TIMEOUT', default=60 * 60)
+
+# Live notifications (SSE). Use accounts.pubsub.PostgresPubSub when running several ASGI workers.
+PUBSUB_BACKEND = env('PUBSUB_BACKEND', default='accounts.pubsub.LocalPubSub')
+PUBSUB_CHANNEL = env('PUBSUB_CHANNEL', default='evalcore_events')
+PUBSUB_SUBSCRIBER_QUEUE_SIZE = 100
+NOTIFICATION_STREAM_HEARTBEAT_SECONDS = 15
+NOTIFICATION_STREAM_MAX_SECONDS = env.int('NOTIFICATION_STREAM_MAX_SECONDS', default=600)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -199,6 +293,49 @@ DEFAULT_FROM_EMAIL = env('DEFAULT_FROM_EMAIL', default=EMAIL_HOST_USER)
 # Razorpay Settings
 RAZORPAY_KEY_ID = env('RAZORPAY_KEY_ID', default='')
 RAZORPAY_KEY_SECRET = env('RAZORPAY_KEY_SECRET', default='')
+RAZORPAY_WEBHOOK_SECRET = env('RAZORPAY_WEBHOOK_SECRET', default='')
+# Factory for the gateway client; registrations.payments.FakeRazorpayClient works offline
+PAYMENT_CLIENT = env('PAYMENT_CLIENT', default='registrations.payments.build_razorpay_client')
+PAYMENT_HTTP_TIMEOUT = env.float('PAYMENT_HTTP_TIMEOUT', default=10)
+PAYMENT_HTTP_RETRIES = env.int('PAYMENT_HTTP_RETRIES', default=3)
+PAYMENT_HTTP_POOL_SIZE = env.int('PAYMENT_HTTP_POOL_SIZE', default=20)
+# Unpaid orders are reused for resubmissions within this window
+PAYMENT_ORDER_CACHE_TIMEOUT = env.int('PAYMENT_ORDER_CACHE_TIMEOUT', default=60 * 30)
+# reconcile_payments marks orders still unpaid after this long as failed, freeing their seats
+PAYMENT_PENDING_EXPIRY_MINUTES = env.int('PAYMENT_PENDING_EXPIRY_MINUTES', default=60 * 2)
+
+# Registration documents are uploaded in chunks to a staging directory, then
+# saved to the storage backend when the last one arrives; only the resulting key
+# is posted with the form. `manage.py clean_uploads` removes abandoned chunks.
+DOCUMENT_UPLOAD_MAX_BYTES = env.int('DOCUMENT_UPLOAD_MAX_BYTES', default=5 * 1024 * 1024)
+DOCUMENT_UPLOAD_CHUNK_BYTES = env.int('DOCUMENT_UPLOAD_CHUNK_BYTES', default=1024 * 1024)
+DOCUMENT_UPLOAD_TOKEN_MAX_AGE = env.int('DOCUMENT_UPLOAD_TOKEN_MAX_AGE', default=60 * 60)
+if PRODUCTION:
+    # Chunks of one upload can land on different web hosts, so this has to be a
+    # volume all of them mount (with working flock, which serialises each upload)
+    DOCUMENT_UPLOAD_STAGING_ROOT = env('DOCUMENT_UPLOAD_STAGING_ROOT')
+else:
+    DOCUMENT_UPLOAD_STAGING_ROOT = env('DOCUMENT_UPLOAD_STAGING_ROOT', default=str(BASE_DIR / '.uploads'))
+# Longest edge of document previews in the review screens, in pixels
+DOCUMENT_THUMBNAIL_SIZE = env.int('DOCUMENT_THUMBNAIL_SIZE', default=320)
+
+# Waiting room for registration-open surges: the first WAITING_ROOM_BURST
+# students go straight in, the rest are admitted in order at the given rate
+WAITING_ROOM_ENABLED = env.bool('WAITING_ROOM_ENABLED', default=False)
+WAITING_ROOM_BURST = env.int('WAITING_ROOM_BURST', default=200)
+WAITING_ROOM_ADMIT_PER_SECOND = env.int('WAITING_ROOM_ADMIT_PER_SECOND', default=20)
+WAITING_ROOM_PASS_SECONDS = env.int('WAITING_ROOM_PASS_SECONDS', default=60 * 15)
 
 OTP_EXPIRY_MINUTES = env.int('OTP_EXPIRY_MINUTES', default=10)
 
+
+# Per-view SQL budgets (see core.query_budget); strict mode raises instead of logging
+QUERY_BUDGET_STRICT = env.bool('QUERY_BUDGET_STRICT', default=False)
+
+# Background jobs
+JOB_QUEUE_BACKEND = env('JOB_QUEUE_BACKEND', default='jobs.backends.DatabaseBackend')
+JOB_MAX_ATTEMPTS = env.int('JOB_MAX_ATTEMPTS', default=5)
+JOB_RETRY_BACKOFF_SECONDS = env.int('JOB_RETRY_BACKOFF_SECONDS', default=30)
+# run_jobs deletes finished jobs this long after they complete; their idempotency keys go with them
+JOB_DONE_RETENTION_HOURS = env.int('JOB_DONE_RETENTION_HOURS', default=24 * 7)
+JOB_LOCK_TIMEOUT_SECONDS = env.int('JOB_LOCK_TIMEOUT_SECONDS', default=600)
@@ -0,0 +1,97 @@
+import datetime
+from django.db import connection
+from django.test import override_settings
+from django.utils import timezone
+from accounts.models import CustomUser, Notification
+from core.cache import local_cache, shared_cache
+from exams.models import Exam
+from registrations.models import Registration
+
+def index_names(model, columns):
+    """Names of the indexes on `model` whose leading columns are `columns`."""
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, model._meta.db_table)
+    return [
+        name for name, info in constraints.items()
+        if info['index'] and info['columns'][:len(columns)] == list(columns)
+    ]
+
+def explain(queryset):
+    """
+    EXPLAIN output for `queryset`. On PostgreSQL sequential scans are disabled
+    for the current transaction, since test tables are too small for the
+    planner to pick an index on its own.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+    return queryset.explain()
+
+class QueryPlanAssertionsMixin:
+    """TestCase mixin: assert that a queryset's plan goes through a given index."""
+
+    def assertUsesIndex(self, queryset, index_name=None, columns=None):
+        if index_name is None:
+            candidates = index_names(queryset.model, columns)
+            self.assertTrue(candidates, f"No index on {queryset.model._meta.db_table}{tuple(columns)}")
+        else:
+            candidates = [index_name]
+        plan = explain(queryset)
+        self.assertTrue(
+            any(name in plan for name in candidates),
+            f"Expected one of {candidates} in the query plan:\n{plan}",
+        )
+
+def seed_query_budget_data(rows=5):
+    """
+    A small but non-trivial data set for query-budget tests: several exams,
+    students, registrations in every status and notifications, so that an
+    N+1 query shows up as a budget overrun rather than a single extra query.
+    """
+    staff = CustomUser.objects.create_user(email="budget-staff@example.com", password="password", is_staff=True, is_verified=True)
+    student = CustomUser.objects.create_user(email="budget-student@example.com", password="password", is_verified=True)
+    exams = [
+        Exam.objects.create(
+            name=f"Budget Exam {i}",
+            banner="test_banner.jpg",
+            description="Description",
+            eligibility="All students",
+            exam_date=timezone.now() + datetime.timedelta(days=20 + i),
+            fees=100,
+        )
+        for i in range(rows)
+    ]
+    statuses = ['Pending', 'Approved', 'Rejected', 'Hold']
+    registrations = []
+    for i in range(rows * 2):
+        other = CustomUser.objects.create_user(email=f"budget{i}@example.com", password="password", is_verified=True)
+        registrations.append(Registration.objects.create(
+            student=other, exam=exams[i % rows], document="doc.pdf", status=statuses[i % len(statuses)],
+            registration_number=f"REG-BUDGET-{i}", razorpay_order_id=f"order_budget{i}",
+        ))
+    own = [
+        Registration.objects.create(student=student, exam=exam, document="doc.pdf", status=status,
+                                    registration_number=f"REG-OWN-{i}", razorpay_order_id=f"order_own{i}")
+        for i, (exam, status) in enumerate(zip(exams, ['Approved', 'Pending', 'Rejected', 'Hold', 'Approved']))
+    ]
+    Notification.objects.bulk_create([
+        Notification(user=student, message=f"Notification {i}", link="/exams/") for i in range(rows)
+    ])
+    return {
+        'staff': staff,
+        'student': student,
+        'exams': exams,
+        'registrations': registrations,
+        'own_registrations': own,
+    }
+
+class QueryBudgetTestMixin:
+    """Runs requests with budgets enforced; use with seed_query_budget_data()."""
+
+    def setUp(self):
+        super().setUp()
+        shared_cache.clear()
+        local_cache.clear()
+        strict = override_settings(QUERY_BUDGET_STRICT=True)
+        strict.enable()
+        self.addCleanup(strict.disable)
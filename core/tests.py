@@ -0,0 +1,172 @@
+import asyncio
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import URLPattern, URLResolver, get_resolver
+from accounts.models import CustomUser
+from .cache import aget_or_set, bump_version, get_or_set, local_cache, metrics, shared_cache, versioned_key
+from .serving import gunicorn_settings, worker_count
+
+BUDGETED_APPS = ('accounts', 'exams', 'registrations', 'admin_panel')
+
+def iter_views(patterns):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from iter_views(pattern.url_patterns)
+        elif isinstance(pattern, URLPattern):
+            yield pattern.callback
+
+class QueryBudgetCoverageTest(SimpleTestCase):
+    def test_every_view_declares_a_budget(self):
+        views = [view for view in iter_views(get_resolver().url_patterns) if view.__module__.split('.')[0] in BUDGETED_APPS]
+        self.assertTrue(views)
+        missing = [f"{view.__module__}.{view.__name__}" for view in views if not hasattr(view, 'query_budget')]
+        self.assertEqual(missing, [])
+
+class GunicornSettingsTest(SimpleTestCase):
+    def test_worker_count_follows_cpus(self):
+        self.assertEqual(worker_count('wsgi', cpu_count=4), 9)
+        self.assertEqual(worker_count('asgi', cpu_count=4), 4)
+
+    def test_asgi_mode_uses_uvicorn_workers(self):
+        settings = gunicorn_settings({'SERVER_MODE': 'asgi', 'WEB_CONCURRENCY': '3', 'PORT': '9000'})
+        self.assertEqual(settings['wsgi_app'], 'core.asgi:application')
+        self.assertEqual(settings['worker_class'], 'uvicorn_worker.UvicornWorker')
+        self.assertEqual(settings['workers'], 3)
+        self.assertEqual(settings['bind'], '0.0.0.0:9000')
+
+    def test_rejects_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            gunicorn_settings({'SERVER_MODE': 'fastcgi'})
+
+class SettingsImportTest(SimpleTestCase):
+    def import_settings(self, code='import core.settings', **environ):
+        env = {key: value for key, value in os.environ.items() if key != 'CACHE_URL'}
+        env.update({'SERVING_PROFILE': 'prod', 'DOCUMENT_UPLOAD_STAGING_ROOT': '/tmp/uploads', **environ})
+        # None unsets a variable
+        env = {key: value for key, value in env.items() if value is not None}
+        return subprocess.run(
+            [sys.executable, '-c', code],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+
+    def test_requires_shared_cache(self):
+        result = self.import_settings()
+        self.assertNotEqual(result.returncode, 0)
+        self.assertIn('CACHE_URL', result.stderr)
+        self.assertNotEqual(self.import_settings(CACHE_URL='locmemcache://').returncode, 0)
+
+    def test_accepts_redis(self):
+        result = self.import_settings(CACHE_URL='redis://localhost:6379/1')
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+    def test_requires_upload_staging_root(self):
+        result = self.import_settings(CACHE_URL='redis://localhost:6379/1', DOCUMENT_UPLOAD_STAGING_ROOT=None)
+        self.assertNotEqual(result.returncode, 0)
+        self.assertIn('DOCUMENT_UPLOAD_STAGING_ROOT', result.stderr)
+
+    def test_asgi_mode_never_persists_connections(self):
+        code = "from core import settings; print(settings.DATABASES['default']['CONN_MAX_AGE'], settings.DB_POOL)"
+        for environ, expected in [
+            ({'SERVER_MODE': 'asgi'}, '0 True'),
+            ({'SERVER_MODE': 'asgi', 'DB_POOL': 'off', 'DB_CONN_MAX_AGE': '600'}, '0 False'),
+            ({'SERVER_MODE': 'wsgi'}, '600 False'),
+        ]:
+            result = self.import_settings(code, CACHE_URL='redis://localhost:6379/1', **environ)
+            self.assertEqual(result.stdout.strip(), expected, result.stderr)
+
+    def test_cached_sessions_and_users_need_shared_cache(self):
+        self.assertEqual(self.import_settings(SERVING_PROFILE='dev').returncode, 0)
+        for environ in ({'SESSION_ENGINE': 'django.contrib.sessions.backends.cached_db'}, {'USER_CACHE_ENABLED': 'on'}):
+            result = self.import_settings(SERVING_PROFILE='dev', **environ)
+            self.assertIn('ImproperlyConfigured', result.stderr, environ)
+
+class CacheLayerTest(SimpleTestCase):
+    def setUp(self):
+        shared_cache.clear()
+        local_cache.clear()
+        metrics.reset()
+
+    def test_bump_version_changes_keys(self):
+        key = versioned_key('tests:things', 1)
+        self.assertEqual(versioned_key('tests:things', 1), key)
+        bump_version('tests:things')
+        self.assertNotEqual(versioned_key('tests:things', 1), key)
+
+    def test_get_or_set_computes_once_and_counts(self):
+        compute = mock.Mock(return_value=[1, 2])
+        for _ in range(3):
+            self.assertEqual(get_or_set('tests:list', compute, 60, namespace='tests'), [1, 2])
+        compute.assert_called_once()
+        stats = metrics.snapshot()['tests']
+        self.assertEqual((stats['misses'], stats['hits']), (1, 2))
+
+    def test_local_tier_serves_repeat_reads(self):
+        get_or_set('tests:local', lambda: 'value', 60, namespace='tests', local_timeout=30)
+        shared_cache.delete('tests:local')
+        self.assertEqual(get_or_set('tests:local', lambda: 'other', 60, namespace='tests', local_timeout=30), 'value')
+        self.assertEqual(metrics.snapshot()['tests']['local_hits'], 1)
+
+    def test_refreshes_early_near_expiry(self):
+        # Took half a second to compute and expires in a tenth of one
+        shared_cache.set('tests:early', ('old', 0.5, time.time() + 0.1), 60)
+        with mock.patch('core.cache.random.random', return_value=0.99):
+            self.assertEqual(get_or_set('tests:early', lambda: 'new', 60, namespace='tests'), 'new')
+        self.assertEqual(metrics.snapshot()['tests']['early_refreshes'], 1)
+
+    def test_concurrent_misses_share_one_computation(self):
+        started = threading.Event()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            started.set()
+            time.sleep(0.05)
+            return 'value'
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(lambda _: get_or_set('tests:flight', compute, 60, namespace='tests'), range(4)))
+        self.assertEqual(results, ['value'] * 4)
+        self.assertEqual(len(calls), 1)
+
+    def test_async_get_or_set_shares_one_computation(self):
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return 'value'
+
+        async def run():
+            return await asyncio.gather(*[aget_or_set('tests:async', compute, 60, namespace='tests') for _ in range(3)])
+
+        self.assertEqual(async_to_sync(run)(), ['value'] * 3)
+        self.assertEqual(len(calls), 1)
+
+# Django only logs handler adaptation with DEBUG on
+@override_settings(DEBUG=True)
+class AsyncMiddlewareTest(TestCase):
+    def test_asgi_chain_is_not_adapted(self):
+        with self.assertLogs('django.request', 'DEBUG') as logs:
+            ASGIHandler()
+            logging.getLogger('django.request').debug("loaded")
+        self.assertEqual([line for line in logs.output if 'adapted' in line], [])
+
+    async def test_async_views_run_natively_and_are_counted(self):
+        user = await CustomUser.objects.acreate(email="asgi@example.com")
+        await self.async_client.aforce_login(user)
+        with self.assertLogs('django.request', 'DEBUG') as logs:
+            response = await self.async_client.get('/accounts/notifications/')
+            logging.getLogger('django.request').debug("done")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([line for line in logs.output if 'adapted' in line], [])
+        self.assertGreater(int(response['X-Query-Count']), 0)
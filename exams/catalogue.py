@@ -0,0 +1,83 @@
+from django.db import transaction
+from django.utils import timezone
+from core.cache import aget_or_set, bump_version, get_or_set, shared_cache, versioned_key
+from .models import Exam
+
+CATALOGUE_NAMESPACE = 'exams:catalogue'
+CATALOGUE_TIMEOUT = 60 * 5
+# Each process keeps the current version's catalogue for this long; a new version is a new key
+CATALOGUE_LOCAL_TIMEOUT = 60
+USER_REGISTRATIONS_TIMEOUT = 60 * 5
+
+def _user_registrations_key(user_id):
+    return f'exams:user-registrations:{user_id}'
+
+def invalidate_catalogue():
+    bump_version(CATALOGUE_NAMESPACE)
+    # A reader may refill the new version from pre-commit data, so bump again once the write lands
+    transaction.on_commit(lambda: bump_version(CATALOGUE_NAMESPACE))
+
+def serialize_exam(exam):
+    return {
+        'id': exam.id,
+        'name': exam.name,
+        'banner_url': exam.banner.url if exam.banner else '',
+        'description': exam.description,
+        'eligibility': exam.eligibility,
+        'exam_date': exam.exam_date,
+        'location': exam.location,
+        'fees': exam.fees,
+        'is_registration_open': exam.is_registration_open,
+    }
+
+def get_catalogue():
+    """All exams, newest exam date first, as plain dicts cached under the current version."""
+    return get_or_set(
+        versioned_key(CATALOGUE_NAMESPACE),
+        lambda: [serialize_exam(exam) for exam in Exam.objects.order_by('-exam_date')],
+        CATALOGUE_TIMEOUT, namespace='catalogue', local_timeout=CATALOGUE_LOCAL_TIMEOUT,
+    )
+
+def _user_registrations_query(user):
+    from registrations.models import Registration
+    return Registration.objects.filter(student=user).values_list('id', 'exam_id', 'status')
+
+def get_user_registrations(user):
+    """Small per-user overlay: {exam_id: {'id': ..., 'status': ...}}."""
+    return get_or_set(
+        _user_registrations_key(user.pk),
+        lambda: {exam_id: {'id': reg_id, 'status': status} for reg_id, exam_id, status in _user_registrations_query(user)},
+        USER_REGISTRATIONS_TIMEOUT, namespace='user_registrations',
+    )
+
+async def aget_user_registrations(user):
+    async def compute():
+        return {
+            exam_id: {'id': reg_id, 'status': status}
+            async for reg_id, exam_id, status in _user_registrations_query(user)
+        }
+    return await aget_or_set(
+        _user_registrations_key(user.pk), compute, USER_REGISTRATIONS_TIMEOUT, namespace='user_registrations',
+    )
+
+def invalidate_user_registrations(user_ids):
+    keys = [_user_registrations_key(user_id) for user_id in user_ids]
+    shared_cache.delete_many(keys)
+    # As with the catalogue, a read before the commit may have cached the old rows again
+    transaction.on_commit(lambda: shared_cache.delete_many(keys))
+
+def build_exam_list(user, upcoming_only=False):
+    """Merges the shared catalogue with the user's overlay and computes countdowns."""
+    now = timezone.now()
+    registrations = get_user_registrations(user)
+    exams = []
+    for exam in get_catalogue():
+        if upcoming_only and exam['exam_date'] < now:
+            continue
+        delta = exam['exam_date'] - now
+        exams.append({
+            **exam,
+            'user_registration': registrations.get(exam['id']),
+            'days_left': delta.days if delta.days >= 0 else 0,
+        })
+    return exams
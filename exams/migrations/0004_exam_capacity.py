@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 15:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0003_exam_location'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exam',
+            name='capacity',
+            field=models.PositiveIntegerField(blank=True, help_text='Maximum registrations. Leave empty for no limit.', null=True),
+        ),
+    ]
@@ -12,6 +12,7 @@ class Exam(models.Model):
     location = models.CharField(max_length=255, default='Main Examination Center, Block A')
     fees = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     is_registration_open = models.BooleanField(default=True)
+    capacity = models.PositiveIntegerField(blank=True, null=True, help_text="Maximum registrations. Leave empty for no limit.")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
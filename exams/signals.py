@@ -0,0 +1,14 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .catalogue import invalidate_catalogue, invalidate_user_registrations
+from .models import Exam
+
+@receiver(post_save, sender=Exam)
+@receiver(post_delete, sender=Exam)
+def refresh_catalogue(sender, instance, **kwargs):
+    invalidate_catalogue()
+
+@receiver(post_save, sender='registrations.Registration')
+@receiver(post_delete, sender='registrations.Registration')
+def refresh_user_registrations(sender, instance, **kwargs):
+    invalidate_user_registrations([instance.student_id])
@@ -1,3 +1,74 @@
 from django.test import TestCase
+from django.utils import timezone
+from accounts.models import CustomUser
+from exams.catalogue import CATALOGUE_NAMESPACE, get_catalogue, invalidate_catalogue
+from exams.models import Exam
+from registrations.models import Registration
+from core.cache import local_cache, shared_cache, versioned_key
+from core.testing import QueryBudgetTestMixin, seed_query_budget_data
+import datetime
+import time
 
-# Create your tests here.
+class ExamCatalogueCacheTest(TestCase):
+    def setUp(self):
+        shared_cache.clear()
+        local_cache.clear()
+        self.student = CustomUser.objects.create_user(email="catalogue@example.com", password="password")
+        self.exam = self.create_exam("Catalogue Exam", days=15)
+
+    def create_exam(self, name, days):
+        return Exam.objects.create(
+            name=name,
+            banner="test_banner.jpg",
+            description="Description",
+            eligibility="All students",
+            exam_date=timezone.now() + datetime.timedelta(days=days),
+        )
+
+    def test_warm_page_skips_exam_and_registration_queries(self):
+        self.client.force_login(self.student)
+        self.client.get('/exams/')
+        with self.assertNumQueries(2):  # session + user
+            response = self.client.get('/exams/')
+        self.assertEqual(response.context['exams'][0]['name'], "Catalogue Exam")
+
+    def test_exam_save_invalidates_catalogue(self):
+        get_catalogue()
+        self.exam.name = "Renamed Exam"
+        self.exam.save()
+        self.assertEqual(get_catalogue()[0]['name'], "Renamed Exam")
+        self.exam.delete()
+        self.assertEqual(get_catalogue(), [])
+
+    def test_reads_during_the_write_are_dropped_on_commit(self):
+        get_catalogue()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.exam.name = "Renamed Exam"
+            self.exam.save()
+            # Stand-in for a concurrent reader that refills the cache before the commit
+            shared_cache.set(versioned_key(CATALOGUE_NAMESPACE), ([], 0, time.time() + 60), 60)
+        self.assertEqual(get_catalogue()[0]['name'], "Renamed Exam")
+
+    def test_registration_change_refreshes_user_overlay(self):
+        self.client.force_login(self.student)
+        self.client.get('/exams/')
+        registration = Registration.objects.create(student=self.student, exam=self.exam, document="doc.pdf")
+        response = self.client.get('/exams/')
+        self.assertEqual(response.context['exams'][0]['user_registration'], {'id': registration.id, 'status': 'Pending'})
+
+    def test_upcoming_filter_and_pagination(self):
+        past = self.create_exam("Past Exam", days=15)
+        # Past dates can't be saved through the model, so update directly and invalidate by hand
+        Exam.objects.filter(pk=past.pk).update(exam_date=timezone.now() - datetime.timedelta(days=1))
+        invalidate_catalogue()
+        self.client.force_login(self.student)
+        names = [e['name'] for e in self.client.get('/exams/', {'upcoming': '1'}).context['exams']]
+        self.assertEqual(names, ["Catalogue Exam"])
+        self.assertEqual(len(self.client.get('/exams/').context['exams']), 2)
+
+class ExamViewBudgetTest(QueryBudgetTestMixin, TestCase):
+    def test_exam_list(self):
+        data = seed_query_budget_data()
+        self.client.force_login(data['student'])
+        self.assertEqual(self.client.get('/exams/').status_code, 200)
+        self.assertEqual(self.client.get('/exams/?upcoming=1').status_code, 200)
@@ -1,22 +1,20 @@
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
-from .models import Exam
+from django.core.paginator import Paginator
+from .catalogue import build_exam_list
+from core.query_budget import query_budget
 
+EXAMS_PER_PAGE = 12
+
+@query_budget(6)
 @login_required
 def exam_list(request):
-    from registrations.models import Registration
-    exams = Exam.objects.all().order_by('-exam_date')
-    
-    # Get all registrations for the current user
-    user_registrations = {reg.exam_id: reg for reg in Registration.objects.filter(student=request.user)}
-    
-    from django.utils import timezone
-    now = timezone.now()
-    
-    # Attach status and countdown to each exam
-    for exam in exams:
-        exam.user_registration = user_registrations.get(exam.id)
-        delta = exam.exam_date - now
-        exam.days_left = delta.days if delta.days >= 0 else 0
+    upcoming_only = request.GET.get('upcoming') == '1'
+    exams = build_exam_list(request.user, upcoming_only=upcoming_only)
+    page = Paginator(exams, EXAMS_PER_PAGE).get_page(request.GET.get('page'))
         
-    return render(request, 'exams/exam_list.html', {'exams': exams})
+    return render(request, 'exams/exam_list.html', {
+        'exams': page,
+        'page': page,
+        'upcoming_only': upcoming_only,
+    })
@@ -0,0 +1,21 @@
+# Production server: `gunicorn` from the project root picks this file up.
+# SERVER_MODE=asgi serves core.asgi with uvicorn workers (needed for the
+# notification stream); the default serves core.wsgi with threaded workers.
+# The same variable makes core.settings pool database connections under ASGI.
+from core.serving import gunicorn_settings
+
+_settings = gunicorn_settings()
+
+wsgi_app = _settings['wsgi_app']
+worker_class = _settings['worker_class']
+workers = _settings['workers']
+threads = _settings['threads']
+bind = _settings['bind']
+timeout = _settings['timeout']
+graceful_timeout = _settings['graceful_timeout']
+keepalive = _settings['keepalive']
+max_requests = _settings['max_requests']
+max_requests_jitter = _settings['max_requests_jitter']
+
+accesslog = '-'
+errorlog = '-'
@@ -0,0 +1,22 @@
+from django.contrib import admin
+from .models import Job, DeadLetterJob
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'status', 'attempts', 'run_at', 'created_at')
+    search_fields = ('name', 'idempotency_key')
+    list_filter = ('status', 'name')
+    ordering = ('run_at',)
+
+@admin.register(DeadLetterJob)
+class DeadLetterJobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'attempts', 'last_error', 'failed_at')
+    search_fields = ('name', 'idempotency_key')
+    list_filter = ('name',)
+    ordering = ('-failed_at',)
+    actions = ['requeue']
+
+    @admin.action(description="Requeue selected jobs")
+    def requeue(self, request, queryset):
+        for dead in queryset:
+            dead.requeue()
@@ -0,0 +1,121 @@
+import datetime
+import logging
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from .models import Job, DeadLetterJob
+from .registry import get_task
+
+logger = logging.getLogger(__name__)
+
+def retry_delay(attempts):
+    """Exponential backoff: base, 2x base, 4x base ... capped at one hour."""
+    return min(settings.JOB_RETRY_BACKOFF_SECONDS * (2 ** (attempts - 1)), 3600)
+
+class BaseBackend:
+    def enqueue(self, name, payload, idempotency_key=None, delay=None):
+        raise NotImplementedError
+
+class DatabaseBackend(BaseBackend):
+    """Stores jobs in the jobs_job table; `manage.py run_jobs` executes them."""
+
+    def enqueue(self, name, payload, idempotency_key=None, delay=None):
+        fields = {
+            'name': name,
+            'payload': payload,
+            'max_attempts': settings.JOB_MAX_ATTEMPTS,
+        }
+        if delay:
+            fields['run_at'] = timezone.now() + datetime.timedelta(seconds=delay)
+        if idempotency_key is None:
+            return Job.objects.create(**fields)
+        try:
+            with transaction.atomic():
+                return Job.objects.create(idempotency_key=idempotency_key, **fields)
+        except IntegrityError:
+            return Job.objects.get(idempotency_key=idempotency_key)
+
+    def claim(self, batch_size=10):
+        now = timezone.now()
+        stale = now - datetime.timedelta(seconds=settings.JOB_LOCK_TIMEOUT_SECONDS)
+        with transaction.atomic():
+            ready = Job.objects.filter(status='Queued', run_at__lte=now) | \
+                Job.objects.filter(status='Running', updated_at__lt=stale)
+            jobs = list(ready.select_for_update(skip_locked=True).order_by('run_at')[:batch_size])
+            for job in jobs:
+                job.status = 'Running'
+                job.attempts += 1
+                job.save(update_fields=['status', 'attempts', 'updated_at'])
+        return jobs
+
+    def run(self, job):
+        try:
+            get_task(job.name)(**job.payload)
+        except Exception as e:
+            self.fail(job, e)
+            return False
+        job.status = 'Done'
+        job.last_error = None
+        job.save(update_fields=['status', 'last_error', 'updated_at'])
+        return True
+
+    def fail(self, job, error):
+        logger.warning("Job %s (%s) failed on attempt %s: %s", job.id, job.name, job.attempts, error)
+        if job.attempts >= job.max_attempts:
+            with transaction.atomic():
+                DeadLetterJob.objects.create(
+                    name=job.name,
+                    payload=job.payload,
+                    idempotency_key=job.idempotency_key,
+                    attempts=job.attempts,
+                    last_error=str(error),
+                    created_at=job.created_at,
+                )
+                job.delete()
+            return
+        job.status = 'Queued'
+        job.last_error = str(error)
+        job.run_at = timezone.now() + datetime.timedelta(seconds=retry_delay(job.attempts))
+        job.save(update_fields=['status', 'last_error', 'run_at', 'updated_at'])
+
+    def purge(self, older_than, batch_size=1000):
+        """Deletes jobs that finished before `older_than`, in batches; returns how many went."""
+        done = Job.objects.filter(status='Done', updated_at__lt=older_than)
+        purged = 0
+        while True:
+            ids = list(done.values_list('id', flat=True)[:batch_size])
+            if not ids:
+                return purged
+            purged += Job.objects.filter(id__in=ids).delete()[0]
+
+    def process(self, batch_size=10):
+        """Runs one batch of due jobs and returns how many were picked up."""
+        jobs = self.claim(batch_size)
+        for job in jobs:
+            self.run(job)
+        return len(jobs)
+
+class LocalBackend(BaseBackend):
+    """Runs tasks in-process as soon as they are enqueued. Meant for tests and local development."""
+
+    def __init__(self):
+        self.seen_keys = set()
+        self.dead_letters = []
+
+    def enqueue(self, name, payload, idempotency_key=None, delay=None):
+        # Runs straight away; there is nothing to wait on in-process
+        if idempotency_key is not None:
+            if idempotency_key in self.seen_keys:
+                return None
+            self.seen_keys.add(idempotency_key)
+
+        func = get_task(name)
+        for attempt in range(1, settings.JOB_MAX_ATTEMPTS + 1):
+            try:
+                func(**payload)
+                return None
+            except Exception as e:
+                logger.warning("Local job %s failed on attempt %s: %s", name, attempt, e)
+                error = e
+        self.dead_letters.append((name, payload, str(error)))
+        return None
@@ -0,0 +1,41 @@
+import datetime
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from jobs.backends import DatabaseBackend
+from jobs.queue import get_backend
+
+# Seconds between purges of finished jobs while the worker runs
+PURGE_INTERVAL = 60 * 10
+
+
+class Command(BaseCommand):
+    help = "Runs queued background jobs (emails etc.) from the database queue."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10)
+        parser.add_argument('--sleep', type=float, default=2.0, help="Seconds to wait when the queue is empty.")
+        parser.add_argument('--once', action='store_true', help="Process the currently due jobs and exit.")
+        parser.add_argument('--purge-after', dest='purge_after', type=int, default=settings.JOB_DONE_RETENTION_HOURS,
+                            help="Delete finished jobs this many hours after they completed; 0 keeps them.")
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        if not isinstance(backend, DatabaseBackend):
+            raise CommandError("run_jobs only works with the database queue backend.")
+
+        self.stdout.write("Job worker started.")
+        last_purge = None
+        while True:
+            processed = backend.process(options['batch_size'])
+            if options['purge_after'] and (last_purge is None or time.monotonic() - last_purge >= PURGE_INTERVAL):
+                cutoff = timezone.now() - datetime.timedelta(hours=options['purge_after'])
+                purged = backend.purge(cutoff)
+                if purged:
+                    self.stdout.write(f"Purged {purged} finished jobs.")
+                last_purge = time.monotonic()
+            if options['once'] and not processed:
+                break
+            if not processed:
+                time.sleep(options['sleep'])
@@ -0,0 +1,22 @@
+from functools import lru_cache
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+@lru_cache(maxsize=None)
+def _load_backend(path):
+    return import_string(path)()
+
+def get_backend():
+    return _load_backend(settings.JOB_QUEUE_BACKEND)
+
+def enqueue(name, payload=None, idempotency_key=None, delay=None):
+    """
+    Hands a registered task to the configured backend. Repeated keys are
+    enqueued once; `delay` (seconds) holds the job back where the backend can.
+    """
+    return get_backend().enqueue(name, payload or {}, idempotency_key=idempotency_key, delay=delay)
+
+async def aenqueue(name, payload=None, idempotency_key=None, delay=None):
+    # Backends are synchronous (the default one writes a row), so run them off the event loop
+    return await sync_to_async(enqueue)(name, payload, idempotency_key=idempotency_key, delay=delay)
@@ -0,0 +1,15 @@
+_tasks = {}
+
+def task(name):
+    """Registers a function as a background task under a stable name."""
+    def decorator(func):
+        _tasks[name] = func
+        func.task_name = name
+        return func
+    return decorator
+
+def get_task(name):
+    try:
+        return _tasks[name]
+    except KeyError:
+        raise LookupError(f"No task registered under '{name}'")
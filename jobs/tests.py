@@ -0,0 +1,86 @@
+import datetime
+import io
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from unittest import mock
+from accounts.models import CustomUser
+from accounts.utils import create_and_send_otp
+from jobs.backends import DatabaseBackend
+from jobs.models import Job, DeadLetterJob
+from jobs.registry import task
+
+calls = []
+
+@task('jobs.tests.flaky')
+def flaky(fail_times):
+    calls.append(fail_times)
+    if len(calls) <= fail_times:
+        raise RuntimeError("boom")
+
+class DatabaseQueueTest(TestCase):
+    def setUp(self):
+        calls.clear()
+        self.backend = DatabaseBackend()
+
+    def test_idempotency_key_enqueues_once(self):
+        first = self.backend.enqueue('jobs.tests.flaky', {'fail_times': 0}, idempotency_key='k1')
+        second = self.backend.enqueue('jobs.tests.flaky', {'fail_times': 0}, idempotency_key='k1')
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_failed_job_is_retried_with_backoff(self):
+        job = self.backend.enqueue('jobs.tests.flaky', {'fail_times': 1})
+        self.backend.process()
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'Queued')
+        self.assertEqual(job.attempts, 1)
+        self.assertIsNotNone(job.last_error)
+        # Not due yet, so a second pass picks nothing up
+        self.assertEqual(self.backend.process(), 0)
+
+    @override_settings(JOB_MAX_ATTEMPTS=1)
+    def test_exhausted_job_moves_to_dead_letter(self):
+        self.backend.enqueue('jobs.tests.flaky', {'fail_times': 5}, idempotency_key='dead')
+        self.backend.process()
+        self.assertFalse(Job.objects.exists())
+        dead = DeadLetterJob.objects.get()
+        self.assertEqual(dead.idempotency_key, 'dead')
+        self.assertEqual(dead.attempts, 1)
+
+    def test_run_jobs_purges_old_finished_jobs(self):
+        old = self.backend.enqueue('jobs.tests.flaky', {'fail_times': 0}, idempotency_key='old')
+        self.backend.process()
+        Job.objects.filter(pk=old.pk).update(updated_at=timezone.now() - datetime.timedelta(hours=48))
+        recent = self.backend.enqueue('jobs.tests.flaky', {'fail_times': 0})
+
+        out = io.StringIO()
+        call_command('run_jobs', '--once', '--purge-after=24', stdout=out)
+        self.assertFalse(Job.objects.filter(pk=old.pk).exists())
+        self.assertEqual(Job.objects.get().pk, recent.pk)
+        self.assertIn('Purged 1 finished jobs.', out.getvalue())
+
+class EmailQueueTest(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email="queue@example.com", password="password")
+
+    def test_otp_email_is_queued_not_sent(self):
+        self.assertTrue(create_and_send_otp(self.user))
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(Job.objects.get().name, 'accounts.send_otp_email')
+
+        DatabaseBackend().process()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(Job.objects.get().status, 'Done')
+
+    def test_queueing_failure_is_logged(self):
+        with mock.patch('jobs.queue.get_backend', side_effect=RuntimeError("queue down")), \
+                self.assertLogs('accounts.utils', 'ERROR'):
+            self.assertFalse(create_and_send_otp(self.user))
+
+    @override_settings(JOB_QUEUE_BACKEND='jobs.backends.LocalBackend')
+    def test_local_backend_sends_in_process(self):
+        create_and_send_otp(self.user)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertFalse(Job.objects.exists())
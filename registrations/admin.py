@@ -1,10 +1,27 @@
 from django.contrib import admin
-from .models import Registration
+from .models import Registration, PaymentEvent, RegistrationImport
 
 @admin.register(Registration)
 class RegistrationAdmin(admin.ModelAdmin):
     list_display = ('registration_number', 'student', 'exam', 'status', 'payment_status', 'registered_at')
+    list_select_related = ('student', 'exam')
     search_fields = ('registration_number', 'student__email', 'exam__name', 'razorpay_order_id')
     list_filter = ('status', 'payment_status', 'exam', 'registered_at')
     ordering = ('-registered_at',)
     readonly_fields = ('registration_number', 'razorpay_order_id', 'razorpay_payment_id', 'razorpay_signature')
+
+@admin.register(PaymentEvent)
+class PaymentEventAdmin(admin.ModelAdmin):
+    list_display = ('event_id', 'event_type', 'received_at', 'processed_at')
+    search_fields = ('event_id',)
+    list_filter = ('event_type',)
+    ordering = ('-received_at',)
+    readonly_fields = ('event_id', 'event_type', 'payload', 'received_at', 'processed_at')
+
+@admin.register(RegistrationImport)
+class RegistrationImportAdmin(admin.ModelAdmin):
+    list_display = ('exam', 'filename', 'total_rows', 'registrations_created', 'users_created', 'error_count', 'created_at')
+    list_select_related = ('exam',)
+    list_filter = ('exam',)
+    ordering = ('-created_at',)
+    readonly_fields = ('errors',)
@@ -0,0 +1,125 @@
+import time
+from collections import Counter
+from django.conf import settings
+from core.cache import shared_cache
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from .models import Registration, RegistrationSeats
+
+ADMISSION_STATE_TIMEOUT = 60
+
+CLOSED = 'closed'
+FULL = 'full'
+
+def _state_key(exam_id):
+    return f'registrations:admission:{exam_id}'
+
+def get_admission_state(exam_id):
+    """Cached CLOSED/FULL flag for an exam, or None when it may still accept registrations."""
+    return shared_cache.get(_state_key(exam_id))
+
+async def aget_admission_state(exam_id):
+    return await shared_cache.aget(_state_key(exam_id))
+
+def set_admission_state(exam_id, state):
+    shared_cache.set(_state_key(exam_id), state, ADMISSION_STATE_TIMEOUT)
+
+def clear_admission_state(exam_id):
+    shared_cache.delete(_state_key(exam_id))
+
+def claim_seat(exam):
+    """
+    Takes one seat for `exam` with a single conditional UPDATE. Returns False
+    (and caches the FULL flag) when the exam is at capacity.
+    """
+    RegistrationSeats.objects.get_or_create(exam_id=exam.id)
+    seats = RegistrationSeats.objects.filter(exam_id=exam.id)
+    if exam.capacity is not None:
+        seats = seats.filter(taken__lt=exam.capacity)
+    if seats.update(taken=F('taken') + 1):
+        return True
+    set_admission_state(exam.id, FULL)
+    return False
+
+def release_seat(exam_id, count=1):
+    RegistrationSeats.objects.filter(exam_id=exam_id).update(taken=Greatest(F('taken') - count, 0))
+    clear_admission_state(exam_id)
+
+def _restore_seat(exam_id, count):
+    RegistrationSeats.objects.get_or_create(exam_id=exam_id)
+    RegistrationSeats.objects.filter(exam_id=exam_id).update(taken=F('taken') + count)
+    clear_admission_state(exam_id)
+
+def _move_seats(rows, holds_seat, adjust):
+    if rows:
+        Registration.objects.filter(id__in=[reg_id for reg_id, _ in rows]).update(holds_seat=holds_seat)
+        for exam_id, count in Counter(exam_id for _, exam_id in rows).items():
+            adjust(exam_id, count)
+
+def sync_seats(registrations):
+    """
+    Frees the seats of rejected registrations and failed payments in the
+    `registrations` queryset, and takes seats back for ones that were
+    reinstated. Capacity isn't checked when taking a seat back: a staff
+    decision or a late payment wins over the limit.
+    """
+    release, restore = [], []
+    with transaction.atomic(savepoint=False):
+        rows = registrations.select_for_update().values_list('id', 'exam_id', 'holds_seat', 'status', 'payment_status')
+        for reg_id, exam_id, holds_seat, status, payment_status in rows:
+            should_hold = status != 'Rejected' and payment_status != 'Failed'
+            if holds_seat != should_hold:
+                (restore if should_hold else release).append((reg_id, exam_id))
+        _move_seats(release, False, release_seat)
+        _move_seats(restore, True, _restore_seat)
+
+# Waiting room: arrivals take a ticket and are let in, in order, at
+# WAITING_ROOM_ADMIT_PER_SECOND once the first WAITING_ROOM_BURST are through.
+
+def _room_key(exam_id, name):
+    return f'registrations:waiting-room:{exam_id}:{name}'
+
+def take_ticket(exam_id):
+    key = _room_key(exam_id, 'issued')
+    shared_cache.add(key, 0, None)
+    return shared_cache.incr(key)
+
+def now_serving(exam_id):
+    """Highest ticket number allowed in. Advances at most once per second across all processes."""
+    serving_key = _room_key(exam_id, 'serving')
+    tick_key = _room_key(exam_id, f'tick:{int(time.time())}')
+    if shared_cache.add(serving_key, settings.WAITING_ROOM_BURST, None):
+        shared_cache.add(tick_key, 1, 2)
+    elif shared_cache.add(tick_key, 1, 2):
+        serving = shared_cache.incr(serving_key, settings.WAITING_ROOM_ADMIT_PER_SECOND)
+        # Don't bank capacity while the room is empty, or the next surge walks straight in
+        ceiling = (shared_cache.get(_room_key(exam_id, 'issued')) or 0) + settings.WAITING_ROOM_BURST
+        if serving > ceiling:
+            shared_cache.set(serving_key, ceiling, None)
+            serving = ceiling
+        return serving
+    return shared_cache.get(serving_key, settings.WAITING_ROOM_BURST)
+
+def has_admission_pass(session, exam_id):
+    return session.get('admission_passes', {}).get(str(exam_id), 0) > time.time()
+
+async def ahas_admission_pass(session, exam_id):
+    return (await session.aget('admission_passes', {})).get(str(exam_id), 0) > time.time()
+
+def grant_admission_pass(session, exam_id):
+    passes = {
+        key: expires for key, expires in session.get('admission_passes', {}).items()
+        if expires > time.time()
+    }
+    passes[str(exam_id)] = time.time() + settings.WAITING_ROOM_PASS_SECONDS
+    session['admission_passes'] = passes
+    session.get('waiting_room_tickets', {}).pop(str(exam_id), None)
+    session.modified = True
+
+def get_ticket(session, exam_id):
+    tickets = session.setdefault('waiting_room_tickets', {})
+    if str(exam_id) not in tickets:
+        tickets[str(exam_id)] = take_ticket(exam_id)
+        session.modified = True
+    return tickets[str(exam_id)]
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class RegistrationsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'registrations'
+
+    def ready(self):
+        import registrations.signals
@@ -0,0 +1,120 @@
+import logging
+from django.conf import settings
+from django.core.mail import get_connection
+from django.db import transaction
+from django.db.models import F
+from accounts.models import Notification
+from accounts.pubsub import publish
+from accounts.utils import bump_notification_state
+from exams.catalogue import invalidate_user_registrations
+from jobs.backends import retry_delay
+from jobs.queue import enqueue
+from .admission import sync_seats
+from .models import Registration, BulkTransition
+from .utils import build_status_email, reserve_registration_numbers
+
+UPDATE_CHUNK_SIZE = 2000
+EMAIL_CHUNK_SIZE = 100
+
+logger = logging.getLogger(__name__)
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def transition_registrations(exam, queryset, status, reason=None, initiated_by=None):
+    """
+    Moves every registration in `queryset` to `status` with set-based writes.
+
+    Rows are read as plain tuples, updated with UPDATE ... WHERE id IN (...) per
+    chunk, and the post_save notification signal is replaced by one bulk_create.
+    Emails go to the job queue in chunks that share one SMTP connection.
+    """
+    with transaction.atomic():
+        rows = list(
+            queryset.select_for_update()
+            .order_by('id')
+            .values_list('id', 'student_id', 'registration_number')
+        )
+        transition = BulkTransition.objects.create(
+            exam=exam, status=status, reason=reason, total=len(rows), initiated_by=initiated_by
+        )
+        if not rows:
+            return transition
+
+        ids = [row[0] for row in rows]
+        fields = {'status': status}
+        if status == 'Rejected':
+            fields['rejection_reason'] = reason
+        elif status == 'Hold' and reason:
+            fields['hold_reason'] = reason
+        for chunk in _chunks(ids, UPDATE_CHUNK_SIZE):
+            Registration.objects.filter(id__in=chunk).update(**fields)
+            sync_seats(Registration.objects.filter(id__in=chunk))
+
+        if status == 'Approved':
+            missing = [row[0] for row in rows if not row[2]]
+            numbers = reserve_registration_numbers(exam.exam_date.year, len(missing))
+            Registration.objects.bulk_update(
+                [Registration(id=reg_id, registration_number=number) for reg_id, number in zip(missing, numbers)],
+                ['registration_number'],
+                batch_size=UPDATE_CHUNK_SIZE,
+            )
+
+        message = f"Update on your {exam.name} registration: Status is now {status}."
+        Notification.objects.bulk_create(
+            [Notification(user_id=row[1], message=message, link="/accounts/profile/") for row in rows],
+            batch_size=UPDATE_CHUNK_SIZE,
+        )
+        # bulk_create skips post_save, so the bell counters are bumped here instead
+        student_ids = [row[1] for row in rows]
+        for chunk in _chunks(student_ids, UPDATE_CHUNK_SIZE):
+            bump_notification_state(chunk, unread_delta=1)
+        invalidate_user_registrations(student_ids)
+        publish('registration_status', student_ids, data={'exam_id': exam.id, 'status': status})
+
+        for index, chunk in enumerate(_chunks(ids, EMAIL_CHUNK_SIZE)):
+            enqueue('registrations.send_status_emails', {
+                'transition_id': transition.id,
+                'registration_ids': chunk,
+            }, idempotency_key=f"bulk-transition:{transition.id}:{index}")
+            if status == 'Approved':
+                enqueue('registrations.build_hall_tickets', {'registration_ids': chunk},
+                        idempotency_key=f"bulk-hall-tickets:{transition.id}:{index}")
+
+    return transition
+
+def send_transition_emails(transition, registration_ids, attempt=1):
+    """
+    Sends one chunk of status emails over a single SMTP connection and records
+    progress. Recipients that fail are queued again as a smaller chunk with
+    backoff, and only counted as failed once JOB_MAX_ATTEMPTS rounds are used up.
+    """
+    registrations = Registration.objects.filter(id__in=registration_ids).select_related('student', 'exam')
+    sent = 0
+    failed_ids = []
+    with get_connection() as connection:
+        for registration in registrations:
+            try:
+                msg = build_status_email(registration, transition.status, reason=transition.reason, connection=connection)
+                if msg is not None:
+                    msg.send()
+                sent += 1
+            except Exception:
+                logger.exception("Status email for registration %s (bulk transition %s) failed", registration.id, transition.id)
+                failed_ids.append(registration.id)
+
+    failed = len(registration_ids) - sent - len(failed_ids)  # rows deleted since the transition
+    if failed_ids and attempt < settings.JOB_MAX_ATTEMPTS:
+        # Chunks are disjoint, so the first id keeps the retry's key unique
+        enqueue('registrations.send_status_emails', {
+            'transition_id': transition.id,
+            'registration_ids': failed_ids,
+            'attempt': attempt + 1,
+        }, idempotency_key=f"bulk-transition:{transition.id}:retry:{failed_ids[0]}:{attempt}", delay=retry_delay(attempt))
+    else:
+        failed += len(failed_ids)
+    BulkTransition.objects.filter(id=transition.id).update(
+        emails_sent=F('emails_sent') + sent,
+        emails_failed=F('emails_failed') + failed,
+    )
@@ -0,0 +1,47 @@
+import csv
+from django.utils import timezone
+from .models import Registration
+
+EXPORT_CHUNK_SIZE = 2000
+
+# (header, values_list field)
+EXPORT_COLUMNS = [
+    ('Registration Number', 'registration_number'),
+    ('Email', 'student__email'),
+    ('First Name', 'student__first_name'),
+    ('Last Name', 'student__last_name'),
+    ('Status', 'status'),
+    ('Payment Status', 'payment_status'),
+    ('Payment ID', 'razorpay_payment_id'),
+    ('Registered At', 'registered_at'),
+]
+
+class Echo:
+    """File-like object whose write() hands the formatted line straight back."""
+    def write(self, value):
+        return value
+
+def _cell(value):
+    if value is None:
+        return ''
+    if hasattr(value, 'tzinfo'):
+        return timezone.localtime(value).strftime('%Y-%m-%d %H:%M:%S')
+    value = str(value)
+    # Keep spreadsheet apps from evaluating user-supplied text as a formula
+    if value[:1] in ('=', '+', '-', '@'):
+        return "'" + value
+    return value
+
+def export_rows(exam, status=None):
+    registrations = Registration.objects.filter(exam=exam)
+    if status:
+        registrations = registrations.filter(status=status)
+    fields = [field for _, field in EXPORT_COLUMNS]
+    return registrations.order_by('id').values_list(*fields).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+def iter_csv(exam, status=None):
+    """Yields the export one CSV line at a time; memory use doesn't depend on the row count."""
+    writer = csv.writer(Echo())
+    yield writer.writerow([header for header, _ in EXPORT_COLUMNS])
+    for row in export_rows(exam, status):
+        yield writer.writerow([_cell(value) for value in row])
@@ -1,7 +1,34 @@
 from django import forms
 from .models import Registration
+from .uploads import validate_document, unsign_document_key
 
 class RegistrationForm(forms.ModelForm):
+    # Set by the chunked uploader instead of posting the file itself
+    document_token = forms.CharField(required=False, widget=forms.HiddenInput)
+
     class Meta:
         model = Registration
         fields = ['document']
+
+    def __init__(self, *args, user=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.user = user
+        self.fields['document'].required = False
+
+    def clean_document(self):
+        document = self.cleaned_data.get('document')
+        if document and hasattr(document, 'size'):
+            validate_document(document)
+        return document
+
+    def clean(self):
+        cleaned_data = super().clean()
+        token = cleaned_data.get('document_token')
+        if token:
+            key = unsign_document_key(self.user, token)
+            if key is None:
+                raise forms.ValidationError("Your upload has expired. Please upload the document again.")
+            cleaned_data['document'] = key
+        elif not cleaned_data.get('document'):
+            self.add_error('document', "Please upload the required document.")
+        return cleaned_data
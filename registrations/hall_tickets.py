@@ -0,0 +1,63 @@
+import hashlib
+from django.core.files.base import ContentFile
+from django.db import connections
+from django.template.loader import render_to_string
+from django.urls import reverse
+from .models import Registration
+from .qr import get_qr_code_bytes, hall_ticket_qr_data
+
+# Bump when printable_hall_ticket.html changes so stored tickets are rebuilt
+HALL_TICKET_TEMPLATE_VERSION = 1
+
+def hall_ticket_digest(registration):
+    """Fingerprint of everything printed on the ticket; a stored ticket with another digest is stale."""
+    data = f"{hall_ticket_qr_data(registration)}\n{registration.student.email}\nv{HALL_TICKET_TEMPLATE_VERSION}"
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+def render_hall_ticket(registration):
+    """Renders the hall ticket page. The QR image is warmed in the cache and linked by URL."""
+    get_qr_code_bytes(hall_ticket_qr_data(registration))
+    return render_to_string('registrations/printable_hall_ticket.html', {
+        'registration': registration,
+        'user': registration.student,
+        'exam': registration.exam,
+        'qr_src': reverse('registrations:hall_ticket_qr', args=[registration.id]),
+    })
+
+def build_hall_ticket(registration, force=False):
+    """
+    Stores the rendered ticket through the document storage backend and
+    returns its name. Up-to-date tickets are left alone unless `force` is set.
+    """
+    digest = hall_ticket_digest(registration)
+    if not force and registration.hall_ticket and registration.hall_ticket_digest == digest:
+        return registration.hall_ticket.name
+
+    storage = registration.hall_ticket.storage
+    old_name = registration.hall_ticket.name
+    html = render_hall_ticket(registration)
+    name = storage.save(f"registrations/hall_tickets/{registration.id}-{digest[:16]}.html", ContentFile(html.encode('utf-8')))
+
+    # update() rather than save() so the status-change notification signal stays quiet
+    Registration.objects.filter(pk=registration.pk).update(hall_ticket=name, hall_ticket_digest=digest)
+    registration.hall_ticket.name = name
+    registration.hall_ticket_digest = digest
+    if old_name and old_name != name:
+        storage.delete(old_name)
+    return name
+
+def build_hall_tickets(registration_ids, force=False):
+    registrations = Registration.objects.filter(id__in=registration_ids, status='Approved').select_related('student', 'exam')
+    return [build_hall_ticket(registration, force=force) for registration in registrations]
+
+def init_worker():
+    """Process pool initializer: make sure the child never reuses the parent's DB sockets."""
+    import django
+    django.setup()
+    connections.close_all()
+
+def build_hall_tickets_in_worker(registration_ids, force=False):
+    try:
+        return len(build_hall_tickets(registration_ids, force=force))
+    finally:
+        connections.close_all()
@@ -0,0 +1,158 @@
+import logging
+from collections import defaultdict
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.tokens import default_token_generator
+from django.core.exceptions import ValidationError
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.validators import validate_email
+from django.db import transaction
+from django.db.models import F
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.encoding import force_bytes
+from django.utils.html import strip_tags
+from django.utils.http import urlsafe_base64_encode
+from accounts.backends import invalidate_cached_users
+from accounts.models import CustomUser
+from exams.catalogue import invalidate_user_registrations
+from exams.models import Exam
+from jobs.queue import enqueue
+from .models import Registration, RegistrationImport, RegistrationSeats
+
+logger = logging.getLogger(__name__)
+
+IMPORT_BATCH_SIZE = 1000
+MAX_STORED_ERRORS = 500
+
+def _clean_row(row):
+    row = {(key or '').strip().lower(): (value or '').strip() for key, value in row.items()}
+    email = CustomUser.objects.normalize_email(row.get('email', ''))
+    if not email:
+        raise ValidationError("Email is required.")
+    validate_email(email)
+    return email, row.get('first_name', '')[:150], row.get('last_name', '')[:150]
+
+def import_registrations(exam, rows, initiated_by=None, filename='', mark_paid=False, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Enrolls every valid row of `rows` (dicts with email, first_name, last_name)
+    in `exam`, creating accounts as needed. Rows are upserted in batches, one
+    transaction each, and invalid rows are recorded on the returned import.
+    """
+    run = RegistrationImport.objects.create(exam=exam, filename=filename[:255], mark_paid=mark_paid, initiated_by=initiated_by)
+    errors = []
+    seen = set()
+    batch = []
+
+    def record(line, email, error):
+        run.error_count += 1
+        if len(errors) < MAX_STORED_ERRORS:
+            errors.append({'line': line, 'email': email, 'error': error})
+
+    for line, row in enumerate(rows, start=2):  # line 1 is the header
+        run.total_rows += 1
+        try:
+            email, first_name, last_name = _clean_row(row)
+        except ValidationError as e:
+            record(line, (row.get('email') or '').strip(), ' '.join(e.messages))
+            continue
+        if email in seen:
+            record(line, email, "Duplicate email in file.")
+            continue
+        seen.add(email)
+        batch.append((email, first_name, last_name))
+        if len(batch) >= batch_size:
+            _import_batch(run, exam, batch, mark_paid)
+            batch = []
+    if batch:
+        _import_batch(run, exam, batch, mark_paid)
+
+    run.errors = errors
+    run.finished_at = timezone.now()
+    run.save()
+    return run
+
+def _import_batch(run, exam, batch, mark_paid):
+    emails = [email for email, _, _ in batch]
+    with transaction.atomic():
+        existing = set(CustomUser.objects.filter(email__in=emails).values_list('email', flat=True))
+        # Existing accounts only get the name fields the file actually has, so
+        # rows are upserted in groups by which of the two they fill in
+        upserts = defaultdict(list)
+        for email, first_name, last_name in batch:
+            fields = tuple(field for field, value in (('first_name', first_name), ('last_name', last_name)) if value)
+            if email not in existing or fields:
+                upserts[fields].append(CustomUser(
+                    email=email, first_name=first_name, last_name=last_name, is_verified=True, password=make_password(None),
+                ))
+        for fields, users in upserts.items():
+            if fields:
+                CustomUser.objects.bulk_create(users, update_conflicts=True, unique_fields=['email'], update_fields=list(fields))
+            else:
+                CustomUser.objects.bulk_create(users, ignore_conflicts=True)
+        user_ids = dict(CustomUser.objects.filter(email__in=emails).values_list('email', 'id'))
+        # bulk_create skips post_save, so renamed accounts are dropped from the user cache here
+        renamed = [user.email for fields, users in upserts.items() if fields for user in users if user.email in existing]
+        if renamed:
+            invalidate_cached_users([user_ids[email] for email in renamed])
+
+        registered = set(
+            Registration.objects.filter(exam=exam, student_id__in=user_ids.values()).values_list('student_id', flat=True)
+        )
+        new_student_ids = [user_id for user_id in user_ids.values() if user_id not in registered]
+        Registration.objects.bulk_create([
+            Registration(student_id=user_id, exam=exam, document='', payment_status='Success' if mark_paid else 'Pending')
+            for user_id in new_student_ids
+        ], ignore_conflicts=True)
+        if new_student_ids:
+            RegistrationSeats.objects.get_or_create(exam=exam)
+            RegistrationSeats.objects.filter(exam=exam).update(taken=F('taken') + len(new_student_ids))
+
+        new_user_ids = [user_ids[email] for email in emails if email not in existing]
+        RegistrationImport.objects.filter(pk=run.pk).update(
+            users_created=F('users_created') + len(new_user_ids),
+            registrations_created=F('registrations_created') + len(new_student_ids),
+        )
+        run.users_created += len(new_user_ids)
+        run.registrations_created += len(new_student_ids)
+
+        invalidate_user_registrations(user_ids.values())
+        if new_student_ids:
+            enqueue('registrations.send_enrollment_emails', {
+                'exam_id': exam.id,
+                'user_ids': new_student_ids,
+                'new_user_ids': new_user_ids,
+            })
+
+def send_enrollment_emails(exam_id, user_ids, new_user_ids):
+    """
+    Tells imported students they are enrolled; new accounts get a link to
+    choose a password. A failed message is logged and skipped, so one bad
+    address doesn't fail (and on retry re-send) the whole chunk.
+    """
+    exam = Exam.objects.get(id=exam_id)
+    new_user_ids = set(new_user_ids)
+    email_from = settings.DEFAULT_FROM_EMAIL or settings.EMAIL_HOST_USER
+    sent = 0
+    with get_connection() as connection:
+        for user in CustomUser.objects.filter(id__in=user_ids):
+            try:
+                set_password_url = None
+                if user.id in new_user_ids:
+                    path = reverse('set_password', args=[urlsafe_base64_encode(force_bytes(user.pk)), default_token_generator.make_token(user)])
+                    set_password_url = settings.SITE_URL.rstrip('/') + path
+                html_content = render_to_string('emails/enrollment_email.html', {
+                    'user': user,
+                    'exam': exam,
+                    'set_password_url': set_password_url,
+                })
+                msg = EmailMultiAlternatives(
+                    f"You're enrolled: {exam.name}", strip_tags(html_content), email_from, [user.email], connection=connection,
+                )
+                msg.attach_alternative(html_content, "text/html")
+                msg.send()
+                sent += 1
+            except Exception:
+                logger.exception("Could not send enrollment email to user %s for exam %s", user.id, exam_id)
+    return sent
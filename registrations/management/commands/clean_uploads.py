@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from registrations.uploads import clean_staged_uploads
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes staged document chunks left behind by abandoned uploads. "
+        "Run it periodically on a host that mounts DOCUMENT_UPLOAD_STAGING_ROOT."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', dest='older_than', type=int, default=settings.DOCUMENT_UPLOAD_TOKEN_MAX_AGE // 60,
+                            help="Only files untouched for this many minutes (default: the upload token lifetime).")
+
+    def handle(self, *args, **options):
+        removed = clean_staged_uploads(options['older_than'] * 60)
+        self.stdout.write(self.style.SUCCESS(f"Removed {removed} staged upload files."))
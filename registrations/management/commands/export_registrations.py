@@ -0,0 +1,28 @@
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from exams.models import Exam
+from registrations.exports import iter_csv
+
+
+class Command(BaseCommand):
+    help = "Writes an exam's registrations as CSV to a file or stdout."
+
+    def add_arguments(self, parser):
+        parser.add_argument('exam_id', type=int)
+        parser.add_argument('--status', help="Only export registrations with this status.")
+        parser.add_argument('--output', help="File to write; defaults to stdout.")
+
+    def handle(self, *args, **options):
+        try:
+            exam = Exam.objects.get(id=options['exam_id'])
+        except Exam.DoesNotExist:
+            raise CommandError(f"Exam {options['exam_id']} does not exist.")
+
+        if options['output']:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as fh:
+                fh.writelines(iter_csv(exam, options['status']))
+            self.stderr.write(self.style.SUCCESS(f"Exported registrations of {exam.name} to {options['output']}."))
+        else:
+            self.stdout.ending = ''
+            for line in iter_csv(exam, options['status']):
+                self.stdout.write(line)
@@ -0,0 +1,43 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from exams.models import Exam
+from registrations.hall_tickets import build_hall_tickets, build_hall_tickets_in_worker, init_worker
+from registrations.models import Registration
+
+
+class Command(BaseCommand):
+    help = "Pre-renders hall tickets for every approved registration of an exam."
+
+    def add_arguments(self, parser):
+        parser.add_argument('exam_id', type=int)
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help="Worker processes; 1 renders in this process.")
+        parser.add_argument('--chunk-size', type=int, default=50)
+        parser.add_argument('--force', action='store_true', help="Rebuild tickets that are already up to date.")
+
+    def handle(self, *args, **options):
+        try:
+            exam = Exam.objects.get(id=options['exam_id'])
+        except Exam.DoesNotExist:
+            raise CommandError(f"Exam {options['exam_id']} does not exist.")
+
+        ids = list(Registration.objects.filter(exam=exam, status='Approved').order_by('id').values_list('id', flat=True))
+        size = options['chunk_size']
+        chunks = [ids[start:start + size] for start in range(0, len(ids), size)]
+
+        built = 0
+        if options['workers'] <= 1:
+            for chunk in chunks:
+                built += len(build_hall_tickets(chunk, force=options['force']))
+        else:
+            # Children must open their own connections
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['workers'], initializer=init_worker) as pool:
+                for count in pool.map(partial(build_hall_tickets_in_worker, force=options['force']), chunks):
+                    built += count
+                    self.stdout.write(f"  {built}/{len(ids)}")
+
+        self.stdout.write(self.style.SUCCESS(f"Generated hall tickets for {built} registrations of {exam.name}."))
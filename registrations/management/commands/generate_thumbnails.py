@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from exams.models import Exam
+from registrations.models import Registration
+from registrations.thumbnails import build_document_thumbnails
+
+
+class Command(BaseCommand):
+    help = "Pre-renders document thumbnails for every registration of an exam."
+
+    def add_arguments(self, parser):
+        parser.add_argument('exam_id', type=int)
+        parser.add_argument('--chunk-size', type=int, default=100)
+        parser.add_argument('--force', action='store_true', help="Rebuild thumbnails that are already up to date.")
+
+    def handle(self, *args, **options):
+        try:
+            exam = Exam.objects.get(id=options['exam_id'])
+        except Exam.DoesNotExist:
+            raise CommandError(f"Exam {options['exam_id']} does not exist.")
+
+        ids = list(Registration.objects.filter(exam=exam).exclude(document='').order_by('id').values_list('id', flat=True))
+        size = options['chunk_size']
+
+        built = 0
+        for start in range(0, len(ids), size):
+            built += len(build_document_thumbnails(ids[start:start + size], force=options['force']))
+            self.stdout.write(f"  {built}/{len(ids)}")
+
+        self.stdout.write(self.style.SUCCESS(f"Generated thumbnails for {built} registrations of {exam.name}."))
@@ -0,0 +1,35 @@
+import csv
+from django.core.management.base import BaseCommand, CommandError
+from exams.models import Exam
+from registrations.imports import IMPORT_BATCH_SIZE, import_registrations
+
+
+class Command(BaseCommand):
+    help = "Enrolls a CSV of students (email, first_name, last_name) in an exam."
+
+    def add_arguments(self, parser):
+        parser.add_argument('exam_id', type=int)
+        parser.add_argument('path')
+        parser.add_argument('--paid', action='store_true', help="Mark imported registrations as paid.")
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            exam = Exam.objects.get(id=options['exam_id'])
+        except Exam.DoesNotExist:
+            raise CommandError(f"Exam {options['exam_id']} does not exist.")
+
+        with open(options['path'], newline='', encoding='utf-8-sig') as fh:
+            reader = csv.DictReader(fh)
+            if 'email' not in [name.strip().lower() for name in reader.fieldnames or []]:
+                raise CommandError("The CSV needs an 'email' column.")
+            run = import_registrations(
+                exam, reader, filename=options['path'], mark_paid=options['paid'], batch_size=options['batch_size'],
+            )
+
+        for error in run.errors:
+            self.stderr.write(f"  line {error['line']} ({error['email']}): {error['error']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {run.registrations_created} registrations ({run.users_created} new accounts) "
+            f"from {run.total_rows} rows; {run.error_count} skipped."
+        ))
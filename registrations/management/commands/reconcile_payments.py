@@ -0,0 +1,56 @@
+import datetime
+from django.conf import settings
+from django.db.models import Q
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from registrations.models import Registration
+from registrations.payments import expire_unpaid_registration, get_payment_client, mark_payment_failed, reconcile_order
+
+
+class Command(BaseCommand):
+    help = (
+        "Checks stale pending payments against the gateway and records the ones that were paid or failed. "
+        "Seats still unpaid --expire-after minutes after they were claimed, with or without an order, "
+        "are marked failed, which frees them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', dest='older_than', type=int, default=30, help="Only seats claimed more than this many minutes ago.")
+        parser.add_argument('--expire-after', dest='expire_after', type=int, default=settings.PAYMENT_PENDING_EXPIRY_MINUTES,
+                            help="Give up on seats still unpaid this many minutes after they were claimed.")
+        parser.add_argument('--batch-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - datetime.timedelta(minutes=options['older_than'])
+        expiry = timezone.now() - datetime.timedelta(minutes=options['expire_after'])
+        # Imported registrations have no claim time: their orders are checked but never expired
+        pending = Registration.objects.filter(
+            Q(seat_claimed_at__lt=cutoff) | Q(seat_claimed_at__isnull=True, razorpay_order_id__isnull=False, registered_at__lt=cutoff),
+            payment_status='Pending',
+        ).order_by('id')
+        client = get_payment_client()
+
+        checked = updated = expired = 0
+        last_id = 0
+        while True:
+            batch = list(pending.filter(id__gt=last_id).values_list('id', 'razorpay_order_id', 'seat_claimed_at')[:options['batch_size']])
+            if not batch:
+                break
+            for registration_id, order_id, claimed_at in batch:
+                try:
+                    expiring = claimed_at is not None and claimed_at < expiry
+                    if order_id is None:
+                        # Order creation failed after the seat was claimed
+                        if expiring and expire_unpaid_registration(registration_id):
+                            expired += 1
+                    elif reconcile_order(order_id, client=client):
+                        updated += 1
+                    elif expiring:
+                        mark_payment_failed(order_id)
+                        expired += 1
+                except Exception as e:
+                    self.stderr.write(f"Could not reconcile registration {registration_id}: {e}")
+                checked += 1
+            last_id = batch[-1][0]
+
+        self.stdout.write(self.style.SUCCESS(f"Checked {checked} pending payments, updated {updated}, expired {expired}."))
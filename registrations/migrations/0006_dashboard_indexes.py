@@ -0,0 +1,32 @@
+# Generated by Django 5.1.4 on 2026-10-18 15:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0003_exam_location'),
+        ('registrations', '0005_bulktransition'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='registration',
+            index=models.Index(fields=['-registered_at', '-id'], name='reg_registered_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='registration',
+            index=models.Index(fields=['status', '-registered_at', '-id'], name='reg_status_registered_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='registration',
+            index=models.Index(fields=['exam', '-registered_at', '-id'], name='reg_exam_registered_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='registration',
+            index=models.Index(fields=['exam', 'status', '-registered_at', '-id'], name='reg_exam_status_registered_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.4 on 2026-10-18 15:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('registrations', '0007_registrationsequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='registration',
+            name='hall_ticket',
+            field=models.FileField(blank=True, null=True, upload_to='registrations/hall_tickets/'),
+        ),
+        migrations.AddField(
+            model_name='registration',
+            name='hall_ticket_digest',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.4 on 2026-10-18 15:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_seats(apps, schema_editor):
+    Exam = apps.get_model('exams', 'Exam')
+    RegistrationSeats = apps.get_model('registrations', 'RegistrationSeats')
+    taken = Exam.objects.annotate(taken=Count('registrations')).values_list('id', 'taken')
+    RegistrationSeats.objects.bulk_create(
+        [RegistrationSeats(exam_id=exam_id, taken=count) for exam_id, count in taken],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0004_exam_capacity'),
+        ('registrations', '0009_payment_events'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegistrationSeats',
+            fields=[
+                ('exam', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='seats', serialize=False, to='exams.exam')),
+                ('taken', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(backfill_seats, migrations.RunPython.noop),
+    ]
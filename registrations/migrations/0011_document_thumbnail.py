@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 15:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('registrations', '0010_registration_seats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='registration',
+            name='document_thumbnail',
+            field=models.FileField(blank=True, null=True, upload_to='registrations/thumbnails/'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.4 on 2026-10-18 18:05
+
+from django.db import migrations, models
+from django.db.models import Count, F, Q
+from django.db.models.functions import Greatest
+
+
+def release_stale_seats(apps, schema_editor):
+    Registration = apps.get_model('registrations', 'Registration')
+    RegistrationSeats = apps.get_model('registrations', 'RegistrationSeats')
+    stale = Registration.objects.filter(Q(status='Rejected') | Q(payment_status='Failed'))
+    for exam_id, count in stale.values('exam_id').annotate(count=Count('id')).values_list('exam_id', 'count'):
+        RegistrationSeats.objects.filter(exam_id=exam_id).update(taken=Greatest(F('taken') - count, 0))
+    stale.update(holds_seat=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('registrations', '0012_registration_imports'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='registration',
+            name='holds_seat',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.RunPython(release_stale_seats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.4 on 2026-10-19 09:12
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_seat_claims(apps, schema_editor):
+    # Unpaid orders placed before this field existed still expire from their registration time
+    Registration = apps.get_model('registrations', 'Registration')
+    Registration.objects.filter(
+        holds_seat=True, payment_status='Pending', razorpay_order_id__isnull=False
+    ).update(seat_claimed_at=F('registered_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('registrations', '0013_registration_holds_seat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='registration',
+            name='seat_claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_seat_claims, migrations.RunPython.noop),
+    ]
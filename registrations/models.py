@@ -6,6 +6,7 @@ class Registration(models.Model):
     student = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='registrations')
     exam = models.ForeignKey(Exam, on_delete=models.CASCADE, related_name='registrations')
     document = models.FileField(upload_to='registrations/documents/')
+    document_thumbnail = models.FileField(upload_to='registrations/thumbnails/', blank=True, null=True)
     registered_at = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=20, default='Pending', choices=[
         ('Pending', 'Pending'),
@@ -21,12 +22,106 @@ class Registration(models.Model):
         ('Success', 'Success'),
         ('Failed', 'Failed'),
     ])
-    razorpay_order_id = models.CharField(max_length=100, blank=True, null=True)
+    razorpay_order_id = models.CharField(max_length=100, blank=True, null=True, db_index=True)
     razorpay_payment_id = models.CharField(max_length=100, blank=True, null=True)
     razorpay_signature = models.CharField(max_length=255, blank=True, null=True)
+    hall_ticket = models.FileField(upload_to='registrations/hall_tickets/', blank=True, null=True)
+    hall_ticket_digest = models.CharField(max_length=64, blank=True, null=True)
+    # Whether this registration is counted in RegistrationSeats.taken; see admission.sync_seats
+    holds_seat = models.BooleanField(default=True)
+    # When the student last claimed a seat themselves; unpaid claims expire from here (see reconcile_payments)
+    seat_claimed_at = models.DateTimeField(blank=True, null=True)
 
     class Meta:
         unique_together = ('student', 'exam')
+        indexes = [
+            # Keyset pagination and filters on the admin dashboard
+            models.Index(fields=['-registered_at', '-id'], name='reg_registered_idx'),
+            models.Index(fields=['status', '-registered_at', '-id'], name='reg_status_registered_idx'),
+            models.Index(fields=['exam', '-registered_at', '-id'], name='reg_exam_registered_idx'),
+            models.Index(fields=['exam', 'status', '-registered_at', '-id'], name='reg_exam_status_registered_idx'),
+        ]
 
     def __str__(self):
         return f"{self.student.email} - {self.exam.name}"
+
+class RegistrationSequence(models.Model):
+    """Per-year counter behind registration numbers; see utils.reserve_registration_numbers."""
+    year = models.PositiveIntegerField(unique=True)
+    last_value = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.year}: {self.last_value}"
+
+class RegistrationSeats(models.Model):
+    """Seats taken per exam, kept apart from Exam so edits to the exam never overwrite the counter."""
+    exam = models.OneToOneField(Exam, on_delete=models.CASCADE, primary_key=True, related_name='seats')
+    taken = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.exam}: {self.taken}"
+
+class PaymentEvent(models.Model):
+    """Raw gateway webhook events, one row per event id. Only processed_at is ever updated."""
+    event_id = models.CharField(max_length=100, unique=True)
+    event_type = models.CharField(max_length=50)
+    payload = models.JSONField()
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['-received_at']
+
+    def __str__(self):
+        return f"{self.event_type} ({self.event_id})"
+
+class BulkTransition(models.Model):
+    exam = models.ForeignKey(Exam, on_delete=models.CASCADE, related_name='bulk_transitions')
+    status = models.CharField(max_length=20)
+    reason = models.TextField(blank=True, null=True)
+    total = models.PositiveIntegerField(default=0)
+    emails_sent = models.PositiveIntegerField(default=0)
+    emails_failed = models.PositiveIntegerField(default=0)
+    initiated_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.exam.name}: {self.total} → {self.status}"
+
+    @property
+    def emails_processed(self):
+        return self.emails_sent + self.emails_failed
+
+    @property
+    def is_complete(self):
+        return self.emails_processed >= self.total
+
+    @property
+    def progress_percent(self):
+        if not self.total:
+            return 100
+        return min(100, int(self.emails_processed * 100 / self.total))
+
+class RegistrationImport(models.Model):
+    """One CSV import of a pre-registered cohort, with the rows that were skipped."""
+    exam = models.ForeignKey(Exam, on_delete=models.CASCADE, related_name='imports')
+    filename = models.CharField(max_length=255, blank=True)
+    mark_paid = models.BooleanField(default=False)
+    total_rows = models.PositiveIntegerField(default=0)
+    users_created = models.PositiveIntegerField(default=0)
+    registrations_created = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    # [{'line': ..., 'email': ..., 'error': ...}], capped so a bad file can't bloat the row
+    errors = models.JSONField(default=list, blank=True)
+    initiated_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.exam.name}: {self.registrations_created}/{self.total_rows} imported"
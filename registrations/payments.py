@@ -0,0 +1,226 @@
+import asyncio
+import hashlib
+import hmac
+import itertools
+import weakref
+from functools import lru_cache
+import razorpay
+import requests
+from asgiref.sync import sync_to_async
+from razorpay.utility import Utility
+from django.conf import settings
+from core.cache import shared_cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .admission import sync_seats
+from .models import Registration, PaymentEvent
+
+try:
+    import httpx  # optional: lets async views create orders without tying up a thread
+except ImportError:
+    httpx = None
+
+def build_razorpay_client():
+    # One pooled session per process so order creation reuses TLS connections
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=1, pool_maxsize=settings.PAYMENT_HTTP_POOL_SIZE
+    )
+    session.mount('https://', adapter)
+    client = razorpay.Client(
+        session=session,
+        auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET),
+        max_retries=settings.PAYMENT_HTTP_RETRIES,
+    )
+    client.enable_retry(settings.PAYMENT_HTTP_RETRIES > 1)
+    return client
+
+@lru_cache(maxsize=None)
+def _load_client(path):
+    return import_string(path)()
+
+def get_payment_client():
+    """Returns the gateway client configured by PAYMENT_CLIENT (a dotted path to a factory)."""
+    return _load_client(settings.PAYMENT_CLIENT)
+
+class _FakeOrders:
+    def __init__(self, gateway):
+        self.gateway = gateway
+
+    def create(self, data=None, **kwargs):
+        order_id = f"order_fake{next(self.gateway.counter)}"
+        order = {'id': order_id, 'entity': 'order', 'status': 'created', 'amount_paid': 0, **(data or {})}
+        self.gateway.orders[order_id] = order
+        self.gateway.payments[order_id] = []
+        return order
+
+    def fetch(self, order_id, **kwargs):
+        return self.gateway.orders[order_id]
+
+    async def acreate(self, data=None, **kwargs):
+        return self.create(data=data, **kwargs)
+
+    def payments(self, order_id, **kwargs):
+        items = self.gateway.payments.get(order_id, [])
+        return {'entity': 'collection', 'count': len(items), 'items': items}
+
+class FakeRazorpayClient:
+    """
+    In-memory stand-in for razorpay.Client covering the calls this app makes.
+    Signatures use the real HMAC scheme, so signed callbacks and webhooks can be
+    produced with `sign_payment` and `sign_webhook`.
+    """
+
+    def __init__(self, key_id='rzp_test_fake', key_secret='fake_secret'):
+        self.auth = (key_id, key_secret)
+        self.counter = itertools.count(1)
+        self.orders = {}
+        self.payments = {}
+        self.order = _FakeOrders(self)
+        self.utility = Utility(self)
+
+    def capture(self, order_id, payment_id=None):
+        payment_id = payment_id or f"pay_fake{next(self.counter)}"
+        payment = {'id': payment_id, 'order_id': order_id, 'status': 'captured'}
+        self.payments[order_id].append(payment)
+        self.orders[order_id]['status'] = 'paid'
+        return payment
+
+    def sign_payment(self, order_id, payment_id):
+        return hmac.new(self.auth[1].encode(), f"{order_id}|{payment_id}".encode(), hashlib.sha256).hexdigest()
+
+    @staticmethod
+    def sign_webhook(body, secret):
+        return hmac.new(secret.encode(), body.encode(), hashlib.sha256).hexdigest()
+
+def _order_cache_key(registration):
+    return f"payment-order:{registration.exam_id}:{registration.id}"
+
+# httpx connection pools belong to the event loop that opened them
+_async_http_clients = weakref.WeakKeyDictionary()
+
+def _get_async_http_client():
+    loop = asyncio.get_running_loop()
+    if loop not in _async_http_clients:
+        _async_http_clients[loop] = httpx.AsyncClient(
+            timeout=settings.PAYMENT_HTTP_TIMEOUT,
+            limits=httpx.Limits(max_connections=settings.PAYMENT_HTTP_POOL_SIZE),
+            transport=httpx.AsyncHTTPTransport(retries=settings.PAYMENT_HTTP_RETRIES),
+        )
+    return _async_http_clients[loop]
+
+async def acreate_order(data):
+    """
+    Async counterpart of `get_payment_client().order.create`. Razorpay's SDK is
+    blocking, so its Orders API is called over httpx when that is installed;
+    other clients can provide `order.acreate`, and anything else runs in a
+    worker thread.
+    """
+    client = get_payment_client()
+    if hasattr(client.order, 'acreate'):
+        return await client.order.acreate(data=data, timeout=settings.PAYMENT_HTTP_TIMEOUT)
+    if httpx is not None and isinstance(client, razorpay.Client):
+        response = await _get_async_http_client().post(f"{client.base_url}/v1/orders", json=data, auth=client.auth)
+        response.raise_for_status()
+        return response.json()
+    return await sync_to_async(client.order.create, thread_sensitive=False)(
+        data=data, timeout=settings.PAYMENT_HTTP_TIMEOUT
+    )
+
+async def aget_or_create_order(registration, amount):
+    """
+    Returns a gateway order for `registration`, reusing the cached one while it
+    is still attached to the registration and for the same amount. Must be
+    called outside a transaction so no row lock is held during the HTTP call.
+    """
+    key = _order_cache_key(registration)
+    order = await shared_cache.aget(key)
+    if order and order['id'] == registration.razorpay_order_id and order['amount'] == amount:
+        return order
+
+    order = await acreate_order({
+        "amount": amount,
+        "currency": "INR",
+        "receipt": f"reg_{registration.id}",
+    })
+
+    await Registration.objects.filter(pk=registration.pk).aupdate(razorpay_order_id=order['id'])
+    registration.razorpay_order_id = order['id']
+    await shared_cache.aset(key, order, settings.PAYMENT_ORDER_CACHE_TIMEOUT)
+    return order
+
+def mark_payment_captured(order_id, payment_id, signature=None):
+    """
+    Marks the registration for `order_id` as paid. Safe to call repeatedly and
+    concurrently (browser callback, webhook, reconciliation): the row is locked
+    and a registration that is already paid is left untouched.
+    """
+    with transaction.atomic():
+        registration = Registration.objects.select_for_update().filter(razorpay_order_id=order_id).first()
+        if registration is None or registration.payment_status == 'Success':
+            return registration
+        registration.payment_status = 'Success'
+        registration.razorpay_payment_id = payment_id
+        if signature:
+            registration.razorpay_signature = signature
+        registration.save(update_fields=['payment_status', 'razorpay_payment_id', 'razorpay_signature'])
+        sync_seats(Registration.objects.filter(pk=registration.pk))
+    return registration
+
+def mark_payment_failed(order_id):
+    return _fail_payment(razorpay_order_id=order_id)
+
+def expire_unpaid_registration(registration_id):
+    """Gives up on a pending registration that never got as far as a gateway order, freeing its seat."""
+    return _fail_payment(pk=registration_id, razorpay_order_id__isnull=True)
+
+def _fail_payment(**lookup):
+    with transaction.atomic():
+        registration = Registration.objects.select_for_update().filter(**lookup).first()
+        if registration is None or registration.payment_status != 'Pending':
+            return registration
+        registration.payment_status = 'Failed'
+        registration.save(update_fields=['payment_status'])
+        sync_seats(Registration.objects.filter(pk=registration.pk))
+    return registration
+
+def record_payment_event(event_id, payload):
+    """Stores a raw webhook event once; returns (event, created)."""
+    try:
+        with transaction.atomic():
+            event = PaymentEvent.objects.create(
+                event_id=event_id,
+                event_type=payload.get('event', ''),
+                payload=payload,
+            )
+        return event, True
+    except IntegrityError:
+        return PaymentEvent.objects.get(event_id=event_id), False
+
+def apply_payment_event(event):
+    entities = event.payload.get('payload', {})
+    payment = entities.get('payment', {}).get('entity', {})
+    order = entities.get('order', {}).get('entity', {})
+    order_id = payment.get('order_id') or order.get('id')
+
+    if order_id:
+        if event.event_type in ('payment.captured', 'order.paid'):
+            mark_payment_captured(order_id, payment.get('id'))
+        elif event.event_type == 'payment.failed':
+            mark_payment_failed(order_id)
+
+    PaymentEvent.objects.filter(pk=event.pk).update(processed_at=timezone.now())
+
+def reconcile_order(order_id, client=None):
+    """Asks the gateway about one pending order. Returns the new payment status, or None if unchanged."""
+    client = client or get_payment_client()
+    payments = client.order.payments(order_id).get('items', [])
+    captured = next((p for p in payments if p.get('status') == 'captured'), None)
+    if captured:
+        mark_payment_captured(order_id, captured['id'])
+        return 'Success'
+    if payments and all(p.get('status') == 'failed' for p in payments):
+        mark_payment_failed(order_id)
+        return 'Failed'
+    return None
@@ -0,0 +1,24 @@
+import hashlib
+from django.conf import settings
+from core.cache import get_or_set
+from .utils import generate_qr_code_bytes
+
+QR_CACHE_PREFIX = 'qr'
+
+def hall_ticket_qr_data(registration, exam=None):
+    exam = exam or registration.exam
+    return f"Reg No: {registration.registration_number}\nStudent: {registration.student.get_full_name()}\nExam: {exam.name}\nDate: {exam.exam_date}\nLocation: {exam.location}"
+
+def qr_digest(data):
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+def get_qr_code_bytes(data):
+    """
+    Returns the QR PNG for `data`. Entries are keyed on a hash of the payload,
+    so a changed exam date or location simply produces a new key and the old
+    entry ages out on its own.
+    """
+    return get_or_set(
+        f"{QR_CACHE_PREFIX}:{qr_digest(data)}", lambda: generate_qr_code_bytes(data), settings.QR_CODE_CACHE_TIMEOUT,
+        namespace='qr_codes', alias=settings.QR_CODE_CACHE_ALIAS, local_timeout=settings.QR_CODE_LOCAL_TIMEOUT,
+    )
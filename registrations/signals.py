@@ -0,0 +1,13 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .admission import clear_admission_state, release_seat
+from .models import Registration
+
+@receiver(post_save, sender='exams.Exam')
+def refresh_admission_state(sender, instance, **kwargs):
+    clear_admission_state(instance.pk)
+
+@receiver(post_delete, sender=Registration)
+def free_seat(sender, instance, **kwargs):
+    if instance.holds_seat:
+        release_seat(instance.exam_id)
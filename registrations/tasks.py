@@ -0,0 +1,24 @@
+from jobs.registry import task
+from .bulk import send_transition_emails
+from .hall_tickets import build_hall_tickets
+from .imports import send_enrollment_emails
+from .models import Registration, BulkTransition
+from .utils import send_status_email
+
+@task('registrations.send_status_email')
+def send_status_email_task(registration_id, status, reason=None):
+    registration = Registration.objects.select_related('student', 'exam').get(id=registration_id)
+    send_status_email(registration, status, reason=reason)
+
+@task('registrations.send_status_emails')
+def send_status_emails_task(transition_id, registration_ids, attempt=1):
+    transition = BulkTransition.objects.get(id=transition_id)
+    send_transition_emails(transition, registration_ids, attempt=attempt)
+
+@task('registrations.build_hall_tickets')
+def build_hall_tickets_task(registration_ids):
+    build_hall_tickets(registration_ids)
+
+@task('registrations.send_enrollment_emails')
+def send_enrollment_emails_task(exam_id, user_ids, new_user_ids):
+    send_enrollment_emails(exam_id, user_ids, new_user_ids)
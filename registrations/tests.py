@@ -1,3 +1,819 @@
-from django.test import TestCase
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core import mail
+from django.core.mail import EmailMultiAlternatives
+from django.db import connection
+from django.core.cache import cache
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from unittest import mock
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from accounts.backends import get_cached_user
+from accounts.models import CustomUser, Notification
+from exams.models import Exam
+from jobs.backends import DatabaseBackend
+from registrations import qr
+from registrations.admission import FULL, get_admission_state
+from registrations.hall_tickets import build_hall_ticket
+from registrations.bulk import transition_registrations
+from registrations.models import Registration, BulkTransition, RegistrationSequence, PaymentEvent, RegistrationSeats
+from registrations.imports import import_registrations, send_enrollment_emails
+from jobs.models import Job
+from core.cache import local_cache
+from core.testing import QueryPlanAssertionsMixin, QueryBudgetTestMixin, seed_query_budget_data
+from registrations.payments import get_payment_client, acreate_order, mark_payment_failed, _load_client
+from registrations.uploads import UploadError, append_chunk, load_upload, start_upload, upload_offset
+from registrations.utils import build_status_email, format_registration_number, reserve_registration_numbers
+import datetime
+import io
+import json
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 
-# Create your tests here.
+class BulkTransitionTest(TestCase):
+    def setUp(self):
+        self.staff = CustomUser.objects.create_user(email="staff@example.com", password="password", is_staff=True)
+        self.exam = Exam.objects.create(
+            name="Bulk Exam",
+            banner="test_banner.jpg",
+            description="Description",
+            eligibility="All students",
+            exam_date=timezone.now() + datetime.timedelta(days=15),
+        )
+        for i in range(5):
+            student = CustomUser.objects.create_user(email=f"bulk{i}@example.com", password="password")
+            Registration.objects.create(student=student, exam=self.exam, document="doc.pdf")
+
+    def make_exam(self, name, students):
+        exam = Exam.objects.create(
+            name=name,
+            banner="test_banner.jpg",
+            description="Description",
+            eligibility="All students",
+            exam_date=self.exam.exam_date,
+        )
+        for student in CustomUser.objects.filter(is_staff=False)[:students]:
+            Registration.objects.create(student=student, exam=exam, document="doc.pdf")
+        return exam
+
+    def approve(self, exam):
+        with CaptureQueriesContext(connection) as ctx:
+            transition_registrations(exam, Registration.objects.filter(exam=exam, status='Pending'), 'Approved')
+        return len(ctx.captured_queries)
+
+    def test_approve_all_pending_is_set_based(self):
+        transition = transition_registrations(self.exam, Registration.objects.filter(exam=self.exam, status='Pending'), 'Approved')
+        self.assertEqual(transition.total, 5)
+        self.assertEqual(Registration.objects.filter(status='Approved').count(), 5)
+        numbers = set(Registration.objects.values_list('registration_number', flat=True))
+        self.assertEqual(len(numbers), 5)
+        self.assertNotIn(None, numbers)
+        self.assertEqual(Notification.objects.count(), 5)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        for i in range(5, 20):
+            CustomUser.objects.create_user(email=f"bulk{i}@example.com", password="password")
+        self.approve(self.exam)  # creates this year's sequence row
+        self.assertEqual(self.approve(self.make_exam("Small", 2)), self.approve(self.make_exam("Large", 20)))
+
+    def test_emails_are_sent_in_chunks_with_progress(self):
+        self.client.force_login(self.staff)
+        self.client.post(f'/superuser/exams/{self.exam.id}/bulk-update/Rejected/', {'bulk_reason': 'Incomplete documents'})
+        self.assertEqual(Registration.objects.filter(status='Rejected', rejection_reason='Incomplete documents').count(), 5)
+        self.assertEqual(len(mail.outbox), 0)
+
+        DatabaseBackend().process()
+        self.assertEqual(len(mail.outbox), 5)
+        transition = BulkTransition.objects.get()
+        progress = self.client.get(f'/superuser/bulk-updates/{transition.id}/progress/').json()
+        self.assertEqual(progress['emails_sent'], 5)
+        self.assertTrue(progress['is_complete'])
+
+    def test_failed_recipients_are_retried_then_counted(self):
+        transition = transition_registrations(self.exam, Registration.objects.filter(exam=self.exam), 'Rejected', reason='Blurry')
+        unlucky = Registration.objects.filter(exam=self.exam).order_by('id').first()
+        build = build_status_email
+
+        def flaky_build(registration, *args, **kwargs):
+            if registration.id == unlucky.id:
+                raise ConnectionError("SMTP connection dropped")
+            return build(registration, *args, **kwargs)
+
+        with mock.patch('registrations.bulk.build_status_email', side_effect=flaky_build), \
+                self.assertLogs('registrations.bulk', 'ERROR'):
+            DatabaseBackend().process()
+        transition.refresh_from_db()
+        self.assertEqual((transition.emails_sent, transition.emails_failed), (4, 0))
+        retry = Job.objects.get(status='Queued', name='registrations.send_status_emails')
+        self.assertEqual(retry.payload['registration_ids'], [unlucky.id])
+        self.assertGreater(retry.run_at, timezone.now())
+
+        Job.objects.filter(pk=retry.pk).update(run_at=timezone.now())
+        with override_settings(JOB_MAX_ATTEMPTS=2), \
+                mock.patch('registrations.bulk.build_status_email', side_effect=flaky_build), \
+                self.assertLogs('registrations.bulk', 'ERROR'):
+            DatabaseBackend().process()
+        transition.refresh_from_db()
+        self.assertEqual((transition.emails_sent, transition.emails_failed), (4, 1))
+        self.assertFalse(Job.objects.filter(status='Queued', name='registrations.send_status_emails').exists())
+
+class RegistrationNumberTest(TestCase):
+    def test_reserved_block_is_unique_and_formatted(self):
+        numbers = reserve_registration_numbers(2026, 500)
+        self.assertEqual(len(set(numbers)), 500)
+        self.assertTrue(all(n.startswith('REG-2026-') and len(n) == 13 for n in numbers))
+        self.assertEqual(RegistrationSequence.objects.get(year=2026).last_value, 500)
+        self.assertFalse(set(numbers) & set(reserve_registration_numbers(2026, 500)))
+
+    def test_skips_numbers_taken_by_legacy_rows(self):
+        student = CustomUser.objects.create_user(email="legacy@example.com", password="password")
+        exam = Exam.objects.create(
+            name="Legacy Exam",
+            banner="test_banner.jpg",
+            description="Description",
+            eligibility="All students",
+            exam_date=timezone.now() + datetime.timedelta(days=15),
+        )
+        Registration.objects.create(student=student, exam=exam, document="doc.pdf",
+                                    registration_number=format_registration_number(2026, 1))
+        self.assertEqual(reserve_registration_numbers(2026, 1), [format_registration_number(2026, 2)])
+
+    def test_width_grows_after_namespace_is_used_up(self):
+        self.assertEqual(len(format_registration_number(2026, 36 ** 4 - 1)), 13)
+        self.assertEqual(len(format_registration_number(2026, 36 ** 4)), 14)
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'local': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'local-qr-tests'},
+    'qr_codes': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'qr-tests'},
+})
+class HallTicketQRCodeTest(TestCase):
+    def setUp(self):
+        local_cache.clear()
+        self.student = CustomUser.objects.create_user(email="qr@example.com", password="password", first_name="Q", last_name="R")
+        self.exam = Exam.objects.create(
+            name="QR Exam",
+            banner="test_banner.jpg",
+            description="Description",
+            eligibility="All students",
+            exam_date=timezone.now() + datetime.timedelta(days=15),
+        )
+        self.registration = Registration.objects.create(
+            student=self.student, exam=self.exam, document="doc.pdf", status='Approved', registration_number="REG-2026-TEST"
+        )
+        self.url = f'/registrations/hall-ticket/{self.registration.id}/qr.png'
+
+    def test_png_is_generated_once_and_revalidated_by_etag(self):
+        self.client.force_login(self.student)
+        with mock.patch.object(qr, 'generate_qr_code_bytes', wraps=qr.generate_qr_code_bytes) as generate:
+            first = self.client.get(self.url)
+            self.client.get(self.url)
+            self.assertEqual(generate.call_count, 1)
+
+        self.assertEqual(first['Content-Type'], 'image/png')
+        self.assertEqual(first['Cache-Control'], 'private, no-cache')
+        not_modified = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_location_change_changes_etag(self):
+        self.client.force_login(self.student)
+        old_etag = self.client.get(self.url)['ETag']
+
+        self.exam.location = "Hall B"
+        with CaptureQueriesContext(connection) as queries:
+            self.exam.save()
+        # Keys are content-addressed, so saving doesn't walk the registrations
+        self.assertFalse([q for q in queries if 'registrations_registration' in q['sql']])
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=old_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], old_etag)
+
+    def test_other_students_cannot_fetch_qr(self):
+        other = CustomUser.objects.create_user(email="other-qr@example.com", password="password")
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'local': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'local-hall-ticket-tests'},
+    'qr_codes': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'hall-ticket-tests'},
+})
+class HallTicketArtifactTest(TestCase):
+    def setUp(self):
+        self.student = CustomUser.objects.create_user(email="ticket@example.com", password="password")
+        self.exam = Exam.objects.create(
+            name="Ticket Exam",
+            banner="test_banner.jpg",
+            description="Description",
+            eligibility="All students",
+            exam_date=timezone.now() + datetime.timedelta(days=15),
+        )
+        self.registration = Registration.objects.create(
+            student=self.student, exam=self.exam, document="doc.pdf", status='Approved', registration_number="REG-2026-TCKT"
+        )
+
+    def test_ticket_is_built_once_and_served_from_storage(self):
+        self.client.force_login(self.student)
+        response = self.client.get(f'/registrations/hall-ticket/{self.registration.id}/')
+        self.assertIn(b"REG-2026-TCKT", b"".join(response.streaming_content))
+        self.registration.refresh_from_db()
+        name = self.registration.hall_ticket.name
+        self.assertTrue(self.registration.hall_ticket.storage.exists(name))
+
+        with mock.patch('registrations.hall_tickets.render_hall_ticket') as render:
+            self.client.get(f'/registrations/hall-ticket/{self.registration.id}/')
+            render.assert_not_called()
+
+    def test_exam_change_makes_ticket_stale(self):
+        old_name = build_hall_ticket(self.registration)
+        self.exam.location = "Hall C"
+        self.exam.save()
+        registration = Registration.objects.select_related('student', 'exam').get(id=self.registration.id)
+        new_name = build_hall_ticket(registration)
+        self.assertNotEqual(old_name, new_name)
+        self.assertFalse(registration.hall_ticket.storage.exists(old_name))
+
+    def test_command_generates_tickets_for_exam(self):
+        call_command('generate_hall_tickets', self.exam.id, workers=1, stdout=io.StringIO())
+        self.registration.refresh_from_db()
+        self.assertTrue(self.registration.hall_ticket)
+
+@override_settings(PAYMENT_CLIENT='registrations.payments.FakeRazorpayClient', RAZORPAY_WEBHOOK_SECRET='whsec')
+class PaymentWebhookTest(TestCase):
+    def setUp(self):
+        _load_client.cache_clear()
+        self.addCleanup(_load_client.cache_clear)
+        self.gateway = get_payment_client()
+        self.student = CustomUser.objects.create_user(email="payer@example.com", password="password")
+        self.exam = Exam.objects.create(
+            name="Paid Exam",
+            banner="test_banner.jpg",
+            description="Description",
+            eligibility="All students",
+            exam_date=timezone.now() + datetime.timedelta(days=15),
+            fees=500,
+        )
+        self.order = self.gateway.order.create(data={'amount': 50000, 'currency': 'INR'})
+        self.registration = Registration.objects.create(
+            student=self.student, exam=self.exam, razorpay_order_id=self.order['id']
+        )
+
+    def post_event(self, payload, event_id='evt_1', secret='whsec'):
+        body = json.dumps(payload)
+        return self.client.post(
+            '/registrations/payment/webhook/', body, content_type='application/json',
+            HTTP_X_RAZORPAY_SIGNATURE=self.gateway.sign_webhook(body, secret),
+            HTTP_X_RAZORPAY_EVENT_ID=event_id,
+        )
+
+    def captured_payload(self, payment_id='pay_1'):
+        return {
+            'event': 'payment.captured',
+            'payload': {'payment': {'entity': {'id': payment_id, 'order_id': self.order['id'], 'status': 'captured'}}},
+        }
+
+    def test_captured_event_marks_registration_paid_once(self):
+        self.assertEqual(self.post_event(self.captured_payload()).status_code, 200)
+        self.assertEqual(self.post_event(self.captured_payload()).status_code, 200)
+
+        self.registration.refresh_from_db()
+        self.assertEqual(self.registration.payment_status, 'Success')
+        self.assertEqual(self.registration.razorpay_payment_id, 'pay_1')
+        self.assertEqual(PaymentEvent.objects.count(), 1)
+        self.assertIsNotNone(PaymentEvent.objects.get().processed_at)
+
+    def test_bad_signature_is_rejected(self):
+        response = self.post_event(self.captured_payload(), secret='wrong')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(PaymentEvent.objects.exists())
+
+    @override_settings(RAZORPAY_WEBHOOK_SECRET='')
+    def test_unset_secret_refuses_webhooks(self):
+        with self.assertLogs('registrations.views', 'ERROR'):
+            response = self.post_event(self.captured_payload(), secret='')
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(PaymentEvent.objects.exists())
+        self.registration.refresh_from_db()
+        self.assertNotEqual(self.registration.payment_status, 'Success')
+
+    def test_late_failure_does_not_undo_capture(self):
+        self.post_event(self.captured_payload())
+        failed = {'event': 'payment.failed', 'payload': {'payment': {'entity': {'id': 'pay_2', 'order_id': self.order['id']}}}}
+        self.post_event(failed, event_id='evt_2')
+
+        self.registration.refresh_from_db()
+        self.assertEqual(self.registration.payment_status, 'Success')
+
+    def test_callback_and_reconcile_are_idempotent(self):
+        payment = self.gateway.capture(self.order['id'])
+        self.client.force_login(self.student)
+        self.client.post('/registrations/payment/callback/', {
+            'razorpay_order_id': self.order['id'],
+            'razorpay_payment_id': payment['id'],
+            'razorpay_signature': self.gateway.sign_payment(self.order['id'], payment['id']),
+        })
+        self.registration.refresh_from_db()
+        self.assertEqual(self.registration.payment_status, 'Success')
+
+        call_command('reconcile_payments', older_than=0, stdout=io.StringIO())
+        self.registration.refresh_from_db()
+        self.assertEqual(self.registration.razorpay_payment_id, payment['id'])
+
+    def test_reconcile_picks_up_missed_payment(self):
+        Registration.objects.filter(pk=self.registration.pk).update(
+            seat_claimed_at=timezone.now() - datetime.timedelta(hours=1)
+        )
+        self.gateway.capture(self.order['id'], 'pay_missed')
+
+        out = io.StringIO()
+        call_command('reconcile_payments', older_than=30, stdout=out)
+        self.registration.refresh_from_db()
+        self.assertEqual(self.registration.payment_status, 'Success')
+        self.assertIn('updated 1', out.getvalue())
+
+@override_settings(PAYMENT_CLIENT='registrations.payments.FakeRazorpayClient', MEDIA_ROOT=tempfile.mkdtemp())
+class RegisterExamOrderTest(TestCase):
+    def setUp(self):
+        _load_client.cache_clear()
+        self.addCleanup(_load_client.cache_clear)
+        cache.clear()
+        self.gateway = get_payment_client()
+        self.student = CustomUser.objects.create_user(email="applicant@example.com", password="password")
+        self.exam = Exam.objects.create(
+            name="Order Exam",
+            banner="test_banner.jpg",
+            description="Description",
+            eligibility="All students",
+            exam_date=timezone.now() + datetime.timedelta(days=15),
+            fees=250,
+        )
+        self.client.force_login(self.student)
+
+    def submit(self):
+        return self.client.post(f'/registrations/exam/{self.exam.id}/register/', {
+            'document': SimpleUploadedFile('id.pdf', b'%PDF-1.4', content_type='application/pdf'),
+        })
+
+    def test_resubmission_reuses_unpaid_order(self):
+        first = self.submit()
+        second = self.submit()
+
+        self.assertEqual(len(self.gateway.orders), 1)
+        self.assertEqual(first.context['order']['id'], second.context['order']['id'])
+        registration = Registration.objects.get(student=self.student, exam=self.exam)
+        self.assertEqual(registration.razorpay_order_id, first.context['order']['id'])
+        self.assertEqual(first.context['order']['amount'], 25000)
+
+    def test_fee_change_creates_new_order(self):
+        self.submit()
+        Exam.objects.filter(pk=self.exam.pk).update(fees=300)
+        response = self.submit()
+
+        self.assertEqual(len(self.gateway.orders), 2)
+        self.assertEqual(response.context['order']['amount'], 30000)
+
+    def test_gateway_failure_keeps_registration(self):
+        with mock.patch.object(self.gateway.order, 'create', side_effect=ConnectionError("timed out")):
+            response = self.submit()
+
+        self.assertTemplateUsed(response, 'registrations/register_form.html')
+        registration = Registration.objects.get(student=self.student, exam=self.exam)
+        self.assertIsNone(registration.razorpay_order_id)
+
+    async def test_async_client_submission(self):
+        await self.async_client.aforce_login(self.student)
+        response = await self.async_client.post(f'/registrations/exam/{self.exam.id}/register/', {
+            'document': SimpleUploadedFile('id.pdf', b'%PDF-1.4', content_type='application/pdf'),
+        })
+        self.assertEqual(response.status_code, 200)
+        registration = await Registration.objects.aget(student=self.student, exam=self.exam)
+        self.assertEqual(registration.razorpay_order_id, response.context['order']['id'])
+
+    def test_clients_without_async_api_run_in_a_thread(self):
+        orders = mock.Mock(spec=['create'])
+        orders.create.return_value = {'id': 'order_sync', 'amount': 100}
+        with mock.patch('registrations.payments.get_payment_client', return_value=mock.Mock(order=orders)):
+            order = async_to_sync(acreate_order)({'amount': 100})
+        self.assertEqual(order['id'], 'order_sync')
+
+@override_settings(PAYMENT_CLIENT='registrations.payments.FakeRazorpayClient', MEDIA_ROOT=tempfile.mkdtemp())
+class AdmissionControlTest(TestCase):
+    def setUp(self):
+        _load_client.cache_clear()
+        self.addCleanup(_load_client.cache_clear)
+        cache.clear()
+        self.exam = Exam.objects.create(
+            name="Popular Exam",
+            banner="test_banner.jpg",
+            description="Description",
+            eligibility="All students",
+            exam_date=timezone.now() + datetime.timedelta(days=15),
+            capacity=1,
+        )
+
+    def register(self, email):
+        student = CustomUser.objects.create_user(email=email, password="password")
+        self.client.force_login(student)
+        return self.client.post(f'/registrations/exam/{self.exam.id}/register/', {
+            'document': SimpleUploadedFile('id.pdf', b'%PDF-1.4', content_type='application/pdf'),
+        })
+
+    def test_capacity_is_enforced_and_cached(self):
+        self.register("first@example.com")
+        response = self.register("second@example.com")
+
+        self.assertRedirects(response, '/exams/', fetch_redirect_response=False)
+        self.assertEqual(Registration.objects.filter(exam=self.exam).count(), 1)
+        self.assertEqual(RegistrationSeats.objects.get(exam=self.exam).taken, 1)
+        self.assertEqual(get_admission_state(self.exam.id), FULL)
+
+        self.client.get(f'/registrations/exam/{self.exam.id}/register/')
+        with self.assertNumQueries(2):  # session and user only
+            response = self.client.get(f'/registrations/exam/{self.exam.id}/register/')
+        self.assertRedirects(response, '/exams/', fetch_redirect_response=False)
+
+    def test_deleting_registration_frees_seat(self):
+        self.register("first@example.com")
+        Registration.objects.get(exam=self.exam).delete()
+        self.register("second@example.com")
+
+        self.assertTrue(Registration.objects.filter(exam=self.exam, student__email="second@example.com").exists())
+
+    def seats_taken(self):
+        return RegistrationSeats.objects.get(exam=self.exam).taken
+
+    def test_rejection_frees_seat_and_reinstating_takes_it_back(self):
+        self.register("first@example.com")
+        registration = Registration.objects.get(exam=self.exam)
+        staff = CustomUser.objects.create_user(email="seat-staff@example.com", password="password", is_staff=True)
+        self.client.force_login(staff)
+        self.client.post(f'/superuser/registration/{registration.id}/status/Rejected/', {'rejection_reason': "Blurry"})
+        self.assertEqual(self.seats_taken(), 0)
+        self.assertIsNone(get_admission_state(self.exam.id))
+
+        transition_registrations(self.exam, Registration.objects.filter(pk=registration.pk), 'Approved')
+        self.assertEqual(self.seats_taken(), 1)
+        transition_registrations(self.exam, Registration.objects.filter(pk=registration.pk), 'Approved')
+        self.assertEqual(self.seats_taken(), 1)
+
+    def test_failed_payment_frees_seat_until_retried(self):
+        self.register("first@example.com")
+        first = Registration.objects.get(exam=self.exam)
+        mark_payment_failed(first.razorpay_order_id)
+        self.assertEqual(self.seats_taken(), 0)
+
+        self.register("second@example.com")
+        self.assertEqual(self.seats_taken(), 1)
+        self.client.force_login(first.student)
+        response = self.client.post(f'/registrations/exam/{self.exam.id}/register/', {
+            'document': SimpleUploadedFile('id.pdf', b'%PDF-1.4', content_type='application/pdf'),
+        })
+        self.assertRedirects(response, '/exams/', fetch_redirect_response=False)
+        first.refresh_from_db()
+        self.assertFalse(first.holds_seat)
+
+    def test_reconcile_expires_unpaid_orders(self):
+        self.register("first@example.com")
+        Registration.objects.update(seat_claimed_at=timezone.now() - datetime.timedelta(hours=3))
+        out = io.StringIO()
+        call_command('reconcile_payments', expire_after=120, stdout=out)
+
+        registration = Registration.objects.get(exam=self.exam)
+        self.assertEqual(registration.payment_status, 'Failed')
+        self.assertFalse(registration.holds_seat)
+        self.assertEqual(self.seats_taken(), 0)
+        self.assertIn('expired 1', out.getvalue())
+
+    def test_reconcile_expires_seats_whose_order_was_never_created(self):
+        with mock.patch('registrations.views.aget_or_create_order', side_effect=RuntimeError("gateway down")):
+            self.register("first@example.com")
+        registration = Registration.objects.get(exam=self.exam)
+        self.assertIsNone(registration.razorpay_order_id)
+        self.assertEqual(self.seats_taken(), 1)
+
+        Registration.objects.update(seat_claimed_at=timezone.now() - datetime.timedelta(hours=3))
+        call_command('reconcile_payments', expire_after=120, stdout=io.StringIO())
+        registration.refresh_from_db()
+        self.assertEqual(registration.payment_status, 'Failed')
+        self.assertEqual(self.seats_taken(), 0)
+
+    def test_retried_payment_expires_from_the_new_claim(self):
+        self.register("first@example.com")
+        registration = Registration.objects.get(exam=self.exam)
+        mark_payment_failed(registration.razorpay_order_id)
+        Registration.objects.update(registered_at=timezone.now() - datetime.timedelta(hours=3))
+        self.client.post(f'/registrations/exam/{self.exam.id}/register/', {
+            'document': SimpleUploadedFile('id.pdf', b'%PDF-1.4', content_type='application/pdf'),
+        })
+        retried = Registration.objects.get(pk=registration.pk)
+        self.assertNotEqual(retried.razorpay_order_id, registration.razorpay_order_id)
+
+        call_command('reconcile_payments', older_than=0, expire_after=120, stdout=io.StringIO())
+        retried.refresh_from_db()
+        self.assertEqual(retried.payment_status, 'Pending')
+        self.assertTrue(retried.holds_seat)
+
+    def test_document_is_stored_before_the_seat_transaction(self):
+        depth = len(connection.atomic_blocks)
+        seen = []
+        save = FileSystemStorage.save
+
+        def record_depth(storage, *args, **kwargs):
+            seen.append(len(connection.atomic_blocks))
+            return save(storage, *args, **kwargs)
+
+        with mock.patch.object(FileSystemStorage, 'save', autospec=True, side_effect=record_depth):
+            self.register("first@example.com")
+        self.assertEqual(seen, [depth])
+
+    @override_settings(WAITING_ROOM_ENABLED=True, WAITING_ROOM_BURST=1, WAITING_ROOM_ADMIT_PER_SECOND=1)
+    def test_waiting_room_admits_in_order(self):
+        url = f'/registrations/exam/{self.exam.id}/register/'
+        room = f'/registrations/exam/{self.exam.id}/waiting-room/'
+        first = CustomUser.objects.create_user(email="early@example.com", password="password")
+        second = CustomUser.objects.create_user(email="late@example.com", password="password")
+
+        with mock.patch('registrations.admission.time.time', return_value=1000.0):
+            self.client.force_login(first)
+            self.assertRedirects(self.client.get(url), room, fetch_redirect_response=False)
+            self.assertRedirects(self.client.get(room), url, fetch_redirect_response=False)
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+            self.client.force_login(second)
+            response = self.client.get(room)
+            self.assertEqual(response.context['position'], 1)
+
+        with mock.patch('registrations.admission.time.time', return_value=1001.0):
+            self.assertRedirects(self.client.get(room), url, fetch_redirect_response=False)
+
+@override_settings(
+    PAYMENT_CLIENT='registrations.payments.FakeRazorpayClient',
+    MEDIA_ROOT=tempfile.mkdtemp(),
+    DOCUMENT_UPLOAD_STAGING_ROOT=tempfile.mkdtemp(),
+    DOCUMENT_UPLOAD_CHUNK_BYTES=8,
+)
+class ChunkedDocumentUploadTest(TestCase):
+    def setUp(self):
+        _load_client.cache_clear()
+        self.addCleanup(_load_client.cache_clear)
+        cache.clear()
+        self.student = CustomUser.objects.create_user(email="uploader@example.com", password="password")
+        self.exam = Exam.objects.create(
+            name="Upload Exam",
+            banner="test_banner.jpg",
+            description="Description",
+            eligibility="All students",
+            exam_date=timezone.now() + datetime.timedelta(days=15),
+        )
+        self.client.force_login(self.student)
+
+    def start(self, content):
+        response = self.client.post('/registrations/uploads/documents/', {'filename': 'my id.pdf', 'size': len(content)})
+        return response.json()['token']
+
+    def send(self, token, offset, chunk):
+        return self.client.post(
+            '/registrations/uploads/documents/chunk/', chunk, content_type='application/octet-stream',
+            HTTP_X_UPLOAD_TOKEN=token, HTTP_X_UPLOAD_OFFSET=str(offset),
+        )
+
+    def test_chunks_are_assembled_and_registered_by_key(self):
+        content = b'%PDF-1.4 fake document body'
+        token = self.start(content)
+        for offset in range(0, len(content), 8):
+            response = self.send(token, offset, content[offset:offset + 8])
+        document_token = response.json()['document_token']
+
+        self.client.post(f'/registrations/exam/{self.exam.id}/register/', {'document_token': document_token})
+        registration = Registration.objects.get(student=self.student, exam=self.exam)
+        self.assertTrue(registration.document.name.startswith('registrations/documents/'))
+        self.assertTrue(registration.document.name.endswith('/my_id.pdf'))
+        with registration.document.open('rb') as fh:
+            self.assertEqual(fh.read(), content)
+
+    def test_resume_reports_staged_offset(self):
+        content = b'%PDF-1.4 resumable'
+        token = self.start(content)
+        self.send(token, 0, content[:8])
+
+        response = self.send(token, 0, content[:8])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['offset'], 8)
+        status = self.client.get('/registrations/uploads/documents/chunk/', HTTP_X_UPLOAD_TOKEN=token)
+        self.assertEqual(status.json()['offset'], 8)
+
+    def test_rejects_unknown_type_and_oversized_files(self):
+        token = self.start(b'MZ\x90\x00 not a document')
+        self.assertEqual(self.send(token, 0, b'MZ\x90\x00 no').status_code, 415)
+
+        with override_settings(DOCUMENT_UPLOAD_MAX_BYTES=10):
+            response = self.client.post('/registrations/uploads/documents/', {'filename': 'big.pdf', 'size': 11})
+        self.assertEqual(response.status_code, 400)
+
+    def test_token_from_another_user_is_rejected(self):
+        other = CustomUser.objects.create_user(email="other@example.com", password="password")
+        token = self.start(b'%PDF-1.4')
+        self.client.force_login(other)
+        self.assertEqual(self.send(token, 0, b'%PDF-1.4').status_code, 403)
+
+    def test_concurrent_retries_of_a_chunk_append_once(self):
+        content = b'%PDF-1.4 sent twice'
+        upload = load_upload(self.start(content), self.student)
+        append_chunk(upload, 0, content[:8])
+
+        def retry(_):
+            try:
+                return append_chunk(upload, 8, content[8:16])
+            except UploadError as e:
+                return e.status
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(retry, range(4)))
+        self.assertEqual(sorted(results, key=str), [409, 409, 409, None])
+        self.assertEqual(upload_offset(upload), 16)
+
+    def test_unusable_filename_falls_back(self):
+        upload = load_upload(start_upload(self.student, '???', 8), self.student)
+        self.assertEqual(upload['name'], 'document')
+
+    @override_settings(DOCUMENT_UPLOAD_STAGING_ROOT=tempfile.mkdtemp())
+    def test_command_removes_abandoned_chunks(self):
+        self.send(self.start(b'%PDF-1.4 abandoned'), 0, b'%PDF-1.4')
+        [abandoned] = os.scandir(settings.DOCUMENT_UPLOAD_STAGING_ROOT)
+        os.utime(abandoned.path, (0, 0))
+        fresh_token = self.start(b'%PDF-1.4 fresh')
+        self.send(fresh_token, 0, b'%PDF-1.4')
+
+        out = io.StringIO()
+        call_command('clean_uploads', stdout=out)
+        self.assertIn('Removed 1', out.getvalue())
+        self.assertFalse(os.path.exists(abandoned.path))
+        self.assertEqual(self.client.get('/registrations/uploads/documents/chunk/', HTTP_X_UPLOAD_TOKEN=fresh_token).json()['offset'], 8)
+
+class RegistrationImportTest(TestCase):
+    def setUp(self):
+        self.exam = Exam.objects.create(
+            name="Cohort Exam",
+            banner="test_banner.jpg",
+            description="Description",
+            eligibility="All students",
+            exam_date=timezone.now() + datetime.timedelta(days=15),
+        )
+        self.existing = CustomUser.objects.create_user(email="known@example.com", password="password", first_name="Known")
+
+    def test_rows_are_upserted_in_batches_with_errors_recorded(self):
+        rows = [
+            {'email': 'new1@example.com', 'first_name': 'New', 'last_name': 'One'},
+            {'email': 'not-an-email'},
+            {'email': 'known@example.com', 'first_name': '', 'last_name': ''},
+            {'email': 'new2@example.com', 'first_name': 'New', 'last_name': 'Two'},
+            {'email': 'new1@example.com'},
+        ]
+        run = import_registrations(self.exam, rows, mark_paid=True, batch_size=2)
+
+        self.assertEqual((run.total_rows, run.registrations_created, run.users_created, run.error_count), (5, 3, 2, 2))
+        self.assertEqual([error['line'] for error in run.errors], [3, 6])
+        self.assertEqual(Registration.objects.filter(exam=self.exam, payment_status='Success').count(), 3)
+        self.assertEqual(RegistrationSeats.objects.get(exam=self.exam).taken, 3)
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.first_name, 'Known')
+        self.assertTrue(self.existing.check_password('password'))
+        self.assertFalse(CustomUser.objects.get(email='new1@example.com').has_usable_password())
+
+    def test_reimport_is_idempotent(self):
+        rows = [{'email': 'again@example.com', 'first_name': 'Again'}]
+        import_registrations(self.exam, rows)
+        run = import_registrations(self.exam, [{'email': 'again@example.com', 'first_name': 'Renamed'}])
+
+        self.assertEqual((run.registrations_created, run.users_created), (0, 0))
+        self.assertEqual(CustomUser.objects.get(email='again@example.com').first_name, 'Renamed')
+        self.assertEqual(Job.objects.filter(name='registrations.send_enrollment_emails').count(), 1)
+
+    @override_settings(USER_CACHE_ENABLED=True)
+    def test_renamed_accounts_leave_the_user_cache(self):
+        get_cached_user(self.existing.pk)
+        import_registrations(self.exam, [{'email': 'known@example.com', 'first_name': 'Renamed'}])
+        self.assertEqual(get_cached_user(self.existing.pk).first_name, 'Renamed')
+
+    def test_enrollment_email_links_new_accounts_to_set_password(self):
+        import_registrations(self.exam, [{'email': 'fresh@example.com'}, {'email': 'known@example.com'}])
+        job = Job.objects.get(name='registrations.send_enrollment_emails')
+        send_enrollment_emails(**job.payload)
+
+        self.assertEqual(len(mail.outbox), 2)
+        fresh = next(msg for msg in mail.outbox if msg.to == ['fresh@example.com'])
+        link = next(line for line in fresh.alternatives[0][0].split('"') if '/password/set/' in line)
+        response = self.client.get(link.split('localhost:8000')[1], follow=True)
+        self.assertTrue(response.context['validlink'])
+
+    def test_existing_names_are_only_replaced_by_supplied_fields(self):
+        CustomUser.objects.filter(pk=self.existing.pk).update(last_name="Person")
+        import_registrations(self.exam, [
+            {'email': 'known@example.com', 'first_name': 'Renamed'},
+            {'email': 'bare@example.com'},
+        ])
+        self.existing.refresh_from_db()
+        self.assertEqual((self.existing.first_name, self.existing.last_name), ('Renamed', 'Person'))
+        self.assertTrue(CustomUser.objects.filter(email='bare@example.com').exists())
+
+    def test_one_failed_enrollment_email_does_not_stop_the_rest(self):
+        import_registrations(self.exam, [{'email': 'bounce@example.com'}, {'email': 'fine@example.com'}])
+        job = Job.objects.get(name='registrations.send_enrollment_emails')
+        send = EmailMultiAlternatives.send
+
+        def fail_for_bounce(message, *args, **kwargs):
+            if message.to == ['bounce@example.com']:
+                raise ConnectionError("rejected")
+            return send(message, *args, **kwargs)
+
+        with mock.patch.object(EmailMultiAlternatives, 'send', autospec=True, side_effect=fail_for_bounce), \
+                self.assertLogs('registrations.imports', 'ERROR'):
+            self.assertEqual(send_enrollment_emails(**job.payload), 1)
+        self.assertEqual([msg.to for msg in mail.outbox], [['fine@example.com']])
+
+class RegistrationQueryPlanTest(QueryPlanAssertionsMixin, TestCase):
+    def setUp(self):
+        self.exam = Exam.objects.create(
+            name="Plan Exam",
+            banner="test_banner.jpg",
+            description="Description",
+            eligibility="All students",
+            exam_date=timezone.now() + datetime.timedelta(days=15),
+        )
+
+    def test_status_filter_uses_index(self):
+        self.assertUsesIndex(
+            Registration.objects.filter(status='Pending').order_by('-registered_at', '-id'),
+            'reg_status_registered_idx',
+        )
+
+    def test_exam_status_filter_uses_index(self):
+        self.assertUsesIndex(
+            Registration.objects.filter(exam=self.exam, status='Pending').order_by('-registered_at', '-id'),
+            'reg_exam_status_registered_idx',
+        )
+
+    def test_order_lookup_uses_index(self):
+        self.assertUsesIndex(Registration.objects.filter(razorpay_order_id='order_x'), columns=['razorpay_order_id'])
+
+@override_settings(
+    PAYMENT_CLIENT='registrations.payments.FakeRazorpayClient',
+    RAZORPAY_WEBHOOK_SECRET='whsec',
+    MEDIA_ROOT=tempfile.mkdtemp(),
+    DOCUMENT_UPLOAD_STAGING_ROOT=tempfile.mkdtemp(),
+)
+class RegistrationViewBudgetTest(QueryBudgetTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        _load_client.cache_clear()
+        self.addCleanup(_load_client.cache_clear)
+        self.data = seed_query_budget_data()
+        self.gateway = get_payment_client()
+        self.client.force_login(self.data['student'])
+
+    def test_registration_and_payment_views(self):
+        exam = Exam.objects.create(
+            name="Budget Open Exam",
+            banner="test_banner.jpg",
+            description="Description",
+            eligibility="All students",
+            exam_date=timezone.now() + datetime.timedelta(days=30),
+            fees=100,
+        )
+        url = f'/registrations/exam/{exam.id}/register/'
+        self.assertEqual(self.client.get(url).status_code, 200)
+        response = self.client.post(url, {'document': SimpleUploadedFile('id.pdf', b'%PDF-1.4', content_type='application/pdf')})
+        order = response.context['order']
+        payment = self.gateway.capture(order['id'])
+        response = self.client.post('/registrations/payment/callback/', {
+            'razorpay_order_id': order['id'],
+            'razorpay_payment_id': payment['id'],
+            'razorpay_signature': self.gateway.sign_payment(order['id'], payment['id']),
+        })
+        registration_id = Registration.objects.get(razorpay_order_id=order['id']).id
+        self.assertEqual(self.client.get(f'/registrations/payment/success/{registration_id}/').status_code, 200)
+        self.assertEqual(self.client.get(f'/registrations/payment/failure/{registration_id}/').status_code, 200)
+
+        body = json.dumps({'event': 'payment.captured', 'payload': {'payment': {'entity': {'id': 'pay_x', 'order_id': 'order_budget1'}}}})
+        response = self.client.post('/registrations/payment/webhook/', body, content_type='application/json',
+                                    HTTP_X_RAZORPAY_SIGNATURE=self.gateway.sign_webhook(body, 'whsec'))
+        self.assertEqual(response.status_code, 200)
+
+        with override_settings(WAITING_ROOM_ENABLED=True):
+            self.client.get(f'/registrations/exam/{exam.id}/waiting-room/')
+
+    def test_upload_views(self):
+        token = self.client.post('/registrations/uploads/documents/', {'filename': 'id.pdf', 'size': 8}).json()['token']
+        self.client.get('/registrations/uploads/documents/chunk/', HTTP_X_UPLOAD_TOKEN=token)
+        response = self.client.post('/registrations/uploads/documents/chunk/', b'%PDF-1.4', content_type='application/octet-stream',
+                                    HTTP_X_UPLOAD_TOKEN=token, HTTP_X_UPLOAD_OFFSET='0')
+        self.assertIn('document_token', response.json())
+
+    def test_hall_ticket_views(self):
+        registration = self.data['own_registrations'][0]
+        self.assertEqual(self.client.get(f'/registrations/hall-ticket/{registration.id}/').status_code, 200)
+        self.assertEqual(self.client.get(f'/registrations/hall-ticket/{registration.id}/qr.png').status_code, 200)
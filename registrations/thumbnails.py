@@ -0,0 +1,108 @@
+import hashlib
+import io
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageDraw, ImageOps, UnidentifiedImageError
+from .models import Registration
+
+try:
+    import fitz  # PyMuPDF, optional: renders the first page of PDF documents
+except ImportError:
+    fitz = None
+
+# Bump when the rendering below changes so stored thumbnails are rebuilt
+THUMBNAIL_VERSION = 1
+
+def thumbnail_digest(registration):
+    data = f"{registration.document.name}\n{settings.DOCUMENT_THUMBNAIL_SIZE}\nv{THUMBNAIL_VERSION}"
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()[:16]
+
+def thumbnail_is_current(registration):
+    thumbnail = registration.document_thumbnail
+    return bool(thumbnail) and f"-{thumbnail_digest(registration)}" in thumbnail.name
+
+def _placeholder(label):
+    size = settings.DOCUMENT_THUMBNAIL_SIZE
+    image = Image.new('RGB', (size, int(size * 1.3)), '#f1f3f5')
+    draw = ImageDraw.Draw(image)
+    draw.rectangle([0, 0, image.width - 1, image.height - 1], outline='#adb5bd', width=2)
+    draw.text((image.width // 2, image.height // 2), label, fill='#495057', anchor='mm', font_size=size // 6)
+    return image
+
+def _render_pdf(fh):
+    if fitz is None:
+        return _placeholder('PDF')
+    with fitz.open(stream=fh.read(), filetype='pdf') as pdf:
+        page = pdf[0]
+        zoom = settings.DOCUMENT_THUMBNAIL_SIZE / max(page.rect.width, page.rect.height)
+        pixmap = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+        return Image.frombytes('RGB', (pixmap.width, pixmap.height), pixmap.samples)
+
+def _render_image(fh):
+    size = settings.DOCUMENT_THUMBNAIL_SIZE
+    image = Image.open(fh)
+    # Lets the JPEG decoder downscale while decoding instead of inflating the full image
+    image.draft('RGB', (size, size))
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((size, size))
+    return image
+
+def _jpeg(image):
+    buffer = io.BytesIO()
+    image.convert('RGB').save(buffer, format='JPEG', quality=70, optimize=True)
+    return buffer.getvalue()
+
+def unavailable_thumbnail():
+    """JPEG bytes shown while a document can't be read; never stored."""
+    return _jpeg(_placeholder('...'))
+
+def render_document_thumbnail(document):
+    """
+    Returns JPEG bytes for a small preview of an uploaded document, or None
+    when the document can't be read from storage right now. Files that can be
+    read but not rendered get a placeholder.
+    """
+    try:
+        # Documents are capped at DOCUMENT_UPLOAD_MAX_BYTES, and reading them up
+        # front keeps storage errors apart from undecodable files
+        with document.open('rb') as fh:
+            data = fh.read()
+    except OSError:
+        return None
+
+    try:
+        image = _render_pdf(io.BytesIO(data)) if data.startswith(b'%PDF-') else _render_image(io.BytesIO(data))
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, ValueError, RuntimeError):
+        image = _placeholder('FILE')
+    return _jpeg(image)
+
+def build_document_thumbnail(registration, force=False):
+    """
+    Stores a thumbnail of the registration's document next to it and returns
+    its name, rendering only when missing or out of date (or `force` is set).
+    Returns None, storing nothing, when the document can't be read.
+    """
+    if not force and thumbnail_is_current(registration):
+        return registration.document_thumbnail.name
+
+    content = render_document_thumbnail(registration.document)
+    if content is None:
+        return None
+    storage = registration.document_thumbnail.storage
+    old_name = registration.document_thumbnail.name
+    name = storage.save(
+        f"registrations/thumbnails/{registration.id}-{thumbnail_digest(registration)}.jpg",
+        ContentFile(content),
+    )
+
+    Registration.objects.filter(pk=registration.pk).update(document_thumbnail=name)
+    registration.document_thumbnail.name = name
+    if old_name and old_name != name:
+        storage.delete(old_name)
+    return name
+
+def build_document_thumbnails(registration_ids, force=False):
+    """Returns the names of the thumbnails that could be built."""
+    registrations = Registration.objects.filter(id__in=registration_ids).exclude(document='').only('id', 'document', 'document_thumbnail')
+    names = [build_document_thumbnail(registration, force=force) for registration in registrations]
+    return [name for name in names if name]
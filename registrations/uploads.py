@@ -0,0 +1,151 @@
+import fcntl
+import os
+import time
+import uuid
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import SuspiciousFileOperation, ValidationError
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.text import get_valid_filename
+from .models import Registration
+
+UPLOAD_SALT = 'registrations.uploads'
+DOCUMENT_SALT = 'registrations.uploads.document'
+
+# Checked against the first bytes of the file rather than the client's content type
+DOCUMENT_SIGNATURES = {
+    b'%PDF-': '.pdf',
+    b'\x89PNG\r\n\x1a\n': '.png',
+    b'\xff\xd8\xff': '.jpg',
+}
+SNIFF_BYTES = max(len(signature) for signature in DOCUMENT_SIGNATURES)
+
+class UploadError(Exception):
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+def staging_storage():
+    return FileSystemStorage(location=settings.DOCUMENT_UPLOAD_STAGING_ROOT)
+
+def sniff_extension(head):
+    for signature, extension in DOCUMENT_SIGNATURES.items():
+        if head.startswith(signature):
+            return extension
+    return None
+
+def validate_document(uploaded_file):
+    """Size and type checks for documents posted through the form, reading only the first bytes."""
+    if uploaded_file.size > settings.DOCUMENT_UPLOAD_MAX_BYTES:
+        raise ValidationError("File is too large.")
+    uploaded_file.seek(0)
+    head = uploaded_file.read(SNIFF_BYTES)
+    uploaded_file.seek(0)
+    if sniff_extension(head) is None:
+        raise ValidationError("Only PDF, PNG and JPG files are allowed.")
+
+def start_upload(user, filename, size):
+    """Returns a signed upload token; all upload state lives in the token and the staging file."""
+    if not 0 < size <= settings.DOCUMENT_UPLOAD_MAX_BYTES:
+        raise UploadError("File is too large.")
+    upload_id = uuid.uuid4().hex
+    try:
+        name = get_valid_filename(os.path.basename(filename))[:100]
+    except SuspiciousFileOperation:
+        # Nothing usable left in the client's filename
+        name = 'document'
+    return signing.dumps({
+        'id': upload_id,
+        'user': user.pk,
+        'size': size,
+        'name': name,
+    }, salt=UPLOAD_SALT)
+
+def load_upload(token, user):
+    try:
+        upload = signing.loads(token, salt=UPLOAD_SALT, max_age=settings.DOCUMENT_UPLOAD_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        raise UploadError("Upload expired or invalid.", status=403)
+    if upload['user'] != user.pk:
+        raise UploadError("Upload expired or invalid.", status=403)
+    return upload
+
+def _staging_name(upload):
+    return f"{upload['id']}.part"
+
+def upload_offset(upload):
+    storage = staging_storage()
+    name = _staging_name(upload)
+    return storage.size(name) if storage.exists(name) else 0
+
+def append_chunk(upload, offset, chunk):
+    """
+    Appends `chunk` at `offset` to the staged file. Offsets must line up with
+    what is already staged so a client can resume after a dropped request.
+    Returns the final document key once the last byte has arrived, else None.
+    """
+    if len(chunk) > settings.DOCUMENT_UPLOAD_CHUNK_BYTES or offset + len(chunk) > upload['size']:
+        raise UploadError("Chunk is too large.", status=413)
+    if offset == 0 and sniff_extension(chunk[:SNIFF_BYTES]) is None:
+        raise UploadError("Only PDF, PNG and JPG files are allowed.", status=415)
+
+    path = staging_storage().path(_staging_name(upload))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'ab') as fh:
+        # Retries of the same chunk can arrive together, so the offset is
+        # checked and the chunk written under one lock per upload
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        stat = os.fstat(fh.fileno())
+        if stat.st_nlink == 0:
+            # A concurrent request finished the upload and removed the file while we waited
+            raise UploadError("Offset mismatch.", status=409, offset=upload['size'])
+        if offset != stat.st_size:
+            raise UploadError("Offset mismatch.", status=409, offset=stat.st_size)
+        fh.write(chunk)
+        fh.flush()
+        if offset + len(chunk) < upload['size']:
+            return None
+        return _finish_upload(upload, path)
+
+def _finish_upload(upload, path):
+    with open(path, 'rb') as fh:
+        extension = sniff_extension(fh.read(SNIFF_BYTES))
+        fh.seek(0)
+        name, _ = os.path.splitext(upload['name'])
+        key = f"{Registration.document.field.upload_to}{upload['id']}/{name}{extension}"
+        # Storage backends read File objects chunk by chunk, so this never loads the whole document
+        key = Registration.document.field.storage.save(key, File(fh))
+    os.remove(path)
+    return key
+
+def clean_staged_uploads(max_age):
+    """Deletes staged files untouched for `max_age` seconds and returns how many went."""
+    root = settings.DOCUMENT_UPLOAD_STAGING_ROOT
+    if not os.path.isdir(root):
+        return 0
+    cutoff = time.time() - max_age
+    removed = 0
+    with os.scandir(root) as entries:
+        for entry in entries:
+            if not entry.name.endswith('.part') or not entry.is_file():
+                continue
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    removed += 1
+            except FileNotFoundError:
+                # Finished or cleaned up by someone else meanwhile
+                pass
+    return removed
+
+def sign_document_key(user, key):
+    return signing.dumps({'user': user.pk, 'key': key}, salt=DOCUMENT_SALT)
+
+def unsign_document_key(user, token):
+    try:
+        document = signing.loads(token, salt=DOCUMENT_SALT, max_age=settings.DOCUMENT_UPLOAD_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return None
+    return document['key'] if document['user'] == user.pk else None
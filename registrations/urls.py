@@ -5,8 +5,13 @@ app_name = 'registrations'
 
 urlpatterns = [
     path('exam/<int:exam_id>/register/', views.register_exam, name='register_exam'),
+    path('exam/<int:exam_id>/waiting-room/', views.waiting_room, name='waiting_room'),
+    path('uploads/documents/', views.start_document_upload, name='start_document_upload'),
+    path('uploads/documents/chunk/', views.upload_document_chunk, name='upload_document_chunk'),
     path('payment/callback/', views.payment_callback, name='payment_callback'),
+    path('payment/webhook/', views.razorpay_webhook, name='razorpay_webhook'),
     path('payment/success/<int:registration_id>/', views.payment_success, name='payment_success'),
     path('payment/failure/<int:registration_id>/', views.payment_failure, name='payment_failure'),
     path('hall-ticket/<int:registration_id>/', views.view_hall_ticket, name='view_hall_ticket'),
+    path('hall-ticket/<int:registration_id>/qr.png', views.hall_ticket_qr, name='hall_ticket_qr'),
 ]
@@ -5,25 +5,59 @@ from django.core.mail import EmailMultiAlternatives
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 from django.conf import settings
-import random
+from django.db import IntegrityError, transaction
+from django.db.models import F
 import string
 from email.mime.image import MIMEImage
 
+REGISTRATION_NUMBER_ALPHABET = string.digits + string.ascii_uppercase
+REGISTRATION_NUMBER_WIDTH = 4
+# Coprime with 36, so multiplying by it permutes each 36**width block: numbers
+# stay collision-free but don't read as an obvious 0001, 0002, ... sequence.
+REGISTRATION_NUMBER_MULTIPLIER = 1046527
+
+def format_registration_number(year, value):
+    width = REGISTRATION_NUMBER_WIDTH
+    while value >= 36 ** width:
+        width += 1
+    scrambled = (value * REGISTRATION_NUMBER_MULTIPLIER) % (36 ** width)
+    chars = []
+    for _ in range(width):
+        scrambled, digit = divmod(scrambled, 36)
+        chars.append(REGISTRATION_NUMBER_ALPHABET[digit])
+    return f"REG-{year}-{''.join(reversed(chars))}"
+
+def _reserve_sequence_block(year, count):
+    from .models import RegistrationSequence
+    with transaction.atomic(savepoint=False):
+        # The UPDATE holds the row lock until commit, so concurrent callers get disjoint blocks
+        if not RegistrationSequence.objects.filter(year=year).update(last_value=F('last_value') + count):
+            try:
+                with transaction.atomic():
+                    RegistrationSequence.objects.create(year=year, last_value=count)
+                return range(1, count + 1)
+            except IntegrityError:
+                # Another caller started the year first
+                RegistrationSequence.objects.filter(year=year).update(last_value=F('last_value') + count)
+        end = RegistrationSequence.objects.filter(year=year).values_list('last_value', flat=True).get()
+    return range(end - count + 1, end + 1)
+
+def reserve_registration_numbers(year, count):
+    """Reserves `count` unused registration numbers for `year` from the per-year counter."""
+    from .models import Registration
+    numbers = []
+    while len(numbers) < count:
+        block = [format_registration_number(year, value) for value in _reserve_sequence_block(year, count - len(numbers))]
+        # Numbers issued by the old random generator can still sit in the sequence's path
+        taken = set(Registration.objects.filter(registration_number__in=block).values_list('registration_number', flat=True))
+        numbers.extend(number for number in block if number not in taken)
+    return numbers
+
 def generate_registration_number(registration):
     """Generates a unique registration number like REG-2026-XXXX."""
     if registration.registration_number:
         return registration.registration_number
-    
-    random_str = ''.join(random.choices(string.ascii_uppercase + string.digits, k=4))
-    reg_num = f"REG-{registration.exam.exam_date.year}-{random_str}"
-    
-    # Simple check for uniqueness (very unlikely to collision with 4 random chars for 1 user, but good practice)
-    from .models import Registration
-    while Registration.objects.filter(registration_number=reg_num).exists():
-        random_str = ''.join(random.choices(string.ascii_uppercase + string.digits, k=4))
-        reg_num = f"REG-{registration.exam.exam_date.year}-{random_str}"
-    
-    return reg_num
+    return reserve_registration_numbers(registration.exam.exam_date.year, 1)[0]
 
 def generate_qr_code_bytes(data):
     """Generates a QR code and returns it as bytes."""
@@ -36,8 +70,8 @@ def generate_qr_code_bytes(data):
     img.save(buffered, format="PNG")
     return buffered.getvalue()
 
-def send_status_email(registration, status, reason=None):
-    """Sends an email notification based on the registration status."""
+def build_status_email(registration, status, reason=None, connection=None):
+    """Builds the email for a registration status, or returns None if the status has no email."""
     subject = f"Your Registration for {registration.exam.name} - Status Update"
     
     context = {
@@ -55,21 +89,21 @@ def send_status_email(registration, status, reason=None):
             registration.registration_number = generate_registration_number(registration)
             registration.save()
         
-        qr_data = f"Reg No: {registration.registration_number}\nStudent: {registration.student.get_full_name()}\nExam: {registration.exam.name}\nDate: {registration.exam.exam_date}\nLocation: {registration.exam.location}"
-        context['qr_bytes'] = generate_qr_code_bytes(qr_data)
+        from .qr import get_qr_code_bytes, hall_ticket_qr_data
+        context['qr_bytes'] = get_qr_code_bytes(hall_ticket_qr_data(registration))
         template = 'emails/hall_ticket.html'
     elif status == 'Rejected':
         template = 'emails/rejection_email.html'
     elif status == 'Hold':
         template = 'emails/hold_email.html'
     else:
-        return # No email for undefined statuses
+        return None # No email for undefined statuses
     
     html_content = render_to_string(template, context)
     text_content = strip_tags(html_content)
     
     email_from = settings.DEFAULT_FROM_EMAIL or settings.EMAIL_HOST_USER
-    msg = EmailMultiAlternatives(subject, text_content, email_from, [registration.student.email])
+    msg = EmailMultiAlternatives(subject, text_content, email_from, [registration.student.email], connection=connection)
     msg.attach_alternative(html_content, "text/html")
     
     if status == 'Approved' and 'qr_bytes' in context:
@@ -78,4 +112,10 @@ def send_status_email(registration, status, reason=None):
         img.add_header('Content-Disposition', 'inline', filename='qr_code.png')
         msg.attach(img)
         
-    msg.send()
+    return msg
+
+def send_status_email(registration, status, reason=None):
+    """Sends an email notification based on the registration status."""
+    msg = build_status_email(registration, status, reason=reason)
+    if msg is not None:
+        msg.send()
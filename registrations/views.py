@@ -2,65 +2,171 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
 from django.db import transaction
+from asgiref.sync import sync_to_async
 from exams.models import Exam
 from .models import Registration
 from .forms import RegistrationForm
-import razorpay
+from .hall_tickets import build_hall_ticket
+from .qr import get_qr_code_bytes, hall_ticket_qr_data, qr_digest
+from django.http import Http404, HttpResponse, FileResponse, JsonResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from django.utils import timezone
+from .admission import (
+    CLOSED, FULL, claim_seat, aget_admission_state, set_admission_state,
+    ahas_admission_pass, has_admission_pass, grant_admission_pass, get_ticket, now_serving,
+)
+from exams.catalogue import aget_user_registrations
+from .uploads import UploadError, start_upload, load_upload, upload_offset, append_chunk, sign_document_key
+from .payments import get_payment_client, aget_or_create_order, mark_payment_captured, record_payment_event, apply_payment_event
+from razorpay.errors import SignatureVerificationError
 from django.conf import settings
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+import hashlib
+import json
+import logging
+from core.query_budget import query_budget
 
-client = razorpay.Client(auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET))
+logger = logging.getLogger(__name__)
 
+def _store_document(user, exam, document):
+    """Writes an uploaded file to storage and returns its name; already-stored keys pass through."""
+    if not hasattr(document, 'chunks'):
+        return document, False
+    field = Registration._meta.get_field('document')
+    name = field.generate_filename(Registration(student=user, exam=exam), document.name)
+    return field.storage.save(name, document, max_length=field.max_length), True
+
+def _save_registration(user, exam, existing_reg, document):
+    """Claims a seat for a new registration and saves it; None when the exam is full."""
+    # Store the file before the transaction so the seat row is never locked during an upload
+    document, stored = _store_document(user, exam, document)
+    defaults = {'document': document}
+    # A registration that gave up its seat after a failed payment needs a new one to retry
+    needs_seat = existing_reg is None or (not existing_reg.holds_seat and existing_reg.status != 'Rejected')
+    if needs_seat:
+        # A fresh claim gets a fresh order, so an old one can't expire the new seat
+        defaults.update(holds_seat=True, payment_status='Pending', seat_claimed_at=timezone.now(), razorpay_order_id=None)
+    with transaction.atomic():
+        if needs_seat and not claim_seat(exam):
+            registration = None
+        else:
+            registration, created = Registration.objects.update_or_create(student=user, exam=exam, defaults=defaults)
+    if registration is None and stored:
+        Registration._meta.get_field('document').storage.delete(document)
+    return registration
+
+@query_budget(20)
 @login_required
-def register_exam(request, exam_id):
-    exam = get_object_or_404(Exam, id=exam_id)
+async def register_exam(request, exam_id):
+    # Turn away closed/full exams from cache before touching the database
+    state = await aget_admission_state(exam_id)
+    if state == CLOSED:
+        messages.error(request, "Registration for this exam is closed.")
+        return redirect('exam_list')
+    user = await request.auser()
+    if state == FULL and exam_id not in await aget_user_registrations(user):
+        messages.error(request, "This exam is full.")
+        return redirect('exam_list')
+    if settings.WAITING_ROOM_ENABLED and not await ahas_admission_pass(request.session, exam_id):
+        return redirect('registrations:waiting_room', exam_id=exam_id)
+
+    try:
+        exam = await Exam.objects.aget(id=exam_id)
+    except Exam.DoesNotExist:
+        raise Http404("No Exam matches the given query.")
     
     if not exam.is_registration_open:
+        await sync_to_async(set_admission_state)(exam.id, CLOSED)
         messages.error(request, "Registration for this exam is closed.")
         return redirect('exam_list')
     
-    existing_reg = Registration.objects.filter(student=request.user, exam=exam).first()
+    existing_reg = await Registration.objects.filter(student=user, exam=exam).afirst()
     if existing_reg and existing_reg.payment_status == 'Success':
         messages.warning(request, "You are already registered and paid for this exam.")
         return redirect('profile')
     
     if request.method == 'POST':
-        form = RegistrationForm(request.POST, request.FILES)
+        form = RegistrationForm(request.POST, request.FILES, user=user)
         if form.is_valid():
             try:
-                with transaction.atomic():
-                    # Create or update registration
-                    registration, created = Registration.objects.update_or_create(
-                        student=request.user,
-                        exam=exam,
-                        defaults={'document': form.cleaned_data['document']}
-                    )
-                    
-                    # Create Razorpay Order
-                    amount = int(exam.fees * 100)  # Amount in paise
-                    data = {
-                        "amount": amount,
-                        "currency": "INR",
-                        "receipt": f"reg_{registration.id}",
-                    }
-                    order = client.order.create(data=data)
-                    
-                    registration.razorpay_order_id = order['id']
-                    registration.save()
-                    
-                    return render(request, 'registrations/payment.html', {
-                        'registration': registration,
-                        'order': order,
-                        'razorpay_key': settings.RAZORPAY_KEY_ID,
-                        'exam': exam
-                    })
+                # Seat claim and save run in one short transaction on a worker thread
+                registration = await sync_to_async(_save_registration)(user, exam, existing_reg, form.cleaned_data['document'])
+                if registration is None:
+                    messages.error(request, "Sorry, this exam is now full.")
+                    return redirect('exam_list')
+
+                # The gateway call happens after commit so it never holds a lock or connection open
+                order = await aget_or_create_order(registration, int(exam.fees * 100))  # Amount in paise
             except Exception as e:
                 messages.error(request, f"An error occurred: {e}")
+            else:
+                return await sync_to_async(render)(request, 'registrations/payment.html', {
+                    'registration': registration,
+                    'order': order,
+                    'razorpay_key': settings.RAZORPAY_KEY_ID,
+                    'exam': exam
+                })
     else:
-        form = RegistrationForm()
+        form = RegistrationForm(user=user)
     
-    return render(request, 'registrations/register_form.html', {'form': form, 'exam': exam})
+    # Templates may still touch lazy relations (request.user in context processors)
+    return await sync_to_async(render)(request, 'registrations/register_form.html', {'form': form, 'exam': exam})
+
+@query_budget(4)
+@login_required
+@require_POST
+def start_document_upload(request):
+    try:
+        token = start_upload(request.user, request.POST.get('filename', ''), int(request.POST.get('size', 0)))
+    except ValueError:
+        return JsonResponse({'error': "Invalid file size."}, status=400)
+    except UploadError as e:
+        return JsonResponse({'error': str(e)}, status=e.status)
+    return JsonResponse({'token': token, 'chunk_size': settings.DOCUMENT_UPLOAD_CHUNK_BYTES})
+
+@query_budget(4)
+@login_required
+def upload_document_chunk(request):
+    """GET reports how much has been staged (for resuming); POST appends the next chunk."""
+    if request.method not in ('GET', 'POST'):
+        return JsonResponse({'error': "Invalid request method."}, status=405)
+    try:
+        upload = load_upload(request.headers.get('X-Upload-Token', ''), request.user)
+        if request.method == 'GET':
+            return JsonResponse({'offset': upload_offset(upload)})
+        offset = int(request.headers.get('X-Upload-Offset', ''))
+        chunk = request.body
+        key = append_chunk(upload, offset, chunk)
+    except ValueError:
+        return JsonResponse({'error': "Missing or invalid offset."}, status=400)
+    except UploadError as e:
+        return JsonResponse({'error': str(e), 'offset': e.offset}, status=e.status)
+
+    if key is None:
+        return JsonResponse({'offset': offset + len(chunk)})
+    return JsonResponse({'document_token': sign_document_key(request.user, key)})
+
+@query_budget(7)
+@login_required
+def waiting_room(request, exam_id):
+    if not settings.WAITING_ROOM_ENABLED or has_admission_pass(request.session, exam_id):
+        return redirect('registrations:register_exam', exam_id=exam_id)
+
+    ticket = get_ticket(request.session, exam_id)
+    serving = now_serving(exam_id)
+    if ticket <= serving:
+        grant_admission_pass(request.session, exam_id)
+        return redirect('registrations:register_exam', exam_id=exam_id)
 
+    return render(request, 'registrations/waiting_room.html', {
+        'exam_id': exam_id,
+        'position': ticket - serving,
+        'refresh_seconds': 5,
+    })
+
+@query_budget(9)
 @csrf_exempt
 def payment_callback(request):
     if request.method == "POST":
@@ -76,13 +182,11 @@ def payment_callback(request):
             }
             
             # Verify signature
-            client.utility.verify_payment_signature(params_dict)
+            get_payment_client().utility.verify_payment_signature(params_dict)
             
-            registration = Registration.objects.get(razorpay_order_id=order_id)
-            registration.payment_status = 'Success'
-            registration.razorpay_payment_id = payment_id
-            registration.razorpay_signature = signature
-            registration.save()
+            registration = mark_payment_captured(order_id, payment_id, signature)
+            if registration is None:
+                raise Registration.DoesNotExist("No registration for this order.")
             
             messages.success(request, "Payment successful! Your registration is confirmed.")
             return redirect('registrations:payment_success', registration_id=registration.id)
@@ -106,43 +210,79 @@ def payment_callback(request):
             return redirect('exam_list')
     return redirect('exam_list')
 
+@query_budget(13)
+@csrf_exempt
+@require_POST
+def razorpay_webhook(request):
+    if not settings.RAZORPAY_WEBHOOK_SECRET:
+        # An empty key would make every signature trivially forgeable
+        logger.error("RAZORPAY_WEBHOOK_SECRET is not set; refusing payment webhook")
+        return HttpResponse(status=503)
+    body = request.body.decode('utf-8')
+    signature = request.headers.get('X-Razorpay-Signature', '')
+    try:
+        get_payment_client().utility.verify_webhook_signature(body, signature, settings.RAZORPAY_WEBHOOK_SECRET)
+        payload = json.loads(body)
+    except (SignatureVerificationError, ValueError):
+        return HttpResponse(status=400)
+
+    # Razorpay retries deliveries with the same event id; fall back to the body hash
+    event_id = request.headers.get('X-Razorpay-Event-Id') or hashlib.sha256(body.encode('utf-8')).hexdigest()
+    event, created = record_payment_event(event_id, payload)
+    if created or event.processed_at is None:
+        apply_payment_event(event)
+    return HttpResponse(status=200)
+
+@query_budget(6)
 @login_required
 def payment_success(request, registration_id):
     registration = get_object_or_404(Registration, id=registration_id, student=request.user)
     return render(request, 'registrations/payment_success.html', {'registration': registration})
 
+@query_budget(6)
 @login_required
 def payment_failure(request, registration_id):
     registration = get_object_or_404(Registration, id=registration_id, student=request.user)
     return render(request, 'registrations/payment_failure.html', {'registration': registration})
 
-@login_required
-def view_hall_ticket(request, registration_id):
-    registration = get_object_or_404(Registration, id=registration_id)
+def _get_hall_ticket_registration(request, registration_id):
+    """Returns the approved registration if the user may see its hall ticket, else a redirect."""
+    registration = get_object_or_404(Registration.objects.select_related('student', 'exam'), id=registration_id)
     
     # Security check: Only the student or staff can view
     if not request.user.is_staff and registration.student != request.user:
         messages.error(request, "Access denied.")
-        return redirect('profile')
+        return None, redirect('profile')
     
     if registration.status != 'Approved':
         messages.error(request, "Hall ticket is only available for approved registrations.")
-        return redirect('profile')
-    
-    # Generate QR code data (same logic as email)
-    from .utils import generate_qr_code_bytes
-    import base64
-    
-    qr_data = f"Reg No: {registration.registration_number}\nStudent: {registration.student.get_full_name()}\nExam: {registration.exam.name}\nDate: {registration.exam.exam_date}\nLocation: {registration.exam.location}"
-    qr_bytes = generate_qr_code_bytes(qr_data)
-    qr_base64 = base64.b64encode(qr_bytes).decode('utf-8')
-    
-    context = {
-        'registration': registration,
-        'user': registration.student,
-        'exam': registration.exam,
-        'qr_code': qr_base64,
-    }
+        return None, redirect('profile')
+    return registration, None
+
+@query_budget(6)
+@login_required
+def view_hall_ticket(request, registration_id):
+    registration, denied = _get_hall_ticket_registration(request, registration_id)
+    if denied:
+        return denied
     
-    return render(request, 'registrations/printable_hall_ticket.html', context)
+    # Served from the pre-rendered copy; built on first view if the batch job hasn't reached it
+    name = build_hall_ticket(registration)
+    return FileResponse(registration.hall_ticket.storage.open(name, 'rb'), content_type='text/html; charset=utf-8')
+
+@query_budget(5)
+@login_required
+def hall_ticket_qr(request, registration_id):
+    registration, denied = _get_hall_ticket_registration(request, registration_id)
+    if denied:
+        return denied
 
+    qr_data = hall_ticket_qr_data(registration)
+    etag = quote_etag(qr_digest(qr_data))
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(get_qr_code_bytes(qr_data), content_type='image/png')
+    response['ETag'] = etag
+    # The URL stays the same when the exam details change, so always revalidate
+    response['Cache-Control'] = 'private, no-cache'
+    return response